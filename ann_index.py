@@ -0,0 +1,117 @@
+# ann_index.py
+import os
+import json
+
+import numpy as np
+
+# --- HNSW Index Configuration ---
+HNSW_M = int(os.getenv("LOCAL_HNSW_M", 16)) # Graph links per node: higher is more accurate and uses more memory
+HNSW_EF_CONSTRUCTION = int(os.getenv("LOCAL_HNSW_EF_CONSTRUCTION", 200))
+HNSW_EF_SEARCH = int(os.getenv("LOCAL_HNSW_EF_SEARCH", 128)) # Candidate list size at query time: recall vs latency
+HNSW_BUILD_BLOCK_ROWS = 10000
+
+
+class HnswIndex:
+    """
+    Approximate nearest-neighbour graph (HNSW, via the optional `hnswlib` package) over
+    the local store's normalised embeddings, searched by inner product.
+
+    Labels are the store's row numbers, so the store's id/metadata bookkeeping is reused
+    as is. Deleted rows are tombstoned with `mark_deleted`; when the store recycles a row,
+    its own tombstoned node is revived and updated, and brand-new rows take over any other
+    tombstoned slot. The graph lives in memory and is written to disk by `save`;
+    a small sidecar file records the store generation (write counter) the graph reflects,
+    so a graph that is stale after a crash is detected and rebuilt by the caller, even
+    when the store still holds the same number of vectors.
+    """
+
+    def __init__(self, dimension, path, capacity, m=HNSW_M, ef_construction=HNSW_EF_CONSTRUCTION,
+                 ef_search=HNSW_EF_SEARCH):
+        try:
+            import hnswlib
+        except ImportError as e:
+            raise ImportError("The 'hnsw' index requires the 'hnswlib' package (pip install hnswlib).") from e
+        self._hnswlib = hnswlib
+        self.dimension = dimension
+        self.path = path
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.live = 0
+        self.generation = 0 # The store generation the graph reflects; a new graph matches an empty store
+        self.loaded = False
+
+        if os.path.exists(path) and os.path.exists(path + ".json"):
+            with open(path + ".json") as f:
+                sidecar = json.load(f)
+            self.live = sidecar["live"]
+            self.generation = sidecar.get("generation") # Graphs saved without one are always rebuilt
+            self.index = hnswlib.Index(space='ip', dim=dimension)
+            self.index.load_index(path, max_elements=max(capacity, 1), allow_replace_deleted=True)
+            self.loaded = True
+        else:
+            self._create(capacity)
+        self.index.set_ef(ef_search)
+
+    def _create(self, capacity):
+        self.index = self._hnswlib.Index(space='ip', dim=self.dimension)
+        self.index.init_index(
+            max_elements=max(capacity, 1), ef_construction=self.ef_construction, M=self.m, allow_replace_deleted=True
+        )
+        self.index.set_ef(self.ef_search)
+        self.live = 0
+        self.generation = 0
+
+    def add(self, rows, vectors, new_rows):
+        """Inserts (or updates) the given rows; `new_rows` are those of them that were not live before."""
+        rows = np.asarray(rows, dtype=np.int64)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        new_rows = set(int(row) for row in new_rows)
+        # Live rows are updated in place. A recycled row still has its tombstoned node, which is
+        # revived and updated; only rows the graph has never seen may take over a tombstoned slot
+        # (replacing a slot of a live or revived label would leave its old node in the graph).
+        unseen = np.zeros(len(rows), dtype=bool)
+        for i, row in enumerate(rows.tolist()):
+            if row in new_rows:
+                try:
+                    self.index.unmark_deleted(row)
+                except RuntimeError:
+                    unseen[i] = True
+
+        needed = self.index.get_current_count() + int(unseen.sum())
+        if needed > self.index.get_max_elements():
+            self.index.resize_index(max(needed, 2 * self.index.get_max_elements()))
+        if (~unseen).any():
+            self.index.add_items(vectors[~unseen], rows[~unseen])
+        if unseen.any():
+            self.index.add_items(vectors[unseen], rows[unseen], replace_deleted=True)
+        self.live += len(new_rows)
+
+    def delete(self, rows):
+        for row in rows:
+            try:
+                self.index.mark_deleted(row)
+                self.live -= 1
+            except RuntimeError:
+                pass # Never inserted (e.g. a failed upsert) or already deleted
+
+    def query(self, query_vectors, top_k):
+        """Returns (rows, scores) arrays of shape (num_queries, k) with k <= top_k, best first."""
+        query_vectors = np.atleast_2d(query_vectors)
+        k = min(top_k, self.live)
+        if k <= 0:
+            return np.empty((len(query_vectors), 0), dtype=np.int64), np.empty((len(query_vectors), 0), dtype=np.float32)
+        self.index.set_ef(max(self.ef_search, k))
+        labels, distances = self.index.knn_query(query_vectors, k=k)
+        return labels.astype(np.int64), 1.0 - distances # 'ip' distance is 1 - inner product
+
+    def clear(self, capacity):
+        self._create(capacity)
+
+    def save(self, generation):
+        """Writes the graph, then the sidecar recording that it reflects the store's `generation`."""
+        self.index.save_index(self.path)
+        self.generation = generation
+        with open(self.path + ".json", "w") as f:
+            json.dump({"live": self.live, "generation": generation, "m": self.m,
+                       "ef_construction": self.ef_construction}, f)
@@ -1,8 +1,10 @@
 
 import os
+import itertools
 import streamlit as st
 import tempfile
 from orchestrator import Orchestrator
+from tracing import configure_logging
 
 
 
@@ -494,13 +496,49 @@ st.markdown(CUSTOM_STYLES, unsafe_allow_html=True)
 
 @st.cache_resource
 def get_orchestrator():
-    return Orchestrator()
+    # Agents load lazily; warming them up in the background keeps the first page render fast
+    configure_logging() # LOG_LEVEL / LOG_FORMAT control the server-side log output
+    orchestrator = Orchestrator(warm_up=True)
+    orchestrator.ingestion_queue # Resumes ingestion jobs interrupted by a previous run
+    return orchestrator
+
+get_orchestrator()
 
 # Initialize session state variables
 if "messages" not in st.session_state:
     st.session_state.messages = []
 if "ingested_files" not in st.session_state:
     st.session_state.ingested_files = set()
+if "ingestion_jobs" not in st.session_state:
+    st.session_state.ingestion_jobs = {} # Background ingestion job id -> file name
+if "ingestion_results" not in st.session_state:
+    st.session_state.ingestion_results = [] # (file name, error or None) of jobs finished since the last upload
+
+JOB_STATUS_REFRESH_SECONDS = 2
+
+def reconcile_ingestion_jobs():
+    """
+    Moves finished background jobs into `ingested_files` (or, if they failed, into
+    `ingestion_results` with their error) and returns (statuses of the jobs still running,
+    whether any job has finished).
+    """
+    orchestrator = get_orchestrator()
+    running, finished = {}, False
+    for job_id, file_name in list(st.session_state.ingestion_jobs.items()):
+        status = orchestrator.ingestion_status(job_id)
+        if status is not None and status['state'] in ("queued", "running"):
+            running[file_name] = status
+            continue
+        del st.session_state.ingestion_jobs[job_id]
+        finished = True
+        if status is None:
+            continue
+        if status['state'] == "succeeded":
+            st.session_state.ingested_files.add(file_name)
+            st.session_state.ingestion_results.append((file_name, None))
+        else:
+            st.session_state.ingestion_results.append((file_name, status['error'] or "Unknown error"))
+    return running, finished
 
 st.title("Agentic RAG Chatbot 🤖")
 
@@ -516,27 +554,47 @@ with st.expander("📁 Manage Knowledge Base", expanded=True):
         if not uploaded_files:
             st.warning("Please upload at least one document first.")
         else:
-            with st.spinner("Processing documents..."):
+            with st.spinner("Queueing documents..."):
                 orchestrator = get_orchestrator()
-                newly_uploaded_files = [f for f in uploaded_files if f.name not in st.session_state.ingested_files]
+                st.session_state.ingestion_results = []
+                queued_files = set(st.session_state.ingestion_jobs.values())
+                newly_uploaded_files = [
+                    f for f in uploaded_files if f.name not in st.session_state.ingested_files and f.name not in queued_files
+                ]
                 if not newly_uploaded_files:
                     st.info("All selected documents have already been processed.")
                 else:
-                    for uploaded_file in newly_uploaded_files:
-                        st.info(f"Processing '{uploaded_file.name}'...")
-                        try:
+                    # Each upload becomes a durable background job that owns a copy of the file, so it
+                    # survives a rerun of this page (or a restart) and the temp file can go right away.
+                    # The page does not wait for the jobs: their status is polled below.
+                    try:
+                        for uploaded_file in newly_uploaded_files:
                             with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(uploaded_file.name)[1]) as tmp_file:
                                 tmp_file.write(uploaded_file.getvalue())
-                                tmp_file_path = tmp_file.name
-                            ingestion_result = orchestrator.ingest_document(tmp_file_path)
-                            os.remove(tmp_file_path)
-                            if ingestion_result['type'] == 'STORAGE_SUCCESS':
-                                st.session_state.ingested_files.add(uploaded_file.name)
-                            else:
-                                st.error(f"Failed to process '{uploaded_file.name}': {ingestion_result.get('payload', {}).get('error', 'Unknown')}")
-                        except Exception as e:
-                            st.error(f"An error occurred with '{uploaded_file.name}': {e}")
-                    st.success("Selected documents have been successfully added!")
+                            try:
+                                job_id = orchestrator.submit_ingestion(tmp_file.name, uploaded_file.name)
+                            finally:
+                                os.remove(tmp_file.name)
+                            st.session_state.ingestion_jobs[job_id] = uploaded_file.name
+                    except Exception as e:
+                        st.error(f"An error occurred while queueing the documents: {e}")
+
+    @st.fragment(run_every=JOB_STATUS_REFRESH_SECONDS if st.session_state.ingestion_jobs else None)
+    def show_ingestion_jobs():
+        """Shows each job's progress while it runs, and its final state once it has finished."""
+        running_jobs, finished = reconcile_ingestion_jobs()
+        if finished:
+            st.rerun() # Refreshes the whole page, including the list of active documents
+        for file_name, error in st.session_state.ingestion_results:
+            if error is None:
+                st.success(f"Added '{file_name}' to the knowledge base.")
+            else:
+                st.error(f"Failed to process '{file_name}': {error}")
+        for file_name, status in running_jobs.items():
+            st.info(f"'{file_name}' is being processed: {status['state']}, {status['stage']}, "
+                    f"{status['chunks_stored']}/{status['chunks_total'] or '?'} chunks stored.")
+
+    show_ingestion_jobs()
 
     st.divider()
     st.subheader("Active Documents")
@@ -551,7 +609,7 @@ with st.expander("📁 Manage Knowledge Base", expanded=True):
             if st.button("Clear Knowledge Base"):
                 with st.spinner("Forgetting everything..."):
                     orchestrator = get_orchestrator()
-                    orchestrator.retrieval_agent.index.delete(delete_all=True)
+                    orchestrator.clear_knowledge_base()
                     st.session_state.ingested_files.clear()
                     st.session_state.messages.clear()
                     st.success("Knowledge base cleared!")
@@ -578,21 +636,31 @@ if prompt := st.chat_input("Ask a question about the uploaded documents..."):
         with st.chat_message("user"):
             st.markdown(prompt)
         with st.chat_message("assistant"):
+            orchestrator = get_orchestrator()
+            answer_placeholder = st.empty()
+            # The spinner covers retrieval; it disappears as soon as the first token arrives
             with st.spinner("Searching knowledge base..."):
-                orchestrator = get_orchestrator()
-                response_mcp = orchestrator.ask_question(prompt)
-                payload = response_mcp.get('payload', {})
-                answer = payload.get('answer', "Sorry, I encountered an error.")
-                source_context = payload.get('source_context', [])
-                st.markdown(answer)
-                if source_context:
-                    with st.expander("View Source Context"):
-                        for i, context in enumerate(source_context):
-                            source = context.get('source', 'Unknown')
-                            text = context.get('text', 'No text available')
-                            st.write(f"**Source {i+1} from `{source}`:**\n> {text}")
-                st.session_state.messages.append({
-                    "role": "assistant", 
-                    "content": answer, 
-                    "source_context": source_context
-                })
\ No newline at end of file
+                response_stream = orchestrator.ask_question_stream(prompt)
+                first_response = next(response_stream)
+            streamed_answer = ""
+            payload = {}
+            for response_mcp in itertools.chain([first_response], response_stream):
+                if response_mcp['type'] == 'RESPONSE_TOKEN':
+                    streamed_answer += response_mcp['payload']['token']
+                    answer_placeholder.markdown(streamed_answer + "▌")
+                else:
+                    payload = response_mcp.get('payload', {})
+            answer = payload.get('answer', "Sorry, I encountered an error.")
+            source_context = payload.get('source_context', [])
+            answer_placeholder.markdown(answer)
+            if source_context:
+                with st.expander("View Source Context"):
+                    for i, context in enumerate(source_context):
+                        source = context.get('source', 'Unknown')
+                        text = context.get('text', 'No text available')
+                        st.write(f"**Source {i+1} from `{source}`:**\n> {text}")
+            st.session_state.messages.append({
+                "role": "assistant", 
+                "content": answer, 
+                "source_context": source_context
+            })
\ No newline at end of file
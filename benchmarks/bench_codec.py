@@ -0,0 +1,149 @@
+# benchmarks/bench_codec.py
+"""
+Cost of moving typical MCP messages between processes: JSON (with embeddings as
+Python lists, as messages were built before mcp_codec) versus the binary mcp_codec
+frame, with and without shared memory for large array buffers.
+
+Messages:
+  chunks_ready     - IngestionAgent CHUNKS_READY with --chunks chunks of ~1000 characters
+  context_response - RetrievalAgent CONTEXT_RESPONSE: top-k chunks with metadata and a query embedding
+  context_batch    - RETRIEVE_BATCH reply: --batch CONTEXT_RESPONSE messages
+  embeddings       - a (--chunks x --dimension) float32 embedding matrix, e.g. for a batch upsert
+
+Reported per message and codec: frame size, median encode and decode time, and the
+median time to hand the message to another process over a multiprocessing queue
+(encode, transfer, decode there and acknowledge), which is what the MCP bus pays.
+
+Usage (from the repository root):
+    python benchmarks/bench_codec.py [--chunks 1000] [--dimension 384] [--top-k 5] [--batch 32] [--repeat 50]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import multiprocessing
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from corpora import generate_paragraphs
+from mcp import create_mcp_message
+from mcp_codec import decode, encode
+
+
+def _json_default(value):
+    return value.tolist()
+
+
+CODECS = {
+    "json": (lambda message: json.dumps(message, default=_json_default).encode("utf-8"), json.loads),
+    "mcp_codec": (encode, decode),
+    "mcp_codec+shm": (lambda message: encode(message, shared_memory=True), decode),
+}
+
+
+def build_messages(args):
+    rng = np.random.default_rng(0)
+    texts = [text[:1000] for _, text in generate_paragraphs(args.chunks * 2)][:args.chunks]
+    chunks_ready = create_mcp_message(
+        "IngestionAgent", "RetrievalAgent", "CHUNKS_READY", {"chunks": texts, "source_file": "corpus.pdf"}
+    )
+
+    def context_response(i):
+        return create_mcp_message(
+            "RetrievalAgent", "LLMResponseAgent", "CONTEXT_RESPONSE",
+            {
+                "query": f"What do the documents say about topic {i}?",
+                "top_chunks": [
+                    {"id": f"corpus.pdf-{i}-{k}", "text": texts[(i + k) % len(texts)],
+                     "source": "corpus.pdf", "chunk_index": k}
+                    for k in range(args.top_k)
+                ],
+                "query_embedding": rng.random(args.dimension, dtype=np.float32),
+                "kb_version": 3,
+            }
+        )
+
+    embeddings = create_mcp_message(
+        "RetrievalAgent", "RetrievalAgent", "EMBEDDINGS",
+        {"ids": [f"corpus.pdf-{i}" for i in range(args.chunks)],
+         "embeddings": rng.random((args.chunks, args.dimension), dtype=np.float32)}
+    )
+    return {
+        "chunks_ready": chunks_ready,
+        "context_response": context_response(0),
+        "context_batch": [context_response(i) for i in range(args.batch)],
+        "embeddings": embeddings,
+    }
+
+
+def _receiver(codec, inbox, outbox):
+    """Decodes every frame it is sent and acknowledges it."""
+    decoder = CODECS[codec][1]
+    for frame in iter(inbox.get, None):
+        decoder(frame)
+        outbox.put(True)
+
+
+def time_codec(codec, message, repeat, inbox, outbox):
+    encoder, decoder = CODECS[codec]
+    encode_ms, decode_ms, transfer_ms = [], [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        frame = encoder(message)
+        encode_ms.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        decoder(frame) # Also frees this frame's shared memory
+        decode_ms.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        inbox.put(encoder(message))
+        outbox.get()
+        transfer_ms.append((time.perf_counter() - start) * 1000)
+    return {
+        "bytes": len(frame),
+        "encode_ms_p50": round(statistics.median(encode_ms), 3),
+        "decode_ms_p50": round(statistics.median(decode_ms), 3),
+        "transfer_ms_p50": round(statistics.median(transfer_ms), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=1000)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    messages = build_messages(args)
+    results = []
+    for codec in CODECS:
+        inbox, outbox = context.Queue(), context.Queue()
+        receiver = context.Process(target=_receiver, args=(codec, inbox, outbox), daemon=True)
+        receiver.start()
+        for label, message in messages.items():
+            results.append({"message": label, "codec": codec, **time_codec(codec, message, args.repeat, inbox, outbox)})
+        inbox.put(None)
+        receiver.join()
+    results.sort(key=lambda row: list(messages).index(row["message"]))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{args.chunks} chunks, {args.dimension}-dim embeddings, top_k={args.top_k}, batch={args.batch}")
+    print(f"{'message':<18}{'codec':<15}{'bytes':>12}{'encode ms':>12}{'decode ms':>12}{'transfer ms':>13}")
+    for row in results:
+        print(f"{row['message']:<18}{row['codec']:<15}{row['bytes']:>12}"
+              f"{row['encode_ms_p50']:>12}{row['decode_ms_p50']:>12}{row['transfer_ms_p50']:>13}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# benchmarks/bench_embeddings.py
+"""
+Compares embedding throughput of the PyTorch backend with the ONNX Runtime backend
+(int8-quantized, and optionally full precision) across batch sizes, and checks that the
+ONNX embeddings agree with the PyTorch ones (cosine similarity).
+
+Usage (from the repository root):
+    python benchmarks/bench_embeddings.py [--model all-MiniLM-L6-v2] [--batch-sizes 1,8,32,64]
+                                          [--texts 256] [--include-fp32] [--json]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from embedding_backends import OnnxEmbeddingModel, load_embedding_model, parity_check
+from embedding_agent import EMBEDDING_MODEL
+
+WORDS = ("retrieval agent vector index chunk query context answer document model latency throughput "
+         "pinecone groq token batch embedding cosine quantized runtime parser upload knowledge").split()
+
+
+def synthetic_texts(count, seed=0):
+    """Chunk-like texts of 20-200 words, roughly the spread the text splitter produces."""
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(WORDS, k=rng.randint(20, 200))) for _ in range(count)]
+
+
+def throughput(model, texts, batch_size, repeats=2):
+    """Best-of-`repeats` texts per second."""
+    model.encode(texts[:batch_size], batch_size=batch_size) # Warm-up
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.encode(texts, batch_size=batch_size)
+        best = min(best, time.perf_counter() - start)
+    return len(texts) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--batch-sizes", default="1,8,32,64")
+    parser.add_argument("--texts", type=int, default=256)
+    parser.add_argument("--include-fp32", action="store_true", help="Also benchmark the unquantized ONNX graph.")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    args = parser.parse_args()
+
+    texts = synthetic_texts(args.texts)
+    batch_sizes = [int(size) for size in args.batch_sizes.split(",")]
+    models = {"torch": load_embedding_model(args.model, "torch"), "onnx-int8": OnnxEmbeddingModel(args.model)}
+    if args.include_fp32:
+        models["onnx-fp32"] = OnnxEmbeddingModel(args.model, quantize=False)
+
+    results = {
+        "model": args.model,
+        "texts_per_sec": {
+            name: {batch_size: round(throughput(model, texts, batch_size), 1) for batch_size in batch_sizes}
+            for name, model in models.items()
+        },
+        "parity": {
+            name: parity_check(args.model, texts[:64], onnx_model=model)
+            for name, model in models.items() if name != "torch"
+        },
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"Embedding throughput for '{args.model}' ({args.texts} texts, texts/sec)")
+    print(f"{'backend':<12}" + "".join(f"{f'batch {size}':>12}" for size in batch_sizes))
+    for name, by_batch in results["texts_per_sec"].items():
+        print(f"{name:<12}" + "".join(f"{by_batch[size]:>12.1f}" for size in batch_sizes))
+    for name, parity in results["parity"].items():
+        print(f"Parity {name} vs torch: mean cosine {parity['mean_cosine']:.4f}, "
+              f"min {parity['min_cosine']:.4f} -> {'PASS' if parity['passed'] else 'FAIL'}")
+
+
+if __name__ == "__main__":
+    main()
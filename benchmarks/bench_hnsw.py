@@ -0,0 +1,96 @@
+# benchmarks/bench_hnsw.py
+"""
+Latency and recall of the local store's HNSW index against exact (flat) search.
+
+Builds the same synthetic embedding-like corpus into a flat store and an HNSW store,
+then reports build time and, for each `ef` search setting, p50/p95 query latency and
+recall@k against exact search.
+
+Usage (from the repository root):
+    python benchmarks/bench_hnsw.py [--vectors 200000] [--queries 200] [--top-k 10]
+                                    [--m 16] [--ef-construction 200] [--ef 16,32,64,128,256]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from vector_store import LocalVectorStore
+from bench_quantization import embedding_like
+
+UPSERT_BATCH = 5000
+
+
+def build(store, corpus):
+    start = time.perf_counter()
+    for offset in range(0, len(corpus), UPSERT_BATCH):
+        store.upsert([(f"v{i}", corpus[i], {}) for i in range(offset, min(len(corpus), offset + UPSERT_BATCH))])
+    store.persist()
+    return time.perf_counter() - start
+
+
+def latencies_ms(store, queries, top_k):
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        store.query(query, top_k=top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return round(float(np.percentile(latencies, 50)), 2), round(float(np.percentile(latencies, 95)), 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=200000)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--m", type=int, default=16)
+    parser.add_argument("--ef-construction", type=int, default=200)
+    parser.add_argument("--ef", default="16,32,64,128,256")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    corpus, basis = embedding_like(args.vectors, args.dimension, rng)
+    queries, _ = embedding_like(args.queries, args.dimension, rng, basis=basis)
+
+    flat = LocalVectorStore(args.dimension, tempfile.mkdtemp(prefix="bench-flat-"), index_type="flat")
+    hnsw = LocalVectorStore(
+        args.dimension, tempfile.mkdtemp(prefix="bench-hnsw-"), index_type="hnsw",
+        m=args.m, ef_construction=args.ef_construction
+    )
+    results = {"vectors": args.vectors, "build_seconds": {"flat": round(build(flat, corpus), 1)}}
+    results["build_seconds"]["hnsw"] = round(build(hnsw, corpus), 1)
+
+    p50, p95 = latencies_ms(flat, queries, args.top_k)
+    rows = [{"index": "flat", "ef": None, "latency_ms_p50": p50, "latency_ms_p95": p95, f"recall@{args.top_k}": 1.0}]
+    for ef in [int(value) for value in args.ef.split(",")]:
+        hnsw.hnsw.ef_search = ef
+        p50, p95 = latencies_ms(hnsw, queries, args.top_k)
+        recall = hnsw.evaluate_recall(queries, top_k=args.top_k)[f"recall@{args.top_k}"]
+        rows.append({
+            "index": "hnsw", "ef": ef, "latency_ms_p50": p50, "latency_ms_p95": p95,
+            f"recall@{args.top_k}": round(recall, 3)
+        })
+    results["queries"] = rows
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{args.vectors} vectors x {args.dimension} dims, M={args.m}, ef_construction={args.ef_construction}, "
+          f"build: flat {results['build_seconds']['flat']} s, hnsw {results['build_seconds']['hnsw']} s")
+    print(f"{'index':<8}{'ef':>6}{'p50 ms':>10}{'p95 ms':>10}{'recall':>10}")
+    for row in rows:
+        print(f"{row['index']:<8}{row['ef'] or '-':>6}{row['latency_ms_p50']:>10}{row['latency_ms_p95']:>10}"
+              f"{row[f'recall@{args.top_k}']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# benchmarks/bench_lexical.py
+"""
+Search latency of the BM25 lexical index on a large corpus.
+
+Builds a `BM25Index` over synthetic chunks whose words follow a Zipf distribution, as
+words in real text do: a few terms appear in most chunks (and are skipped by the
+document-frequency cutoff), while most appear in only a handful. It then reports build
+time and p50/p95 latency of `search` twice: on a first pass, when each term's BM25
+weights are computed as it is first queried (as after every ingestion), and on a repeat
+pass, which reads them from the cache. The target is a repeat-pass p95 under 1 ms.
+
+Usage (from the repository root):
+    python benchmarks/bench_lexical.py [--chunks 100000] [--queries 500] [--top-k 20]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from lexical_index import BM25Index
+
+TARGET_P95_MS = 1.0
+ZIPF_EXPONENT = 1.1
+
+
+def zipf_texts(count, vocabulary_size, min_words, max_words, rng):
+    """`count` texts whose words are drawn from a Zipf distribution over `vocabulary_size` terms."""
+    vocabulary = np.array([f"w{i}" for i in range(vocabulary_size)])
+    weights = 1.0 / np.arange(1, vocabulary_size + 1) ** ZIPF_EXPONENT
+    weights /= weights.sum()
+    lengths = rng.integers(min_words, max_words + 1, size=count)
+    words = vocabulary[rng.choice(vocabulary_size, size=int(lengths.sum()), p=weights)]
+    ends = np.cumsum(lengths)
+    return [" ".join(words[end - length:end]) for end, length in zip(ends, lengths)]
+
+
+def latencies_ms(index, queries, top_k):
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query, top_k=top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return round(float(np.percentile(latencies, 50)), 3), round(float(np.percentile(latencies, 95)), 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=100000)
+    parser.add_argument("--vocabulary", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    texts = zipf_texts(args.chunks, args.vocabulary, 60, 140, rng)
+    queries = zipf_texts(args.queries, args.vocabulary, 3, 8, rng)
+
+    index = BM25Index("bench", directory=tempfile.mkdtemp(prefix="bench-lexical-"))
+    start = time.perf_counter()
+    index.add_many((f"c{i}", text) for i, text in enumerate(texts))
+    build_seconds = time.perf_counter() - start
+
+    rows = []
+    for run in ("first", "repeat"):
+        p50, p95 = latencies_ms(index, queries, args.top_k)
+        rows.append({"pass": run, "latency_ms_p50": p50, "latency_ms_p95": p95})
+    results = {
+        "chunks": args.chunks, "vocabulary": args.vocabulary, "build_seconds": round(build_seconds, 1),
+        "queries": rows, "target_ms": TARGET_P95_MS, "meets_target": rows[-1]["latency_ms_p95"] < TARGET_P95_MS,
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{args.chunks} chunks, {args.vocabulary} terms, build: {results['build_seconds']} s")
+    print(f"{'pass':<8}{'p50 ms':>10}{'p95 ms':>10}")
+    for row in rows:
+        print(f"{row['pass']:<8}{row['latency_ms_p50']:>10}{row['latency_ms_p95']:>10}")
+    print(f"{'Meets' if results['meets_target'] else 'Misses'} the target of a p95 under {TARGET_P95_MS} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# benchmarks/bench_parsers.py
+"""
+Parsing throughput per format: the IngestionAgent's fast-path parsers (plain text,
+Markdown, CSV) against unstructured.partition on the same seeded corpora.
+
+For every format and parser the whole document is parsed (IngestionAgent.iter_elements)
+and then chunked, and the script reports wall time, MB/s, element and chunk counts, and
+the peak traced Python memory of the parse. PDF and DOCX always use unstructured; include
+them with --formats to compare against the formats that have a fast path.
+
+Usage (from the repository root):
+    python benchmarks/bench_parsers.py [--size large] [--formats txt,md,csv] [--parsers fast,unstructured] [--repeat 3]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+import statistics
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from corpora import CORPUS_SIZES, build_corpus
+from ingestion_agent import IngestionAgent
+
+
+def measure(agent, path, repeat):
+    """Median parse and chunk time over `repeat` runs, plus counts and peak parse memory from one more run."""
+    parse_ms, chunk_ms = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        elements = list(agent.iter_elements(path))
+        parse_ms.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        chunks = list(agent.chunk_texts(elements))
+        chunk_ms.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    for _ in agent.iter_elements(path):
+        pass
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return statistics.median(parse_ms), statistics.median(chunk_ms), len(elements), len(chunks), peak_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", default="large", help=f"One of {list(CORPUS_SIZES)}.")
+    parser.add_argument("--formats", default="txt,md,csv", help="Comma-separated document formats.")
+    parser.add_argument("--parsers", default="fast,unstructured", help="'fast', 'unstructured' or both.")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    args = parser.parse_args()
+
+    agents = {
+        name: IngestionAgent(fast_parsers=name == "fast", parse_cache=False) for name in args.parsers.split(",")
+    }
+    corpus_dir = tempfile.mkdtemp(prefix="bench-parsers-")
+    results = []
+    for fmt in args.formats.split(","):
+        path = build_corpus(corpus_dir, fmt, args.size, args.seed)
+        megabytes = os.path.getsize(path) / 2**20
+        for name, agent in agents.items():
+            parse_ms, chunk_ms, elements, chunks, peak_bytes = measure(agent, path, args.repeat)
+            results.append({
+                "format": fmt,
+                "parser": agent.parser_name(path),
+                "file_mb": round(megabytes, 2),
+                "parse_ms_p50": round(parse_ms, 1),
+                "parse_mb_per_s": round(megabytes / (parse_ms / 1000), 1),
+                "chunk_ms_p50": round(chunk_ms, 1),
+                "elements": elements,
+                "chunks": chunks,
+                "peak_parse_mb": round(peak_bytes / 2**20, 1),
+            })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"size={args.size}, median of {args.repeat} runs")
+    print(f"{'format':<8}{'parser':<14}{'MB':>7}{'parse ms':>11}{'MB/s':>9}{'chunk ms':>10}"
+          f"{'elements':>10}{'chunks':>8}{'peak MB':>9}")
+    for row in results:
+        print(f"{row['format']:<8}{row['parser']:<14}{row['file_mb']:>7}{row['parse_ms_p50']:>11}"
+              f"{row['parse_mb_per_s']:>9}{row['chunk_ms_p50']:>10}{row['elements']:>10}{row['chunks']:>8}"
+              f"{row['peak_parse_mb']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# benchmarks/bench_quantization.py
+"""
+Memory / accuracy / latency trade-off of the local vector store's compression options.
+
+Builds a synthetic corpus of embedding-like vectors (low intrinsic dimension plus noise),
+stores it with no quantization, int8 scalar quantization (sq8) and product quantization
+(pq), and reports per configuration: bytes per vector, query latency, and recall@k
+against exact float search, with and without float re-scoring of the candidates.
+
+Usage (from the repository root):
+    python benchmarks/bench_quantization.py [--vectors 100000] [--dimension 384] [--queries 100] [--top-k 10]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from vector_store import LocalVectorStore
+
+CONFIGURATIONS = [
+    # (label, quantization, rescore, rescore_factor)
+    ("float32", "none", False, 1),
+    ("sq8", "sq8", False, 1),
+    ("sq8+rescore", "sq8", True, 4),
+    ("pq", "pq", False, 1),
+    ("pq+rescore x4", "pq", True, 4),
+    ("pq+rescore x16", "pq", True, 16),
+]
+
+
+def embedding_like(count, dimension, rng, latent_dimension=48, basis=None):
+    """Vectors from a random low-rank projection plus noise, roughly how sentence embeddings are spread."""
+    if basis is None:
+        basis = rng.normal(size=(latent_dimension, dimension)).astype(np.float32)
+    latent = rng.normal(size=(count, basis.shape[0])).astype(np.float32)
+    vectors = latent @ basis + 0.3 * rng.normal(size=(count, dimension)).astype(np.float32)
+    return vectors, basis
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    corpus, basis = embedding_like(args.vectors, args.dimension, rng)
+    queries, _ = embedding_like(args.queries, args.dimension, rng, basis=basis)
+
+    results = []
+    stores = {}
+    for label, quantization, rescore, rescore_factor in CONFIGURATIONS:
+        store = stores.get(quantization)
+        if store is None:
+            # Each quantization kind is built once; the re-scoring variants reuse its codes
+            directory = tempfile.mkdtemp(prefix=f"bench-{quantization}-")
+            store = LocalVectorStore(args.dimension, directory, quantization=quantization)
+            for start in range(0, args.vectors, 5000):
+                store.upsert([
+                    (f"v{i}", corpus[i], {}) for i in range(start, min(args.vectors, start + 5000))
+                ])
+            stores[quantization] = store
+        store.rescore, store.rescore_factor = rescore, rescore_factor
+
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            store.query(query, top_k=args.top_k)
+            latencies.append((time.perf_counter() - start) * 1000)
+        recall = store.evaluate_recall(queries, top_k=args.top_k)[f"recall@{args.top_k}"]
+        bytes_per_vector = store.describe()["bytes_per_vector"]
+        results.append({
+            "configuration": label,
+            "bytes_per_vector": bytes_per_vector,
+            "index_mb": round(bytes_per_vector * args.vectors / 2**20, 1),
+            "latency_ms_p50": round(statistics.median(latencies), 2),
+            f"recall@{args.top_k}": round(recall, 3),
+        })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{args.vectors} vectors x {args.dimension} dims, {args.queries} queries, k={args.top_k}")
+    print(f"{'configuration':<16}{'bytes/vec':>10}{'index MB':>10}{'p50 ms':>10}{'recall':>10}")
+    for row in results:
+        print(f"{row['configuration']:<16}{row['bytes_per_vector']:>10}{row['index_mb']:>10}"
+              f"{row['latency_ms_p50']:>10}{row[f'recall@{args.top_k}']:>10}")
+
+
+if __name__ == "__main__":
+    main()
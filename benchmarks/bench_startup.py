@@ -0,0 +1,83 @@
+# benchmarks/bench_startup.py
+"""
+Measures the cold-start cost of the RAG system. Every run uses a fresh interpreter:
+
+  import     - `import orchestrator`
+  construct  - `Orchestrator()`; agents are lazy, so nothing heavy should load here
+  warm_up    - building every agent with `Orchestrator.warm_up(background=False)`
+
+It also lists the slowest imports reported by `python -X importtime`.
+
+Usage (from the repository root):
+    python benchmarks/bench_startup.py [--runs 3] [--top 15] [--skip-warm-up]
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, time
+start = time.perf_counter()
+import orchestrator
+import_ms = (time.perf_counter() - start) * 1000
+start = time.perf_counter()
+o = orchestrator.Orchestrator()
+construct_ms = (time.perf_counter() - start) * 1000
+warm_up_ms = None
+if {warm_up}:
+    start = time.perf_counter()
+    o.warm_up(background=False)
+    warm_up_ms = (time.perf_counter() - start) * 1000
+print("RESULT " + json.dumps({{"import_ms": import_ms, "construct_ms": construct_ms,
+                               "warm_up_ms": warm_up_ms, "startup_timings": o.startup_timings}}))
+"""
+
+
+def run_probe(warm_up):
+    completed = subprocess.run(
+        [sys.executable, "-c", PROBE.format(warm_up=warm_up)],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True
+    )
+    line = next(line for line in completed.stdout.splitlines() if line.startswith("RESULT "))
+    return json.loads(line[len("RESULT "):])
+
+
+def slowest_imports(top):
+    """Returns the `top` modules with the largest cumulative import time, in milliseconds."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import orchestrator"],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, module = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us) / 1000, module.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--skip-warm-up", action="store_true", help="Only measure import and construction.")
+    args = parser.parse_args()
+
+    results = [run_probe(warm_up=not args.skip_warm_up) for _ in range(args.runs)]
+    report = {
+        phase: round(statistics.median(r[phase] for r in results), 1)
+        for phase in ("import_ms", "construct_ms", "warm_up_ms") if results[0][phase] is not None
+    }
+    report["startup_timings_last_run"] = {name: round(ms, 1) for name, ms in results[-1]["startup_timings"].items()}
+    report["slowest_imports_ms"] = [[round(ms, 1), module] for ms, module in slowest_imports(args.top)]
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
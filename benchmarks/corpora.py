@@ -0,0 +1,195 @@
+# benchmarks/corpora.py
+"""
+Seeded synthetic documents for the benchmark suite.
+
+The same (format, size, seed) always produces byte-identical files, so results are
+comparable between runs and machines. PDF and DOCX files are written by hand in their
+simplest valid form (no third-party writer needed); TXT, Markdown and CSV are plain text.
+"""
+import os
+import csv
+import random
+import zipfile
+from xml.sax.saxutils import escape
+
+# --- Corpus Configuration ---
+CORPUS_SIZES = {"small": 40, "medium": 400, "large": 4000} # Paragraphs (~550 characters each)
+CORPUS_FORMATS = ["txt", "md", "csv", "pdf", "docx"]
+CSV_ROWS_PER_PARAGRAPH = 5
+PDF_LINE_CHARS = 90
+PDF_LINES_PER_PAGE = 60
+
+VOCABULARY = (
+    "agent pipeline retrieval embedding vector index query latency throughput cache shard replica "
+    "document chunk token context answer model batch queue worker request response upload storage "
+    "metric budget region customer invoice contract policy quarter revenue forecast inventory supplier "
+    "shipment warehouse compliance audit incident release deployment rollback capacity threshold "
+    "the a of to and in for with on by from that this which is are was were be has have will can"
+).split()
+PRODUCTS = ["Atlas", "Borealis", "Cobalt", "Drift", "Ember", "Fjord", "Granite", "Helix"]
+REGIONS = ["north", "south", "east", "west", "central"]
+
+
+def _identifier(rng):
+    return f"{rng.choice('ABCDEFGHJK')}{rng.choice('LMNPQRSTUV')}-{rng.randint(1000, 9999)}"
+
+
+def _sentence(rng):
+    words = [rng.choice(VOCABULARY) for _ in range(rng.randint(8, 20))]
+    if rng.random() < 0.2:
+        words.insert(rng.randrange(len(words)), _identifier(rng))
+    return " ".join(words).capitalize() + "."
+
+
+def generate_paragraphs(count, seed=0):
+    """Returns `count` (heading, paragraph) pairs; heading is None except at the start of each section."""
+    rng = random.Random(seed)
+    paragraphs = []
+    for i in range(count):
+        heading = None
+        if i % 8 == 0:
+            heading = f"Section {i // 8 + 1}: {rng.choice(VOCABULARY[:60]).title()} {rng.choice(VOCABULARY[:60]).title()}"
+        text = " ".join(_sentence(rng) for _ in range(rng.randint(4, 6)))
+        paragraphs.append((heading, text))
+    return paragraphs
+
+
+def generate_queries(count, seed=1):
+    """Distinct questions over the corpus vocabulary (distinct, so no query cache can answer them)."""
+    rng = random.Random(seed)
+    queries = set()
+    while len(queries) < count:
+        topic = " ".join(rng.choice(VOCABULARY[:60]) for _ in range(rng.randint(2, 4)))
+        if rng.random() < 0.2:
+            topic += f" {_identifier(rng)}"
+        queries.add(f"What do the documents say about {topic}?")
+    return sorted(queries)
+
+
+def write_txt(path, paragraphs):
+    with open(path, "w", encoding="utf-8") as f:
+        for heading, text in paragraphs:
+            if heading:
+                f.write(heading + "\n\n")
+            f.write(text + "\n\n")
+
+
+def write_md(path, paragraphs):
+    with open(path, "w", encoding="utf-8") as f:
+        for heading, text in paragraphs:
+            if heading:
+                f.write(f"## {heading}\n\n")
+            f.write(text + "\n\n")
+
+
+def write_csv(path, paragraphs, seed=0):
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["order_id", "product", "region", "quantity", "unit_price", "notes"])
+        for i in range(len(paragraphs) * CSV_ROWS_PER_PARAGRAPH):
+            writer.writerow([
+                _identifier(rng), rng.choice(PRODUCTS), rng.choice(REGIONS), rng.randint(1, 500),
+                f"{rng.uniform(1, 999):.2f}", _sentence(rng)
+            ])
+
+
+def _wrap(text, width):
+    lines, line = [], ""
+    for word in text.split():
+        if line and len(line) + 1 + len(word) > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    if line:
+        lines.append(line)
+    return lines
+
+
+def write_pdf(path, paragraphs):
+    """Writes a minimal multi-page PDF 1.4 with one Helvetica text stream per page."""
+    lines = []
+    for heading, text in paragraphs:
+        if heading:
+            lines += [heading, ""]
+        lines += _wrap(text, PDF_LINE_CHARS) + [""]
+    pages = [lines[i:i + PDF_LINES_PER_PAGE] for i in range(0, len(lines), PDF_LINES_PER_PAGE)] or [[]]
+
+    # Objects 1-3 are the catalog, page tree and font; each page adds a page object and its content stream
+    objects = [None, None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_refs = []
+    for page_lines in pages:
+        body = "BT /F1 10 Tf 12 TL 50 780 Td\n"
+        for line in page_lines:
+            line = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+            body += f"({line}) Tj T*\n"
+        stream = (body + "ET").encode("latin-1", "replace")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_number = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> "
+            b"/Contents %d 0 R >>" % content_number
+        )
+        page_refs.append(b"%d 0 R" % len(objects))
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[1] = b"<< /Type /Pages /Kids [" + b" ".join(page_refs) + b"] /Count %d >>" % len(page_refs)
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % number + obj + b"\nendobj\n"
+    xref_offset = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    with open(path, "wb") as f:
+        f.write(output)
+
+
+def write_docx(path, paragraphs):
+    """Writes a minimal WordprocessingML package: content types, one relationship and the document body."""
+    body = []
+    for heading, text in paragraphs:
+        if heading:
+            body.append(f'<w:p><w:pPr><w:pStyle w:val="Heading2"/></w:pPr><w:r><w:t>{escape(heading)}</w:t></w:r></w:p>')
+        body.append(f"<w:p><w:r><w:t>{escape(text)}</w:t></w:r></w:p>")
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as package:
+        package.writestr("[Content_Types].xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/word/document.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+            '</Types>'
+        ))
+        package.writestr("_rels/.rels", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+            'Target="word/document.xml"/></Relationships>'
+        ))
+        package.writestr("word/document.xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+            + "".join(body) + "</w:body></w:document>"
+        ))
+
+
+WRITERS = {"txt": write_txt, "md": write_md, "csv": write_csv, "pdf": write_pdf, "docx": write_docx}
+
+
+def build_corpus(directory, fmt, size, seed=0):
+    """Writes (or reuses) the synthetic document for `fmt` and `size` and returns its path."""
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown corpus format '{fmt}'. Expected one of {sorted(WRITERS)}.")
+    if size not in CORPUS_SIZES:
+        raise ValueError(f"Unknown corpus size '{size}'. Expected one of {list(CORPUS_SIZES)}.")
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{size}-seed{seed}.{fmt}")
+    if not os.path.exists(path):
+        WRITERS[fmt](path, generate_paragraphs(CORPUS_SIZES[size], seed))
+    return path
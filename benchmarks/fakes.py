@@ -0,0 +1,123 @@
+# benchmarks/fakes.py
+"""
+Deterministic local stand-ins for the external services, so benchmarks run offline and
+without API keys:
+
+  FakePineconeIndex - answers the subset of the Pinecone `Index` API used by
+                      PineconeVectorStore (upsert/query/fetch/delete/describe_index_stats)
+                      with exact in-memory search and an optional fixed network latency.
+  FakeChatModel     - a LangChain chat model standing in for ChatGroq. It returns a fixed
+                      answer, token by token, with a configurable time-to-first-token and
+                      per-token delay.
+"""
+import time
+import threading
+from typing import Any, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class FakePineconeIndex:
+    """In-memory, exact cosine-similarity replacement for a Pinecone serverless index."""
+
+    def __init__(self, dimension, latency_ms=0.0):
+        self.dimension = dimension
+        self.latency_ms = latency_ms
+        self._lock = threading.Lock()
+        self._ids = []
+        self._rows = {}
+        self._vectors = np.zeros((0, dimension), dtype=np.float32)
+        self._metadata = []
+
+    def _network(self):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+    def upsert(self, vectors):
+        self._network()
+        with self._lock:
+            new_rows = []
+            for vector_id, values, metadata in vectors:
+                values = np.asarray(values, dtype=np.float32)
+                values = values / max(float(np.linalg.norm(values)), 1e-12)
+                row = self._rows.get(vector_id)
+                if row is None:
+                    self._rows[vector_id] = len(self._ids) + len(new_rows)
+                    new_rows.append((vector_id, values, metadata))
+                else:
+                    self._vectors[row] = values
+                    self._metadata[row] = metadata
+            if new_rows:
+                self._ids.extend(vector_id for vector_id, _, _ in new_rows)
+                self._vectors = np.vstack([self._vectors] + [values[None] for _, values, _ in new_rows])
+                self._metadata.extend(metadata for _, _, metadata in new_rows)
+        return {"upserted_count": len(vectors)}
+
+    def query(self, vector, top_k=5, include_metadata=True):
+        self._network()
+        with self._lock:
+            if not self._ids:
+                return {"matches": []}
+            query = np.asarray(vector, dtype=np.float32)
+            scores = self._vectors @ (query / max(float(np.linalg.norm(query)), 1e-12))
+            top = np.argsort(-scores, kind="stable")[:top_k]
+            return {"matches": [
+                {"id": self._ids[row], "score": float(scores[row]),
+                 "metadata": self._metadata[row] if include_metadata else None}
+                for row in top
+            ]}
+
+    def fetch(self, ids):
+        self._network()
+        with self._lock:
+            return {"vectors": {
+                vector_id: {"id": vector_id, "metadata": self._metadata[self._rows[vector_id]]}
+                for vector_id in ids if vector_id in self._rows
+            }}
+
+    def delete(self, ids=None, delete_all=False):
+        self._network()
+        with self._lock:
+            if delete_all:
+                remaining = []
+            else:
+                doomed = set(ids or [])
+                remaining = [row for row, vector_id in enumerate(self._ids) if vector_id not in doomed]
+            self._ids = [self._ids[row] for row in remaining]
+            self._vectors = self._vectors[remaining] if remaining else np.zeros((0, self.dimension), dtype=np.float32)
+            self._metadata = [self._metadata[row] for row in remaining]
+            self._rows = {vector_id: row for row, vector_id in enumerate(self._ids)}
+
+    def describe_index_stats(self):
+        return {"total_vector_count": len(self._ids), "dimension": self.dimension}
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model with deterministic output and latency, used in place of ChatGroq."""
+
+    first_token_ms: float = 300.0
+    token_ms: float = 5.0
+    answer_tokens: int = 60
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-groq"
+
+    def _tokens(self, messages: List[BaseMessage]) -> List[str]:
+        prompt_chars = sum(len(str(message.content)) for message in messages)
+        return [f"token{i} " for i in range(self.answer_tokens - 1)] + [f"(prompt of {prompt_chars} chars)"]
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        tokens = self._tokens(messages)
+        time.sleep((self.first_token_ms + self.token_ms * (len(tokens) - 1)) / 1000)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens)))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        for i, token in enumerate(self._tokens(messages)):
+            time.sleep((self.first_token_ms if i == 0 else self.token_ms) / 1000)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
@@ -0,0 +1,263 @@
+# benchmarks/run_benchmarks.py
+"""
+End-to-end performance suite that runs offline: Pinecone and Groq are replaced by the
+deterministic fakes in benchmarks/fakes.py, and the documents are seeded synthetic
+corpora (benchmarks/corpora.py) in several formats and sizes.
+
+For every (format, size) the pipeline stages are timed separately:
+
+  parse     - IngestionAgent.iter_elements (fast paths for TXT/MD/CSV, unstructured otherwise)
+  chunk     - the agent's RecursiveCharacterTextSplitter
+  embed     - the embedding model's encode over all chunks
+  upsert    - UpsertEngine into PineconeVectorStore over the fake index
+  query     - RetrievalAgent.retrieve_context (query encoding + dense and lexical search)
+  generate  - LLMResponseAgent.generate_response / generate_response_stream with the fake LLM
+
+Results are written as JSON. With --baseline the run is compared against a stored result
+file and the script exits with status 1 if any latency grew (or any throughput shrank) by
+more than --tolerance. Record a baseline on the machine that runs the comparison:
+
+    python benchmarks/run_benchmarks.py --update-baseline
+    python benchmarks/run_benchmarks.py --baseline benchmarks/baseline.json
+
+Usage (from the repository root):
+    python benchmarks/run_benchmarks.py [--sizes small,medium] [--formats txt,md,csv,pdf,docx]
+        [--queries 50] [--output results.json] [--baseline FILE] [--update-baseline] [--tolerance 0.25]
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import contextlib
+import statistics
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from corpora import CORPUS_FORMATS, CORPUS_SIZES, build_corpus, generate_queries
+from fakes import FakeChatModel, FakePineconeIndex
+
+DEFAULT_BASELINE = os.path.join(REPO_ROOT, "benchmarks", "baseline.json")
+MIN_REGRESSION_MS = 1.0 # Sub-millisecond swings are timer noise, not regressions
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(p * len(values)))], 3) if values else None
+
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def run_document(path, fmt, args, ingestion_agent, embedding_model, queries):
+    """Runs every stage over one document and returns its metrics."""
+    from vector_store import PineconeVectorStore
+    from upsert_engine import UpsertEngine
+    from embedding_cache import EmbeddingCache
+    from document_manifest import make_chunk_id
+    from retrieval_agent import RetrievalAgent, EMBED_BATCH_SIZE
+    from llm_response_agent import LLMResponseAgent
+
+    size_bytes = os.path.getsize(path)
+    result = {"bytes": size_bytes}
+
+    # 1. Parse
+    elements, parse_ms = timed(lambda: list(ingestion_agent.iter_elements(path)))
+    result["parse"] = {"elements": len(elements), "ms": round(parse_ms, 2),
+                       "mb_per_sec": round(size_bytes / 1e6 / (parse_ms / 1000), 2) if parse_ms else None}
+
+    # 2. Chunk
+    chunks, chunk_ms = timed(ingestion_agent.text_splitter.split_text, "\n\n".join(elements))
+    result["chunk"] = {"chunks": len(chunks), "ms": round(chunk_ms, 2)}
+
+    # 3. Embed
+    embeddings, embed_ms = timed(embedding_model.encode, chunks, batch_size=EMBED_BATCH_SIZE)
+    result["embed"] = {"ms": round(embed_ms, 2), "chunks_per_sec": round(len(chunks) / (embed_ms / 1000), 1)}
+
+    # 4. Upsert through the production engine into the fake Pinecone index
+    dimension = embedding_model.get_sentence_embedding_dimension()
+    index = FakePineconeIndex(dimension, latency_ms=args.pinecone_latency_ms)
+    vector_store = PineconeVectorStore(dimension, index=index)
+    source = os.path.basename(path)
+    vectors = [
+        (make_chunk_id(source, chunk), embedding, {"text": chunk, "source": source})
+        for chunk, embedding in zip(chunks, embeddings)
+    ]
+    start = time.perf_counter()
+    with UpsertEngine(vector_store) as engine:
+        engine.submit(vectors)
+        engine.flush()
+        upsert_stats = engine.stats()
+    upsert_ms = (time.perf_counter() - start) * 1000
+    result["upsert"] = {"ms": round(upsert_ms, 2), "vectors_per_sec": upsert_stats["vectors_per_sec"],
+                        "requests": upsert_stats["requests"]}
+
+    # 5. Query (every question is distinct, so the query-embedding cache never answers)
+    embedding_cache = EmbeddingCache("benchmark", path=os.path.join("bench-cache", f"{fmt}-{source}.sqlite3"))
+    retrieval_agent = RetrievalAgent(vector_store=vector_store, embedding_cache=embedding_cache,
+                                     embedding_model=embedding_model)
+    if retrieval_agent.lexical_index is not None:
+        retrieval_agent.lexical_index.clear()
+        retrieval_agent.lexical_index.add_many((vector_id, metadata["text"]) for vector_id, _, metadata in vectors)
+    context_messages, query_latencies = [], []
+    for query in queries:
+        message = {"payload": {"query": query, "top_k": args.top_k}}
+        response, query_ms = timed(retrieval_agent.retrieve_context, message)
+        query_latencies.append(query_ms)
+        context_messages.append(response)
+    result["query"] = {"queries": len(queries), "ms_p50": percentile(query_latencies, 0.50),
+                       "ms_p95": percentile(query_latencies, 0.95)}
+
+    # 6. Generate (the semantic answer cache is bypassed by not passing the query embedding)
+    llm = FakeChatModel(first_token_ms=args.llm_first_token_ms, token_ms=args.llm_token_ms)
+    llm_agent = LLMResponseAgent(llm=llm)
+    generate_latencies, first_token_latencies, prompt_tokens = [], [], []
+    for response in context_messages:
+        payload = {"query": response["payload"]["query"], "top_chunks": response["payload"]["top_chunks"]}
+        final, generate_ms = timed(llm_agent.generate_response, {"payload": payload})
+        generate_latencies.append(generate_ms)
+        prompt_tokens.append(final["payload"].get("context_stats", {}).get("prompt_tokens", 0))
+        start = time.perf_counter()
+        for message in llm_agent.generate_response_stream({"payload": payload}):
+            if message["type"] == "RESPONSE_TOKEN":
+                first_token_latencies.append((time.perf_counter() - start) * 1000)
+                break
+    result["generate"] = {
+        "ms_p50": percentile(generate_latencies, 0.50), "ms_p95": percentile(generate_latencies, 0.95),
+        "first_token_ms_p50": percentile(first_token_latencies, 0.50),
+        "prompt_tokens_mean": round(statistics.mean(prompt_tokens), 1) if prompt_tokens else None,
+    }
+    return result
+
+
+def flatten(results):
+    """{"txt/small/parse/ms": 12.3, ...} for every numeric metric."""
+    metrics = {}
+    for document, stages in results["documents"].items():
+        for stage, values in stages.items():
+            if isinstance(values, dict):
+                for name, value in values.items():
+                    if isinstance(value, (int, float)):
+                        metrics[f"{document}/{stage}/{name}"] = value
+    return metrics
+
+
+def is_latency(metric):
+    return metric == "ms" or metric.startswith("ms_") or "_ms" in metric
+
+
+def compare(current, baseline, tolerance):
+    """Returns the metrics that regressed: latencies (`ms*`) up, or throughputs (`*_per_sec`) down, by > tolerance."""
+    regressions = []
+    current_metrics, baseline_metrics = flatten(current), flatten(baseline)
+    for name, value in sorted(current_metrics.items()):
+        previous = baseline_metrics.get(name)
+        if not previous:
+            continue
+        metric = name.rsplit("/", 1)[-1]
+        change = (value - previous) / previous
+        if is_latency(metric):
+            regressed = change > tolerance and value - previous > MIN_REGRESSION_MS
+        else:
+            regressed = metric.endswith("_per_sec") and change < -tolerance
+        if regressed:
+            regressions.append({"metric": name, "baseline": previous, "current": value, "change": round(change, 3)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="small,medium", help=f"Comma-separated subset of {list(CORPUS_SIZES)}.")
+    parser.add_argument("--formats", default=",".join(CORPUS_FORMATS), help="Comma-separated document formats.")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--embedding-model", default=None, help="Defaults to the RetrievalAgent's model.")
+    parser.add_argument("--embedding-backend", default=None, help="'torch' or 'onnx' (defaults to EMBEDDING_BACKEND).")
+    parser.add_argument("--pinecone-latency-ms", type=float, default=0.0, help="Simulated network latency per index call.")
+    parser.add_argument("--llm-first-token-ms", type=float, default=0.0, help="Simulated LLM time-to-first-token.")
+    parser.add_argument("--llm-token-ms", type=float, default=0.0, help="Simulated LLM delay per further token.")
+    parser.add_argument("--output", default=None, help="Write the JSON results to this file (default: stdout).")
+    parser.add_argument("--baseline", default=None, help="Compare against this results file.")
+    parser.add_argument("--update-baseline", action="store_true", help=f"Write the results to {DEFAULT_BASELINE}.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown before failing.")
+    parser.add_argument("--verbose", action="store_true", help="Show the agents' own log output.")
+    args = parser.parse_args()
+
+    from embedding_backends import load_embedding_model, DEFAULT_EMBEDDING_BACKEND, DEFAULT_ONNX_DIR
+    from embedding_agent import EMBEDDING_MODEL
+    from ingestion_agent import IngestionAgent
+
+    model_name = args.embedding_model or EMBEDDING_MODEL
+    backend = args.embedding_backend or os.getenv("EMBEDDING_BACKEND", DEFAULT_EMBEDDING_BACKEND)
+    # Keep the exported ONNX model in the repository's cache rather than the throwaway working directory
+    os.environ.setdefault("ONNX_MODEL_DIR", os.path.abspath(DEFAULT_ONNX_DIR))
+    embedding_model, load_ms = timed(load_embedding_model, model_name, backend)
+    queries = generate_queries(args.queries, seed=args.seed + 1)
+    corpus_dir = os.path.join(tempfile.gettempdir(), "rag-benchmark-corpora")
+
+    results = {
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpus": os.cpu_count()},
+        "config": {"embedding_model": model_name, "embedding_backend": backend, "queries": args.queries,
+                   "top_k": args.top_k, "seed": args.seed, "pinecone_latency_ms": args.pinecone_latency_ms,
+                   "llm_first_token_ms": args.llm_first_token_ms, "llm_token_ms": args.llm_token_ms},
+        "embedding_model_load_ms": round(load_ms, 1),
+        "documents": {},
+        "errors": {},
+    }
+
+    # Agents write manifests, caches and indexes under .rag_data, so run in a scratch directory
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="rag-benchmark-") as workdir:
+        os.chdir(workdir)
+        try:
+            with contextlib.ExitStack() as stack:
+                if not args.verbose:
+                    stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, "w"))))
+                ingestion_agent = IngestionAgent(parse_cache=False) # Every run must really parse
+                for size in args.sizes.split(","):
+                    for fmt in args.formats.split(","):
+                        name = f"{fmt}/{size}"
+                        path = build_corpus(corpus_dir, fmt, size, seed=args.seed)
+                        try:
+                            results["documents"][name] = run_document(
+                                path, fmt, args, ingestion_agent, embedding_model, queries
+                            )
+                        except Exception as e: # e.g. unstructured without its PDF/DOCX extras
+                            results["errors"][name] = f"{type(e).__name__}: {e}"
+                        print(f"{name} done", file=sys.stderr)
+        finally:
+            os.chdir(cwd)
+
+    if args.update_baseline:
+        with open(DEFAULT_BASELINE, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline written to {DEFAULT_BASELINE}", file=sys.stderr)
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        results["regressions"] = compare(results, baseline, args.tolerance)
+        for regression in results["regressions"]:
+            print(f"REGRESSION {regression['metric']}: {regression['baseline']} -> {regression['current']} "
+                  f"({regression['change']:+.0%})", file=sys.stderr)
+        exit_code = 1 if results["regressions"] else 0
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
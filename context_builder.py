@@ -0,0 +1,129 @@
+# context_builder.py
+import os
+import re
+
+# --- Context Builder Configuration ---
+# llama3-8b-8192 has an 8192-token window; the rest is left for the prompt, question and answer.
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 3000))
+CHARS_PER_TOKEN = 4 # Close enough to Llama 3's tokenizer on English prose
+MIN_OVERLAP_CHARS = 40 # Shorter shared edges are treated as coincidence, not chunk overlap
+MAX_OVERLAP_CHARS = 400 # IngestionAgent uses chunk_overlap=200
+DUPLICATE_SIMILARITY = 0.85 # Shingle Jaccard similarity above which a chunk counts as a near-duplicate
+SHINGLE_WORDS = 5
+CONTEXT_SEPARATOR = "\n\n---\n\n"
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _shingles(text):
+    words = re.findall(r"\w+", text.lower())
+    if len(words) <= SHINGLE_WORDS:
+        return {tuple(words)}
+    return {tuple(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def _overlap(head, tail):
+    """Length of the longest suffix of `head` that is also a prefix of `tail` (0 if too short)."""
+    probe = tail[:MIN_OVERLAP_CHARS]
+    if len(probe) < MIN_OVERLAP_CHARS:
+        return 0
+    start = max(0, len(head) - MAX_OVERLAP_CHARS)
+    position = head.find(probe, start)
+    while position != -1:
+        if tail.startswith(head[position:]):
+            return len(head) - position
+        position = head.find(probe, position + 1)
+    return 0
+
+
+def _merge(first, second):
+    """Joins two texts from the same source if one contains or overlaps the other; otherwise None."""
+    if second in first:
+        return first
+    if first in second:
+        return second
+    overlap = _overlap(first, second)
+    if overlap:
+        return first + second[overlap:]
+    overlap = _overlap(second, first)
+    if overlap:
+        return second + first[overlap:]
+    return None
+
+
+class ContextBuilder:
+    """
+    Assembles the LLM context from retrieved chunks, which arrive best-first.
+
+    1. Chunks from the same source whose edges overlap (the splitter repeats up to
+       `chunk_overlap` characters between neighbours) are merged into one passage, and a
+       chunk contained in another is dropped.
+    2. Near-duplicate chunks (word-shingle Jaccard similarity) are dropped.
+    3. Passages are added in relevance order until the token budget is full.
+    """
+
+    def __init__(self, token_budget=CONTEXT_TOKEN_BUDGET):
+        self.token_budget = token_budget
+
+    def build(self, chunks):
+        """Returns {"context", "passages", "prompt_tokens", "prompt_tokens_saved", "merged", "duplicates", "omitted"}."""
+        raw_tokens = estimate_tokens(CONTEXT_SEPARATOR.join(chunk['text'] for chunk in chunks))
+        passages = [] # [{"text", "source", "ids", "shingles"}], best-first
+        merged = duplicates = 0
+
+        for chunk in chunks:
+            text = chunk['text'].strip()
+            source = chunk.get('source')
+            chunk_id = chunk.get('id')
+
+            # 1. Merge with a passage from the same source that this chunk continues or precedes
+            target = next((p for p in passages if p['source'] == source and _merge(p['text'], text)), None)
+            if target is not None:
+                target['text'] = _merge(target['text'], text)
+                target['ids'].append(chunk_id)
+                merged += 1
+                # The grown passage may now bridge to another one (e.g. chunks 3 and 5 joined by 4)
+                for other in [p for p in passages if p is not target and p['source'] == source]:
+                    joined = _merge(target['text'], other['text'])
+                    if joined is not None:
+                        target['text'] = joined
+                        target['ids'].extend(other['ids'])
+                        passages.remove(other)
+                target['shingles'] = _shingles(target['text'])
+                continue
+
+            # 2. Drop chunks that say almost exactly what an earlier passage already says
+            shingles = _shingles(text)
+            if any(len(shingles & p['shingles']) / len(shingles | p['shingles']) >= DUPLICATE_SIMILARITY
+                   for p in passages):
+                duplicates += 1
+                continue
+            passages.append({"text": text, "source": source, "ids": [chunk_id], "shingles": shingles})
+
+        # 3. Fill the token budget in relevance order; the best passage is truncated rather than lost
+        selected, used_tokens, omitted = [], 0, 0
+        separator_tokens = estimate_tokens(CONTEXT_SEPARATOR)
+        for passage in passages:
+            cost = estimate_tokens(passage['text']) + (separator_tokens if selected else 0)
+            if used_tokens + cost <= self.token_budget:
+                selected.append(passage['text'])
+                used_tokens += cost
+            elif not selected:
+                selected.append(passage['text'][:self.token_budget * CHARS_PER_TOKEN])
+                used_tokens = estimate_tokens(selected[0])
+            else:
+                omitted += 1
+
+        context = CONTEXT_SEPARATOR.join(selected)
+        prompt_tokens = estimate_tokens(context)
+        return {
+            "context": context,
+            "passages": [{"text": p['text'], "source": p['source'], "ids": p['ids']} for p in passages],
+            "prompt_tokens": prompt_tokens,
+            "prompt_tokens_saved": max(0, raw_tokens - prompt_tokens),
+            "merged": merged,
+            "duplicates": duplicates,
+            "omitted": omitted,
+        }
@@ -0,0 +1,63 @@
+# document_manifest.py
+import os
+import sqlite3
+import hashlib
+import threading
+
+# --- Manifest Configuration ---
+DEFAULT_MANIFEST_DIR = ".rag_data" # Override with DOCUMENT_MANIFEST_DIR
+
+
+def make_chunk_id(source_file, chunk):
+    """Content-derived vector id: stays stable when text earlier in the document shifts."""
+    return f"{source_file}-{hashlib.sha256(chunk.encode('utf-8')).hexdigest()[:16]}"
+
+
+class DocumentManifest:
+    """
+    Records which chunk ids are currently stored for every source document, so a
+    re-ingested document only needs its new chunks upserted and its removed chunks deleted.
+    One manifest file is kept per vector store backend.
+    """
+
+    def __init__(self, store_name, directory=None):
+        directory = directory or os.getenv("DOCUMENT_MANIFEST_DIR", DEFAULT_MANIFEST_DIR)
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"manifest-{store_name}.sqlite3")
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS chunks (source TEXT NOT NULL, chunk_id TEXT NOT NULL, "
+            "PRIMARY KEY (source, chunk_id))"
+        )
+        self._db.commit()
+
+    def chunk_ids(self, source_file):
+        with self._lock:
+            rows = self._db.execute("SELECT chunk_id FROM chunks WHERE source = ?", (source_file,))
+            return {chunk_id for (chunk_id,) in rows}
+
+    def add(self, source_file, chunk_ids):
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO chunks (source, chunk_id) VALUES (?, ?)",
+                [(source_file, chunk_id) for chunk_id in chunk_ids]
+            )
+            self._db.commit()
+
+    def remove(self, source_file, chunk_ids):
+        with self._lock:
+            self._db.executemany(
+                "DELETE FROM chunks WHERE source = ? AND chunk_id = ?",
+                [(source_file, chunk_id) for chunk_id in chunk_ids]
+            )
+            self._db.commit()
+
+    def sources(self):
+        with self._lock:
+            return [source for (source,) in self._db.execute("SELECT DISTINCT source FROM chunks ORDER BY source")]
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM chunks")
+            self._db.commit()
@@ -0,0 +1,125 @@
+# embedding_agent.py
+import os
+import time
+import logging
+
+import numpy as np
+from dotenv import load_dotenv
+
+from mcp import create_mcp_message
+from embedding_cache import EmbeddingCache
+from query_cache import TTLCache
+from embedding_backends import load_embedding_model, DEFAULT_EMBEDDING_BACKEND
+from tracing import span, traced
+
+logger = logging.getLogger(__name__)
+
+# --- Agent Configuration ---
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2' # 384 dimensions
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", 4096))
+QUERY_EMBEDDING_CACHE_TTL_SECONDS = float(os.getenv("QUERY_EMBEDDING_CACHE_TTL_SECONDS", 24 * 3600))
+
+
+class EmbeddingAgent:
+    """
+    Turns chunk and query texts into embeddings. It keeps no knowledge base state: chunk
+    embeddings go through the on-disk embedding cache, which every process can share, and
+    query embeddings through a per-process TTL cache. The RetrievalAgent encodes through
+    one of these; on the MCP bus a pool of them encodes for the single RetrievalAgent
+    worker that owns the vector store.
+    """
+
+    def __init__(self, agent_name="EmbeddingAgent", embedding_model=None, embedding_cache=None):
+        self.name = agent_name
+
+        # Load environment variables
+        load_dotenv()
+
+        # 1. Initialize Embedding Model (do this once for efficiency; the import alone takes seconds)
+        # EMBEDDING_BACKEND='onnx' runs the same model as an int8-quantized ONNX Runtime graph
+        start = time.perf_counter()
+        embedding_backend = os.getenv("EMBEDDING_BACKEND", DEFAULT_EMBEDDING_BACKEND)
+        if embedding_model is None:
+            logger.info(f"Loading embedding model: {EMBEDDING_MODEL} ({embedding_backend} backend)")
+            embedding_model = load_embedding_model(EMBEDDING_MODEL, embedding_backend)
+        self.embedding_model = embedding_model
+        self.embedding_dimension = self.embedding_model.get_sentence_embedding_dimension()
+        self.load_ms = (time.perf_counter() - start) * 1000
+        logger.info(f"Embedding model loaded. Dimension: {self.embedding_dimension}")
+
+        # 2. Chunk embeddings are cached on disk so re-uploaded text is never encoded twice
+        # (quantized embeddings differ slightly, so each backend keeps its own cache entries)
+        cache_model_name = EMBEDDING_MODEL if embedding_backend == "torch" else f"{EMBEDDING_MODEL}@{embedding_backend}"
+        self.embedding_cache = embedding_cache or EmbeddingCache(cache_model_name)
+        # 3. Repeated questions skip the encoder entirely
+        self.query_embedding_cache = TTLCache(QUERY_EMBEDDING_CACHE_SIZE, QUERY_EMBEDDING_CACHE_TTL_SECONDS)
+
+    def encode_chunks(self, chunks):
+        """Returns one embedding per chunk, sending only cache misses to the embedding model."""
+        cached = self.embedding_cache.get_many(chunks)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+
+        embeddings = np.empty((len(chunks), self.embedding_dimension), dtype=np.float32)
+        for i, vector in enumerate(cached):
+            if vector is not None:
+                embeddings[i] = vector
+
+        if missing:
+            # Encode all misses in a single, efficient batch operation
+            missing_chunks = [chunks[i] for i in missing]
+            with span("encode", texts=len(missing_chunks), chars=sum(len(chunk) for chunk in missing_chunks),
+                      cache_hits=len(chunks) - len(missing)):
+                new_embeddings = self.embedding_model.encode(missing_chunks)
+            embeddings[missing] = new_embeddings
+            self.embedding_cache.put_many(missing_chunks, new_embeddings)
+
+        return embeddings
+
+    def encode_query(self, query):
+        """Embeds a query, reusing the cached embedding for a query seen recently."""
+        query_embedding = self.query_embedding_cache.get(query)
+        if query_embedding is None:
+            with span("encode", texts=1, chars=len(query)):
+                query_embedding = self.embedding_model.encode(query)
+            self.query_embedding_cache.put(query, query_embedding)
+        return query_embedding
+
+    def encode_queries(self, queries):
+        """
+        Embeds many queries, encoding every uncached one in a single model call. Returns a
+        list aligned with `queries`, holding None for empty queries.
+        """
+        query_embeddings = [self.query_embedding_cache.get(query) if query else None for query in queries]
+        missing = list(dict.fromkeys(
+            query for query, embedding in zip(queries, query_embeddings) if query and embedding is None
+        ))
+        if not missing:
+            return query_embeddings
+        with span("encode", texts=len(missing), chars=sum(len(query) for query in missing)):
+            encoded = dict(zip(missing, self.embedding_model.encode(missing)))
+        for query, embedding in encoded.items():
+            self.query_embedding_cache.put(query, embedding)
+        return [
+            encoded.get(query) if embedding is None else embedding
+            for query, embedding in zip(queries, query_embeddings)
+        ]
+
+    @traced
+    def embed_chunks(self, mcp_message):
+        """Answers a batch of chunk texts with their embeddings, as one float32 matrix."""
+        chunks = mcp_message.get('payload', {}).get('chunks') or []
+        return create_mcp_message(
+            self.name, mcp_message.get('sender', "Orchestrator"), "CHUNK_EMBEDDINGS",
+            {"embeddings": self.encode_chunks(chunks)}
+        )
+
+    @traced
+    def embed_queries(self, mcp_message):
+        """Answers a list of queries with one embedding per query (None for an empty query)."""
+        queries = mcp_message.get('payload', {}).get('queries') or []
+        embeddings = self.encode_queries(queries)
+        return create_mcp_message(
+            self.name, mcp_message.get('sender', "Orchestrator"), "QUERY_EMBEDDINGS",
+            {"embeddings": [None if embedding is None else np.asarray(embedding, dtype=np.float32)
+                            for embedding in embeddings]}
+        )
@@ -0,0 +1,162 @@
+# embedding_backends.py
+import os
+import re
+import json
+import inspect
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# --- Embedding Backend Configuration ---
+DEFAULT_EMBEDDING_BACKEND = "torch" # Override with EMBEDDING_BACKEND='onnx' on CPU-only nodes
+DEFAULT_ONNX_DIR = os.path.join(".rag_data", "onnx") # Override with ONNX_MODEL_DIR
+ONNX_OPSET = 17
+ENCODE_BATCH_SIZE = 32
+PARITY_THRESHOLD = 0.99 # Minimum cosine similarity between PyTorch and ONNX embeddings of the same text
+
+
+def load_embedding_model(model_name, backend=None):
+    """
+    Returns an embedding model exposing the SentenceTransformer `encode` and
+    `get_sentence_embedding_dimension` API, for backend 'torch' or 'onnx'.
+    """
+    backend = backend or os.getenv("EMBEDDING_BACKEND", DEFAULT_EMBEDDING_BACKEND)
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name, device='cpu') # Use 'cuda' if GPU is available
+    if backend == "onnx":
+        return OnnxEmbeddingModel(model_name)
+    raise ValueError(f"Unknown embedding backend '{backend}'. Expected 'torch' or 'onnx'.")
+
+
+class OnnxEmbeddingModel:
+    """
+    Runs a sentence-transformers model through ONNX Runtime with int8 dynamic quantization.
+
+    On first use the PyTorch model is exported to ONNX, its weights are quantized to int8
+    and the result is cached under ONNX_MODEL_DIR, so later starts only load the graph.
+    Pooling and normalisation replicate the original model's modules, so embeddings stay
+    interchangeable with the PyTorch ones (see `parity_check`).
+    """
+    backend = "onnx"
+
+    def __init__(self, model_name, directory=None, quantize=True):
+        self.model_name = model_name
+        directory = directory or os.getenv("ONNX_MODEL_DIR", DEFAULT_ONNX_DIR)
+        self.directory = os.path.join(directory, re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name))
+        self.quantize = quantize
+        graph_name = "model.int8.onnx" if quantize else "model.onnx"
+        if not os.path.exists(os.path.join(self.directory, graph_name)):
+            self._export()
+
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        with open(os.path.join(self.directory, "embedding_config.json")) as f:
+            self.config = json.load(f)
+        self.tokenizer = AutoTokenizer.from_pretrained(self.directory)
+        session_options = ort.SessionOptions()
+        session_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            os.path.join(self.directory, graph_name), session_options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def _export(self):
+        """Exports the PyTorch model to ONNX and writes the int8-quantized copy next to it."""
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        logger.info(f"Exporting '{self.model_name}' to ONNX in {self.directory}...")
+        os.makedirs(self.directory, exist_ok=True)
+        sentence_model = SentenceTransformer(self.model_name, device='cpu')
+        transformer, pooling = sentence_model[0], sentence_model[1]
+        pooling_mode = getattr(pooling, "pooling_mode", None) or pooling.get_pooling_mode_str()
+        if pooling_mode not in ("mean", "cls"):
+            raise ValueError(f"Pooling mode '{pooling_mode}' is not supported by the ONNX backend.")
+        config = {
+            "dimension": sentence_model.get_sentence_embedding_dimension(),
+            "max_seq_length": sentence_model.max_seq_length,
+            "pooling": pooling_mode,
+            "normalize": any(type(module).__name__ == "Normalize" for module in sentence_model),
+        }
+
+        tokenizer = transformer.tokenizer
+        sample = tokenizer(["an example sentence", "another one"], padding=True, return_tensors="pt")
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+        class TokenEmbeddings(torch.nn.Module):
+            def __init__(self, model):
+                super().__init__()
+                self.model = model
+
+            def forward(self, *inputs):
+                return self.model(**dict(zip(input_names, inputs))).last_hidden_state
+
+        export_kwargs = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+        fp32_path = os.path.join(self.directory, "model.onnx")
+        with torch.no_grad():
+            torch.onnx.export(
+                TokenEmbeddings(transformer.auto_model.eval()), tuple(sample[name] for name in input_names), fp32_path,
+                input_names=input_names, output_names=["last_hidden_state"], dynamic_axes=dynamic_axes,
+                opset_version=ONNX_OPSET, **export_kwargs
+            )
+        if self.quantize:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            quantize_dynamic(fp32_path, os.path.join(self.directory, "model.int8.onnx"), weight_type=QuantType.QInt8)
+
+        tokenizer.save_pretrained(self.directory)
+        with open(os.path.join(self.directory, "embedding_config.json"), "w") as f:
+            json.dump(config, f, indent=2)
+        logger.info("Export complete.")
+
+    def get_sentence_embedding_dimension(self):
+        return self.config["dimension"]
+
+    def encode(self, sentences, batch_size=ENCODE_BATCH_SIZE, normalize_embeddings=None, **kwargs):
+        """Same contract as SentenceTransformer.encode: a string gives a 1-D array, a list a 2-D array."""
+        single = isinstance(sentences, str)
+        sentences = [sentences] if single else list(sentences)
+        normalize = self.config["normalize"] if normalize_embeddings is None else normalize_embeddings
+        embeddings = np.empty((len(sentences), self.config["dimension"]), dtype=np.float32)
+
+        # Batch texts of similar length together so little compute is spent on padding
+        order = np.argsort([-len(sentence) for sentence in sentences], kind="stable")
+        for start in range(0, len(sentences), batch_size):
+            indices = order[start:start + batch_size]
+            tokens = self.tokenizer(
+                [sentences[i] for i in indices], padding=True, truncation=True,
+                max_length=self.config["max_seq_length"], return_tensors="np"
+            )
+            inputs = {name: tokens[name].astype(np.int64) for name in self.input_names}
+            hidden = self.session.run(None, inputs)[0]
+            if self.config["pooling"] == "cls":
+                pooled = hidden[:, 0]
+            else:
+                mask = tokens["attention_mask"][..., None].astype(np.float32)
+                pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            if normalize:
+                pooled = pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+            embeddings[indices] = pooled
+        return embeddings[0] if single else embeddings
+
+
+def parity_check(model_name, texts, threshold=PARITY_THRESHOLD, onnx_model=None):
+    """
+    Encodes `texts` with the PyTorch model and the ONNX model and reports their cosine
+    agreement: {"mean_cosine", "min_cosine", "passed"}.
+    """
+    torch_embeddings = load_embedding_model(model_name, "torch").encode(list(texts))
+    onnx_embeddings = (onnx_model or OnnxEmbeddingModel(model_name)).encode(list(texts))
+    torch_embeddings = torch_embeddings / np.linalg.norm(torch_embeddings, axis=1, keepdims=True)
+    onnx_embeddings = onnx_embeddings / np.linalg.norm(onnx_embeddings, axis=1, keepdims=True)
+    cosines = (torch_embeddings * onnx_embeddings).sum(axis=1)
+    return {
+        "mean_cosine": float(cosines.mean()),
+        "min_cosine": float(cosines.min()),
+        "passed": bool(cosines.min() >= threshold),
+    }
@@ -0,0 +1,124 @@
+# embedding_cache.py
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+
+import numpy as np
+
+# --- Cache Configuration ---
+DEFAULT_CACHE_PATH = os.path.join(".rag_data", "embedding_cache.sqlite3") # Override with EMBEDDING_CACHE_PATH
+DEFAULT_CACHE_MAX_MB = 512 # Override with EMBEDDING_CACHE_MAX_MB
+
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed cache of chunk embeddings.
+
+    Entries are keyed by (model name, SHA-256 of the chunk text) and stored as raw float32
+    blobs in SQLite. When the stored bytes exceed `max_bytes`, the least recently used
+    entries are evicted until the cache is back under 90% of the limit.
+    """
+
+    def __init__(self, model_name, path=None, max_bytes=None):
+        path = path or os.getenv("EMBEDDING_CACHE_PATH", DEFAULT_CACHE_PATH)
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv("EMBEDDING_CACHE_MAX_MB", DEFAULT_CACHE_MAX_MB)) * 1024 * 1024)
+        self.model_name = model_name
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # EmbeddingAgent worker processes share the cache, so wait for each other's writes
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL, last_used REAL NOT NULL, "
+            "PRIMARY KEY (model, text_hash))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._db.commit()
+        self.total_bytes = self._db.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def text_hash(text):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, texts):
+        """Returns a list aligned with `texts` holding cached float32 vectors or None for misses."""
+        hashes = [self.text_hash(text) for text in texts]
+        found = {}
+        with self._lock:
+            # SQLite limits the number of bound parameters, so look keys up in slices.
+            unique_hashes = list(dict.fromkeys(hashes))
+            for i in range(0, len(unique_hashes), 500):
+                batch = unique_hashes[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._db.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [self.model_name, *batch]
+                )
+                for text_hash, blob in rows:
+                    found[text_hash] = np.frombuffer(blob, dtype=np.float32)
+            if found:
+                now = time.time()
+                self._db.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, self.model_name, text_hash) for text_hash in found]
+                )
+                self._db.commit()
+            results = [found.get(text_hash) for text_hash in hashes]
+            hit_count = sum(result is not None for result in results)
+            self.hits += hit_count
+            self.misses += len(results) - hit_count
+        return results
+
+    def put_many(self, texts, vectors):
+        """Stores one embedding per text, then evicts old entries if the cache is over budget."""
+        if self.max_bytes <= 0:
+            return
+        now = time.time()
+        rows = {
+            self.text_hash(text): np.asarray(vector, dtype=np.float32).tobytes()
+            for text, vector in zip(texts, vectors)
+        }
+        with self._lock:
+            cursor = self._db.executemany(
+                "INSERT OR IGNORE INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                [(self.model_name, text_hash, blob, now) for text_hash, blob in rows.items()]
+            )
+            # Every vector from one model has the same size, so count bytes from the inserted rows.
+            self.total_bytes += max(cursor.rowcount, 0) * len(next(iter(rows.values()), b""))
+            if self.total_bytes > self.max_bytes:
+                self._evict(int(self.max_bytes * 0.9))
+            self._db.commit()
+
+    def _evict(self, target_bytes):
+        """Deletes least recently used entries until at most `target_bytes` remain."""
+        cursor = self._db.execute("SELECT rowid, LENGTH(vector) FROM embeddings ORDER BY last_used")
+        to_delete = []
+        remaining = self.total_bytes
+        for rowid, size in cursor:
+            if remaining <= target_bytes:
+                break
+            to_delete.append((rowid,))
+            remaining -= size
+        self._db.executemany("DELETE FROM embeddings WHERE rowid = ?", to_delete)
+        self.evictions += len(to_delete)
+        self.total_bytes = remaining
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "size_mb": round(self.total_bytes / (1024 * 1024), 2),
+        }
@@ -1,61 +1,375 @@
 # ingestion_agent.py 
 import os
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from unstructured.partition.auto import partition
+import csv
+import codecs
+import time
+import logging
+import itertools
+import functools
 
 from mcp import create_mcp_message
+from parse_cache import ParseCache
+from tracing import METRICS, record_span, span, trace, traced
+
+logger = logging.getLogger(__name__)
+
+# --- Agent Configuration ---
+# Parsed text is buffered up to this many characters before it is split, so chunking
+# runs incrementally instead of over one string holding the whole document.
+STREAM_BUFFER_CHARS = 20000
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+PARSER_VERSION = 1 # Part of every parse cache key: bump it whenever a parser's output changes
+ENCODING_SNIFF_BYTES = 64 * 1024 # Files whose start is not valid UTF-8 are read as Latin-1
+
+class DocumentParseError(Exception):
+    """Raised while streaming a document that could not be parsed."""
+
+def detect_encoding(file_path):
+    """'utf-8-sig' if the start of the file decodes as UTF-8 (with or without a BOM), else 'latin-1'."""
+    with open(file_path, "rb") as f:
+        sample = f.read(ENCODING_SNIFF_BYTES)
+    try:
+        # An incremental decoder tolerates a multi-byte character cut off at the end of the sample
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+    except UnicodeDecodeError:
+        return "latin-1"
+    return "utf-8-sig"
+
+def read_text_blocks(file_path, markdown=False):
+    """
+    Yields the blank-line separated paragraphs of a plain text or Markdown file, reading
+    it line by line. Markdown headings become elements of their own, without the '#'s.
+    Paragraphs longer than STREAM_BUFFER_CHARS are cut, so memory stays bounded.
+    """
+    with open(file_path, encoding=detect_encoding(file_path)) as f:
+        paragraph, paragraph_chars = [], 0
+        for line in f:
+            line = line.rstrip()
+            heading = markdown and line.startswith("#") and line.lstrip("#").startswith(" ")
+            if (not line.strip() or heading or paragraph_chars >= STREAM_BUFFER_CHARS) and paragraph:
+                yield "\n".join(paragraph)
+                paragraph, paragraph_chars = [], 0
+            if heading:
+                yield line.lstrip("#").strip()
+            elif line.strip():
+                paragraph.append(line)
+                paragraph_chars += len(line) + 1
+        if paragraph:
+            yield "\n".join(paragraph)
+
+def read_csv_rows(file_path):
+    """Yields one element per CSV row, with every value labelled by its column header ("header: value; ...")."""
+    with open(file_path, encoding=detect_encoding(file_path), newline="") as f:
+        reader = csv.reader(f)
+        header = [name.strip() for name in next(reader, [])]
+        for row in reader:
+            fields = [
+                f"{header[i] if i < len(header) and header[i] else f'column {i + 1}'}: {value.strip()}"
+                for i, value in enumerate(row) if value.strip()
+            ]
+            if fields:
+                yield "; ".join(fields)
+
+# Formats read directly, skipping unstructured's type detection and element objects.
+# Everything else (PDF, DOCX, PPTX, ...) goes through unstructured.partition.
+FAST_PARSERS = {
+    ".txt": ("text", read_text_blocks),
+    ".md": ("markdown", functools.partial(read_text_blocks, markdown=True)),
+    ".markdown": ("markdown", functools.partial(read_text_blocks, markdown=True)),
+    ".csv": ("csv", read_csv_rows),
+}
 
 class IngestionAgent:
-    def __init__(self, agent_name="IngestionAgent"):
+    def __init__(self, agent_name="IngestionAgent", fast_parsers=None, parse_cache=None):
+        """`parse_cache` is a ParseCache, None for the default one (unless PARSE_CACHE=0), or False for none."""
         self.name = agent_name
+        # Plain text, Markdown and CSV skip unstructured unless FAST_PARSERS=0
+        self.fast_parsers = os.getenv("FAST_PARSERS", "1") != "0" if fast_parsers is None else fast_parsers
+        # Files seen before, under any name, are served from the parse cache instead of parsed again
+        if parse_cache is None and os.getenv("PARSE_CACHE", "1") != "0":
+            parse_cache = ParseCache()
+        self.parse_cache = parse_cache or None
+        # LangChain and 'unstructured' are slow to import, so they load when the agent is first needed
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
         self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
+            chunk_size=CHUNK_SIZE,
+            chunk_overlap=CHUNK_OVERLAP,
             length_function=len
         )
 
-    def parse_and_chunk_document(self, file_path):
-        print(f"[{self.name}] Received request to parse {file_path} using 'unstructured'")
-        
+    def _fast_parser(self, file_path):
+        return FAST_PARSERS.get(os.path.splitext(file_path)[1].lower()) if self.fast_parsers else None
+
+    def parser_name(self, file_path):
+        """'text', 'markdown' or 'csv' for the fast paths, else 'unstructured'."""
+        parser = self._fast_parser(file_path)
+        return parser[0] if parser else "unstructured"
+
+    def iter_elements(self, file_path):
+        """
+        Yields the text of each parsed element, releasing elements as they are consumed.
+        Plain text, Markdown and CSV are streamed by the FAST_PARSERS; other formats go
+        through unstructured, which parses the whole file before the first element is
+        yielded (see `_partition_elements`). A file already in the parse cache is not parsed at all.
+        """
+        cache_key, cached = self._cached(file_path)
+        elements = self._read_cached(cache_key, cached, "elements")
+        if elements is not None:
+            return elements
+        return self._parse_and_cache(file_path, cache_key, chunk=False)
+
+    def _parse(self, file_path):
+        parser = self._fast_parser(file_path)
+        if parser is None:
+            return self._partition_elements(file_path)
+        return self._stream_elements(file_path, *parser)
+
+    def _cached(self, file_path):
+        """(cache key, cached parts or None); the key is None when there is no cache or the file is unreadable."""
+        if self.parse_cache is None:
+            return None, None
         try:
-            # 'unstructured' automatically handles different file types
-            elements = partition(filename=file_path)
-            raw_text = "\n\n".join([str(el) for el in elements])
+            cache_key = self.parse_cache.file_key(
+                file_path, parser=self.parser_name(file_path), parser_version=PARSER_VERSION,
+                chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, stream_buffer_chars=STREAM_BUFFER_CHARS
+            )
+        except OSError:
+            return None, None # The parser reports the error
+        cached = self.parse_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Parse cache hit for {file_path}: skipping parsing.")
+        return cache_key, cached
+
+    def _read_cached(self, cache_key, cached, part):
+        """A stream of the cached part's texts, or None if it is not (or no longer) cached."""
+        if cached is None or part not in cached:
+            return None
+        return self.parse_cache.read(cache_key, part)
+
+    def _parse_and_cache(self, file_path, cache_key, chunk):
+        """
+        Streams the document's elements (or, with `chunk`, its chunks). As they stream past,
+        they are also written to the parse cache, which publishes them only once the stream
+        has been consumed to the end; an abandoned or failed stream stores nothing.
+        """
+        texts = self._parse(file_path)
+        if cache_key is None:
+            return self.chunk_texts(texts) if chunk else texts
+        return self._caching_stream(texts, cache_key, chunk, record_elements=True)
+
+    def _caching_stream(self, texts, cache_key, chunk, record_elements):
+        writers = {}
+        if record_elements:
+            writers["elements"] = self.parse_cache.writer(cache_key, "elements")
+            texts = writers["elements"].record(texts)
+        if chunk:
+            writers["chunks"] = self.parse_cache.writer(cache_key, "chunks")
+            texts = writers["chunks"].record(self.chunk_texts(texts))
+        complete = False
+        try:
+            yield from texts
+            complete = True
+        finally:
+            for writer in writers.values():
+                if complete:
+                    writer.commit()
+                else:
+                    writer.abort()
+
+    def _stream_elements(self, file_path, parser_name, parser):
+        """
+        Runs a fast-path parser. Its 'partition' span counts only the time spent reading and
+        parsing, not the time the consumer spends between elements.
+        """
+        try:
+            file_bytes = os.path.getsize(file_path)
+        except OSError as e:
+            raise DocumentParseError(f"Failed to parse as {parser_name}: {e}") from e
+        elements = parser(file_path)
+        parse_seconds, count, error = 0.0, 0, None
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    text = next(elements, None)
+                except (OSError, UnicodeError, csv.Error) as e:
+                    error = type(e).__name__
+                    raise DocumentParseError(f"Failed to parse as {parser_name}: {e}") from e
+                finally:
+                    parse_seconds += time.perf_counter() - start
+                if text is None:
+                    return
+                count += 1
+                yield text
+        finally:
+            record_span(
+                "partition", parse_seconds * 1000, error=error, parser=parser_name, file_bytes=file_bytes, elements=count
+            )
+
+    def _partition_elements(self, file_path):
+        """
+        Parses any format with unstructured.partition, yielding element texts.
+
+        unstructured has no streaming API: `partition` returns the whole element list, so
+        peak memory here grows with the document (all pages of a PDF at once) no matter how
+        lazily the texts are consumed. Elements are released one by one after that, and
+        chunking and storage downstream stay bounded. Only the fast parsers stream from disk.
+        """
+        from unstructured.partition.auto import partition
 
+        try:
+            # 'unstructured' automatically handles different file types
+            with span("partition", parser="unstructured", file_bytes=os.path.getsize(file_path)) as attributes:
+                elements = partition(filename=file_path)
+                attributes["elements"] = len(elements)
         except Exception as e:
+            raise DocumentParseError(f"Failed to parse with unstructured: {str(e)}") from e
+
+        # Pop from the end of a reversed list so each element can be freed once yielded.
+        elements.reverse()
+        while elements:
+            text = str(elements.pop())
+            if text.strip():
+                yield text
+
+    def _split(self, text):
+        with span("split", chars=len(text)) as attributes:
+            chunks = self.text_splitter.split_text(text)
+            attributes["chunks"] = len(chunks)
+        return chunks
+
+    def iter_chunks(self, file_path):
+        """
+        Yields chunks incrementally, splitting a bounded text buffer rather than the full
+        document. Chunks of a file in the parse cache come straight from the cache.
+        """
+        cache_key, cached = self._cached(file_path)
+        chunks = self._read_cached(cache_key, cached, "chunks")
+        if chunks is not None:
+            return chunks
+        elements = self._read_cached(cache_key, cached, "elements")
+        if elements is not None:
+            # Parsed before but never chunked (e.g. by an ingestion job): chunk now and cache the chunks too
+            return self._caching_stream(elements, cache_key, chunk=True, record_elements=False)
+        return self._parse_and_cache(file_path, cache_key, chunk=True)
+
+    def chunk_texts(self, texts):
+        """Splits an iterable of element texts (e.g. `iter_elements` output) into chunks, streaming."""
+        buffer, buffer_chars = [], 0
+        for text in texts:
+            buffer.append(text)
+            buffer_chars += len(text) + 2
+            if buffer_chars >= STREAM_BUFFER_CHARS:
+                chunks = self._split("\n\n".join(buffer))
+                # The last chunk may end mid-thought, so carry it into the next buffer.
+                yield from chunks[:-1]
+                buffer = chunks[-1:]
+                buffer_chars = sum(len(chunk) for chunk in buffer)
+        if buffer:
+            yield from self._split("\n\n".join(buffer))
+
+    @traced
+    def stream_document(self, file_path, source_name=None):
+        """
+        Starts parsing a document and returns a CHUNKS_READY message whose `chunks` is a
+        generator, so chunks can be embedded and stored while the rest are still produced.
+        Errors raised before the first chunk are reported as INGESTION_ERROR; later ones
+        surface as DocumentParseError while the stream is consumed.
+        """
+        logger.info(f"Received request to stream {file_path} using the '{self.parser_name(file_path)}' parser")
+        source_name = source_name or os.path.basename(file_path)
+        chunk_stream = self.iter_chunks(file_path)
+        try:
+            first_chunk = next(chunk_stream, None)
+        except DocumentParseError as e:
+            return create_mcp_message(
+                self.name, "Orchestrator", "INGESTION_ERROR",
+                {"file_path": file_path, "source_file": source_name, "error": str(e)}
+            )
+
+        if first_chunk is None:
+            return create_mcp_message(
+                self.name, "Orchestrator", "INGESTION_ERROR",
+                {"file_path": file_path, "source_file": source_name, "error": "No text extracted from document."}
+            )
+
+        return create_mcp_message(
+            self.name,
+            "RetrievalAgent", # The next agent in the pipeline
+            "CHUNKS_READY",
+            {"chunks": itertools.chain([first_chunk], chunk_stream), "source_file": source_name}
+        )
+
+    @traced
+    def parse_and_chunk_document(self, file_path, source_name=None):
+        """
+        Parses and chunks a document. `source_name` is the name recorded with every chunk;
+        it defaults to the file's basename (callers parsing temp files pass the original name).
+        """
+        logger.info(f"Received request to parse {file_path} using the '{self.parser_name(file_path)}' parser")
+        source_name = source_name or os.path.basename(file_path)
+        
+        try:
+            chunks = list(self.iter_chunks(file_path))
+
+        except DocumentParseError as e:
             error_message = create_mcp_message(
                 self.name, "Orchestrator", "INGESTION_ERROR", 
-                {"file_path": file_path, "error": f"Failed to parse with unstructured: {str(e)}"}
+                {"file_path": file_path, "source_file": source_name, "error": str(e)}
             )
             return error_message
 
-        if not raw_text.strip():
+        if not chunks:
              error_message = create_mcp_message(
                 self.name, "Orchestrator", "INGESTION_ERROR", 
-                {"error": "No text extracted from document."}
+                {"file_path": file_path, "source_file": source_name, "error": "No text extracted from document."}
             )
              return error_message
 
-        chunks = self.text_splitter.split_text(raw_text)
-        print(f"[{self.name}] Successfully chunked document into {len(chunks)} chunks.")
+        logger.info(f"Successfully chunked document into {len(chunks)} chunks.")
         
         # Using MCP to structure the successful response
         response_message = create_mcp_message(
             self.name,
             "RetrievalAgent", # The next agent in the pipeline
             "CHUNKS_READY",
-            {"chunks": chunks, "source_file": os.path.basename(file_path)}
+            {"chunks": chunks, "source_file": source_name}
         )
         return response_message
 
+# One agent per worker process, built on the first task the process receives
+_worker_agent = None
+
+def worker_agent():
+    """The IngestionAgent of this pool worker process."""
+    global _worker_agent
+    if _worker_agent is None:
+        _worker_agent = IngestionAgent(agent_name=f"IngestionAgent-{os.getpid()}")
+    return _worker_agent
+
+def parse_document_worker(file_path, source_name=None, trace_id=None):
+    """
+    Process-pool entry point used by Orchestrator.ingest_documents.
+    Parses and chunks one file and returns the resulting MCP message, which carries the
+    caller's `trace_id`, together with the spans recorded meanwhile; the caller merges
+    them into its own metrics.
+    """
+    with trace(trace_id):
+        message = worker_agent().parse_and_chunk_document(file_path, source_name)
+    return message, METRICS.drain()
+
 # --- Let's test this step ---
 if __name__ == "__main__":
+    from tracing import configure_logging
+
     # Created a dummy file to test
     with open("test.txt", "w") as f:
         f.write("This is a test document powered by unstructured. It should handle this easily.\n" * 50)
         f.write("The agent will parse this text file and split it into chunks using the new library.")
         f.write("\nThis is the final sentence." * 10)
 
+    configure_logging()
     agent = IngestionAgent()
     
     # Test a supported file type
@@ -0,0 +1,387 @@
+# ingestion_jobs.py
+import os
+import gzip
+import json
+import time
+import uuid
+import shutil
+import sqlite3
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from mcp import create_mcp_message
+from ingestion_agent import DocumentParseError, worker_agent
+from tracing import METRICS, new_trace_id, span, trace
+
+logger = logging.getLogger(__name__)
+
+# --- Ingestion Job Configuration ---
+DEFAULT_JOBS_DIR = os.path.join(".rag_data", "ingestion_jobs") # Override with INGESTION_JOBS_DIR
+DEFAULT_JOB_WORKERS = 2 # Override with INGESTION_JOB_WORKERS
+MAX_JOB_ATTEMPTS = 3 # Transient failures are retried; deterministic ones (e.g. an unparseable document) fail at once
+POLL_INTERVAL_SECONDS = 0.5
+CHECKPOINT_COMPRESS_LEVEL = 1 # Checkpoints are written while the document streams through: favour speed
+
+# A job moves through these stages; each one is checkpointed before the next starts
+STAGES = ("queued", "parsed", "chunked", "stored")
+# The step that runs after each stage, with the agent and error type reported when it fails
+NEXT_STEPS = {
+    "queued": ("parse", "IngestionAgent", "INGESTION_ERROR"),
+    "parsed": ("chunk", "IngestionAgent", "INGESTION_ERROR"),
+    "chunked": ("store", "RetrievalAgent", "STORAGE_ERROR"),
+}
+
+
+def write_checkpoint(path, texts):
+    """
+    Streams `texts` into a checkpoint, one line each, and returns how many were written.
+    The file is published atomically, so a crash mid-write leaves the previous stage's
+    checkpoint intact.
+    """
+    count = 0
+    try:
+        with gzip.open(path + ".tmp", "wb", compresslevel=CHECKPOINT_COMPRESS_LEVEL) as f:
+            for text in texts:
+                f.write(json.dumps(text).encode("utf-8") + b"\n")
+                count += 1
+    except BaseException:
+        if os.path.exists(path + ".tmp"):
+            os.remove(path + ".tmp")
+        raise
+    os.replace(path + ".tmp", path)
+    return count
+
+
+def read_checkpoint(path):
+    """Opens a checkpoint and returns a generator over its texts."""
+    return _texts(gzip.open(path, "rt", encoding="utf-8"))
+
+
+def _texts(f):
+    with f:
+        for line in f:
+            yield json.loads(line)
+
+
+def parse_step_worker(stage, file_path, elements_path, chunks_path, trace_id):
+    """
+    Process-pool entry point for a job's parse step (stage 'queued') or chunk step (stage
+    'parsed'): runs it with this worker process's IngestionAgent, streaming the output
+    into its checkpoint. Returns the number of texts written and the spans recorded
+    meanwhile, which the queue merges into its own metrics.
+    """
+    agent = worker_agent()
+    with trace(trace_id):
+        if stage == "queued":
+            count = write_checkpoint(elements_path, agent.iter_elements(file_path))
+        else:
+            count = write_checkpoint(chunks_path, agent.chunk_texts(read_checkpoint(elements_path)))
+    return count, METRICS.drain()
+
+
+class IngestionJobQueue:
+    """
+    Durable, resumable queue of document ingestion jobs, processed by background threads.
+
+    Every job owns a copy of its file, so the caller's temp file can go away at once.
+    Jobs and their checkpoints live in SQLite and in the jobs directory:
+
+      parsed   - the extracted element texts are saved, so a crash never re-runs partition
+      chunked  - the chunks are saved; `chunks_stored` / `batches_stored` then advance as each
+                 upsert batch lands. A resumed job re-sends its chunks, but chunks already in
+                 the document manifest are skipped and embeddings come from the embedding
+                 cache, so it continues after the last stored batch.
+      stored   - done; the job's file and checkpoints are deleted
+
+    Checkpoints are gzip files holding one JSON string per line. They are written as the
+    texts stream out of the parser and chunker, and read back one text at a time, so a job
+    never holds a whole document in memory.
+    Jobs left 'running' by a process that died are picked up again when a queue on the
+    same directory starts. Only one process should run a queue on a given directory.
+    The vector index is saved whenever the queue runs dry, not after every job.
+    """
+
+    def __init__(self, ingestion_agent, retrieval_agent, on_stored=None, directory=None, workers=None,
+                 parse_in_processes=False):
+        """
+        `ingestion_agent` and `retrieval_agent` are callables returning the agents (so they
+        can load lazily); `on_stored` is called after a job has changed the knowledge base.
+        With `parse_in_processes=True` the parse and chunk steps run in a pool of `workers`
+        processes, each with its own IngestionAgent, so they do not hold this process's GIL.
+        """
+        self.directory = directory or os.getenv("INGESTION_JOBS_DIR", DEFAULT_JOBS_DIR)
+        self.workers = workers or int(os.getenv("INGESTION_JOB_WORKERS", DEFAULT_JOB_WORKERS))
+        # 'spawn' keeps workers from inheriting the embedding model's threads from this process
+        self._parse_pool = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+        ) if parse_in_processes else None
+        self._ingestion_agent = ingestion_agent
+        self._retrieval_agent = retrieval_agent
+        self._on_stored = on_stored
+        os.makedirs(self.directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._store_lock = threading.Lock() # Parsing runs in parallel; embedding and storing one job at a time
+        self._unsaved = False # Jobs have been stored since the vector index was last saved
+        self._wake = threading.Condition()
+        self._closed = threading.Event()
+        self._threads = []
+        self._db = sqlite3.connect(os.path.join(self.directory, "jobs.sqlite3"), check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "job_id TEXT PRIMARY KEY, source_file TEXT NOT NULL, file_path TEXT NOT NULL, trace_id TEXT NOT NULL, "
+            "state TEXT NOT NULL, stage TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+            "chunks_total INTEGER, chunks_stored INTEGER NOT NULL DEFAULT 0, batches_stored INTEGER NOT NULL DEFAULT 0, "
+            "error TEXT, result TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, created_at)")
+        # Jobs that were running when the previous process stopped resume from their last checkpoint
+        resumed = self._db.execute("UPDATE jobs SET state = 'queued' WHERE state = 'running'").rowcount
+        self._db.commit()
+        if resumed:
+            logger.info(f"Resuming {resumed} interrupted ingestion job(s).")
+
+    def start(self):
+        """Starts the worker threads. Safe to call more than once."""
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"ingestion-job-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, file_path, source_name=None):
+        """Queues a copy of `file_path` for ingestion and returns the job id."""
+        job_id = uuid.uuid4().hex
+        source_name = source_name or os.path.basename(file_path)
+        job_file = self._path(job_id, "source" + os.path.splitext(file_path)[1])
+        shutil.copyfile(file_path, job_file)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (job_id, source_file, file_path, trace_id, state, stage, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, 'queued', 'queued', ?, ?)",
+                (job_id, source_name, job_file, new_trace_id(), now, now)
+            )
+            self._db.commit()
+        logger.info(f"Queued ingestion job {job_id} for '{source_name}'.")
+        self.start()
+        with self._wake:
+            self._wake.notify()
+        return job_id
+
+    def status(self, job_id):
+        """The job's state ('queued', 'running', 'succeeded', 'failed'), stage and progress, or None."""
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._as_status(row) if row else None
+
+    def jobs(self, limit=100):
+        """The most recently submitted jobs, newest first."""
+        with self._lock:
+            rows = self._db.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [self._as_status(row) for row in rows]
+
+    def wait(self, job_id, timeout=None):
+        """Blocks until the job has succeeded or failed (or `timeout` passes) and returns its status."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            status = self.status(job_id)
+            if status is None or status["state"] in ("succeeded", "failed"):
+                return status
+            if deadline is not None and time.monotonic() >= deadline:
+                return status
+            time.sleep(POLL_INTERVAL_SECONDS)
+
+    def close(self, timeout=None):
+        """Stops the workers once their current job is done. Unfinished jobs resume on the next start."""
+        self._closed.set()
+        with self._wake:
+            self._wake.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        if self._parse_pool is not None:
+            self._parse_pool.shutdown(wait=True, cancel_futures=True)
+        self._persist()
+
+    @staticmethod
+    def _as_status(row):
+        status = dict(row)
+        status["result"] = json.loads(status["result"]) if status["result"] else None
+        del status["file_path"]
+        return status
+
+    def _path(self, job_id, name):
+        return os.path.join(self.directory, f"{job_id}.{name}")
+
+    def _update(self, job_id, **fields):
+        fields["updated_at"] = time.time()
+        with self._lock:
+            self._db.execute(
+                f"UPDATE jobs SET {', '.join(f'{name} = ?' for name in fields)} WHERE job_id = ?",
+                (*fields.values(), job_id)
+            )
+            self._db.commit()
+
+    def _claim(self):
+        """Marks the oldest queued job as running and returns it, or None when there is no work."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT * FROM jobs WHERE state = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute(
+                "UPDATE jobs SET state = 'running', attempts = attempts + 1, updated_at = ? WHERE job_id = ?",
+                (time.time(), row["job_id"])
+            )
+            self._db.commit()
+        return dict(row, attempts=row["attempts"] + 1)
+
+    def _work(self):
+        while not self._closed.is_set():
+            job = self._claim()
+            if job is None:
+                self._persist()
+                with self._wake:
+                    self._wake.wait(POLL_INTERVAL_SECONDS)
+                continue
+            with trace(job["trace_id"]):
+                self._run(job)
+
+    def _run(self, job):
+        job_id = job["job_id"]
+        retryable = False # Error messages returned by the agents say themselves whether they are transient
+        try:
+            with span("ingestion_job", resumed_from=job["stage"]):
+                result = self._resume(job)
+        except DocumentParseError as e:
+            result = create_mcp_message(
+                "IngestionAgent", "Orchestrator", "INGESTION_ERROR", {"source_file": job["source_file"], "error": str(e)}
+            )
+        except Exception as e:
+            # Unexpected errors (I/O, a worker that died, ...) may be transient, so the job is retried
+            step, sender, error_type = NEXT_STEPS[job["stage"]]
+            logger.exception(f"Ingestion job {job_id} failed in its '{step}' step")
+            result = create_mcp_message(
+                sender, "Orchestrator", error_type,
+                {"source_file": job["source_file"], "stage": step, "error": f"{step} failed: {type(e).__name__}: {e}"}
+            )
+            retryable = True
+
+        if result['type'] == "STORAGE_SUCCESS":
+            self._finish(job, "succeeded", result)
+        elif not (retryable or result['payload'].get('retryable')):
+            self._finish(job, "failed", result)
+        elif job["attempts"] < MAX_JOB_ATTEMPTS:
+            logger.warning(f"Ingestion job {job_id} will be retried: {result['payload'].get('error')}")
+            self._update(job_id, state="queued", error=result['payload'].get('error'))
+        else:
+            self._finish(job, "failed", result)
+
+    def _resume(self, job):
+        """Runs the job's remaining stages, checkpointing after each one."""
+        job_id, source_file = job["job_id"], job["source_file"]
+
+        # Agents in MCP bus workers cannot stream elements back, so they parse and chunk in one step
+        if (job["stage"] == "queued" and self._parse_pool is None
+                and not hasattr(self._ingestion_agent(), "iter_elements")):
+            mcp_from_ingestion = self._ingestion_agent().parse_and_chunk_document(job["file_path"], source_file)
+            if mcp_from_ingestion['type'] == 'INGESTION_ERROR':
+                return mcp_from_ingestion
+            chunks = mcp_from_ingestion['payload']['chunks']
+            write_checkpoint(self._path(job_id, "chunks.jsonl.gz"), chunks)
+            self._update(job_id, stage="chunked", chunks_total=len(chunks))
+            job.update(stage="chunked", chunks_total=len(chunks))
+
+        # 1. Parse, streaming the element texts into their checkpoint (skipped once it exists)
+        if job["stage"] == "queued":
+            logger.info(f"Job {job_id}: parsing '{source_file}'...")
+            self._parse_step(job)
+            self._update(job_id, stage="parsed")
+            job["stage"] = "parsed"
+
+        # 2. Chunk the parsed text, reading the elements back one at a time
+        if job["stage"] == "parsed":
+            chunk_count = self._parse_step(job)
+            if not chunk_count:
+                return create_mcp_message(
+                    "IngestionAgent", "Orchestrator", "INGESTION_ERROR",
+                    {"source_file": source_file, "error": "No text extracted from document."}
+                )
+            os.remove(self._path(job_id, "elements.jsonl.gz"))
+            self._update(job_id, stage="chunked", chunks_total=chunk_count)
+            job.update(stage="chunked", chunks_total=chunk_count)
+            logger.info(f"Job {job_id}: {chunk_count} chunks checkpointed.")
+
+        # 3. Embed and store the chunks as they are read back; batches already in the vector
+        # store are skipped on a resumed run
+        chunks = read_checkpoint(self._path(job_id, "chunks.jsonl.gz"))
+        progress = {"chunks": job["chunks_stored"], "batches": job["batches_stored"]}
+
+        def record_batch(chunk_count):
+            progress["chunks"] += chunk_count
+            progress["batches"] += 1
+            self._update(job_id, chunks_stored=progress["chunks"], batches_stored=progress["batches"])
+
+        mcp_chunks_ready = create_mcp_message(
+            "IngestionAgent", "RetrievalAgent", "CHUNKS_READY", {"chunks": chunks, "source_file": source_file}
+        )
+        with self._store_lock:
+            self._unsaved = True
+            try:
+                result = self._retrieval_agent().embed_and_store(
+                    mcp_chunks_ready, on_batch_stored=record_batch, persist=False
+                )
+            finally:
+                chunks.close() # Closes the checkpoint if the store stopped reading part-way
+                if self._on_stored is not None:
+                    self._on_stored()
+        return result
+
+    def _parse_step(self, job):
+        """Runs the parse or chunk step that follows the job's stage and returns how many texts it checkpointed."""
+        elements_path = self._path(job["job_id"], "elements.jsonl.gz")
+        chunks_path = self._path(job["job_id"], "chunks.jsonl.gz")
+        if self._parse_pool is not None:
+            count, spans = self._parse_pool.submit(
+                parse_step_worker, job["stage"], job["file_path"], elements_path, chunks_path, job["trace_id"]
+            ).result()
+            for span_record in spans: # Spans from the worker process join this process's metrics
+                METRICS.record(span_record)
+            return count
+        if job["stage"] == "queued":
+            return write_checkpoint(elements_path, self._ingestion_agent().iter_elements(job["file_path"]))
+        return write_checkpoint(chunks_path, self._ingestion_agent().chunk_texts(read_checkpoint(elements_path)))
+
+    def _persist(self):
+        """Saves the vector index if jobs were stored since the last save."""
+        with self._store_lock:
+            if not self._unsaved:
+                return
+            self._unsaved = False
+            try:
+                self._retrieval_agent().persist()
+            except Exception:
+                self._unsaved = True
+                logger.exception("Saving the vector index failed")
+
+    def _finish(self, job, state, result):
+        if state == "succeeded":
+            # Unchanged chunks of a re-ingested document (and agents on the MCP bus) report no batches
+            self._update(job["job_id"], state=state, stage="stored", chunks_stored=job["chunks_total"],
+                         result=json.dumps(result), error=None)
+        else:
+            self._update(job["job_id"], state=state, result=json.dumps(result), error=result['payload'].get('error'))
+        # The job's file and checkpoints are no longer needed once it has finished
+        for name in ("source" + os.path.splitext(job["file_path"])[1], "elements.jsonl.gz", "chunks.jsonl.gz"):
+            if os.path.exists(self._path(job["job_id"], name)):
+                os.remove(self._path(job["job_id"], name))
+        if state == "failed":
+            logger.error(f"Ingestion job {job['job_id']} for '{job['source_file']}' failed: {result['payload'].get('error')}")
+        else:
+            logger.info(f"Ingestion job {job['job_id']} for '{job['source_file']}' succeeded.")
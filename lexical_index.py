@@ -0,0 +1,257 @@
+# lexical_index.py
+import os
+import re
+import math
+import pickle
+import sqlite3
+import threading
+from array import array
+from collections import Counter
+
+import numpy as np
+
+# --- Lexical Index Configuration ---
+DEFAULT_INDEX_DIR = ".rag_data" # Override with LEXICAL_INDEX_DIR
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60 # Standard reciprocal rank fusion constant
+MAX_DOC_FREQ_RATIO = 0.5 # Terms in more than half of all chunks carry almost no BM25 weight and are skipped...
+MIN_DOCS_FOR_DOC_FREQ_CUTOFF = 100 # ...once there are enough chunks; in a small corpus every term may be that common
+SNAPSHOT_CHANGE_RATIO = 0.25 # The change log is folded into a new snapshot once it holds this many changes per chunk
+SNAPSHOT_MIN_CHANGES = 1000
+
+# Keeps identifiers such as "AB-1234", "v2.1" or "snake_case" together as one token
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+
+
+def tokenize(text):
+    """Lowercased tokens; compound identifiers are indexed both whole and by their parts."""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(re.split(r"[-_./]", token))
+    return tokens
+
+
+def reciprocal_rank_fusion(ranked_id_lists, k=RRF_K):
+    """Fuses several ranked lists of ids into one list of (id, score), best first."""
+    scores = {}
+    for ranked_ids in ranked_id_lists:
+        for rank, item_id in enumerate(ranked_ids):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class BM25Index:
+    """
+    Compact in-process BM25 inverted index over chunk texts.
+
+    Each term's postings are two growable uint32 arrays (document numbers and term
+    frequencies), so scoring a query is a handful of vectorised NumPy operations.
+    Documents are appended incrementally; removals are tombstoned and the postings are
+    compacted once a quarter of the documents are dead.
+
+    On disk, the index is a pickled snapshot plus a SQLite log of the changes made since.
+    `save` appends only the changes since the previous save, so saving after every
+    document costs time proportional to that document, not to the index. Once the log
+    holds SNAPSHOT_CHANGE_RATIO changes per indexed chunk, it is folded into a new
+    snapshot. Construction loads the snapshot and replays the log.
+    """
+
+    def __init__(self, store_name, directory=None):
+        directory = directory or os.getenv("LEXICAL_INDEX_DIR", DEFAULT_INDEX_DIR)
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"lexical-{store_name}.pkl")
+        self._lock = threading.RLock()
+        self._reset()
+        self._pending = [] # (chunk_id, text) changes not yet saved; a text of None is a removal
+        self._snapshot_due = False
+        if os.path.exists(self.path):
+            with open(self.path, "rb") as f:
+                state = pickle.load(f)
+            self.doc_ids, self.doc_lengths, self.alive, self.postings = state
+            self.id_to_doc = {doc_id: doc for doc, doc_id in enumerate(self.doc_ids) if self.alive[doc]}
+            self.total_length = sum(self.doc_lengths[doc] for doc in self.id_to_doc.values())
+
+        self._log = sqlite3.connect(os.path.join(directory, f"lexical-{store_name}.log.sqlite3"), check_same_thread=False)
+        self._log.execute(
+            "CREATE TABLE IF NOT EXISTS changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, chunk_id TEXT NOT NULL, text TEXT)"
+        )
+        self._log.commit()
+        # Replaying is idempotent, so changes already in the snapshot (after a crash mid-snapshot) do no harm
+        self.logged_changes = 0
+        for chunk_id, text in self._log.execute("SELECT chunk_id, text FROM changes ORDER BY seq"):
+            if text is None:
+                self._remove_one(chunk_id)
+            else:
+                self._add(chunk_id, text)
+            self.logged_changes += 1
+
+    def _reset(self):
+        self.doc_ids = []                # doc number -> chunk id
+        self.doc_lengths = array("I")    # doc number -> token count
+        self.alive = bytearray()         # doc number -> 1 if live, 0 if tombstoned
+        self.postings = {}               # term -> (array of doc numbers, array of term frequencies)
+        self.id_to_doc = {}
+        self.total_length = 0
+        self._impacts = None             # term -> cached posting weights, see _term_impacts
+        self._norms = None               # doc number -> length normalisation the cached weights used
+
+    def __contains__(self, chunk_id):
+        return chunk_id in self.id_to_doc
+
+    def __len__(self):
+        return len(self.id_to_doc)
+
+    def add(self, chunk_id, text):
+        with self._lock:
+            self._add(chunk_id, text)
+            self._pending.append((chunk_id, text))
+
+    def _add(self, chunk_id, text):
+        if chunk_id in self.id_to_doc:
+            self._remove_one(chunk_id)
+        doc = len(self.doc_ids)
+        term_counts = Counter(tokenize(text))
+        self.doc_ids.append(chunk_id)
+        self.doc_lengths.append(sum(term_counts.values()))
+        self.alive.append(1)
+        self.id_to_doc[chunk_id] = doc
+        self.total_length += self.doc_lengths[doc]
+        self._impacts = None
+        for term, count in term_counts.items():
+            docs, freqs = self.postings.setdefault(term, (array("I"), array("I")))
+            docs.append(doc)
+            freqs.append(count)
+
+    def add_many(self, items):
+        for chunk_id, text in items:
+            self.add(chunk_id, text)
+
+    def _remove_one(self, chunk_id):
+        doc = self.id_to_doc.pop(chunk_id, None)
+        if doc is not None:
+            self.alive[doc] = 0
+            self.total_length -= self.doc_lengths[doc]
+            self._impacts = None
+
+    def remove(self, chunk_ids):
+        with self._lock:
+            for chunk_id in chunk_ids:
+                self._remove_one(chunk_id)
+                self._pending.append((chunk_id, None))
+            if len(self.doc_ids) > 1000 and len(self.id_to_doc) < 0.75 * len(self.doc_ids):
+                self._compact()
+
+    def _compact(self):
+        """Rebuilds the postings without tombstoned documents, renumbering the live ones."""
+        alive = np.frombuffer(self.alive, dtype=np.uint8).astype(bool)
+        new_numbers = np.cumsum(alive, dtype=np.int64) - 1
+        postings = {}
+        for term, (docs, freqs) in self.postings.items():
+            docs = np.frombuffer(docs, dtype=np.uint32)
+            keep = alive[docs]
+            if keep.any():
+                postings[term] = (
+                    array("I", new_numbers[docs[keep]].astype(np.uint32).tobytes()),
+                    array("I", np.frombuffer(freqs, dtype=np.uint32)[keep].tobytes()),
+                )
+        self.doc_ids = [doc_id for doc_id, live in zip(self.doc_ids, self.alive) if live]
+        self.doc_lengths = array("I", np.frombuffer(self.doc_lengths, dtype=np.uint32)[alive].tobytes())
+        self.alive = bytearray(b"\x01" * len(self.doc_ids))
+        self.postings = postings
+        self.id_to_doc = {doc_id: doc for doc, doc_id in enumerate(self.doc_ids)}
+        self._impacts = None
+
+    def _term_impacts(self, term):
+        """
+        Each of a term's postings' BM25 weight before idf. Cached until the index next
+        changes: queries share most of their terms, so a search mostly reads precomputed
+        weights instead of recomputing them from frequencies and document lengths.
+        """
+        if self._impacts is None:
+            avg_length = self.total_length / len(self.id_to_doc)
+            doc_lengths = np.frombuffer(self.doc_lengths, dtype=np.uint32)
+            self._norms = (BM25_K1 * (1 - BM25_B + BM25_B * doc_lengths / avg_length)).astype(np.float32)
+            self._impacts = {}
+        if term not in self._impacts:
+            docs, freqs = self.postings[term]
+            freqs = np.frombuffer(freqs, dtype=np.uint32).astype(np.float32)
+            self._impacts[term] = freqs * (BM25_K1 + 1) / (freqs + self._norms[np.frombuffer(docs, dtype=np.uint32)])
+        return self._impacts[term]
+
+    def search(self, query, top_k=20):
+        """Returns up to `top_k` (chunk_id, bm25_score) pairs, best first."""
+        with self._lock:
+            live_docs = len(self.id_to_doc)
+            if not live_docs:
+                return []
+            tombstones = live_docs < len(self.doc_ids)
+            alive = np.frombuffer(self.alive, dtype=np.uint8).view(bool)
+
+            scores, sample = None, None
+            for term in set(tokenize(query)):
+                if term not in self.postings:
+                    continue
+                docs = self.postings[term][0]
+                if live_docs >= MIN_DOCS_FOR_DOC_FREQ_CUTOFF and len(docs) > MAX_DOC_FREQ_RATIO * len(self.doc_ids):
+                    continue
+                docs = np.frombuffer(docs, dtype=np.uint32)
+                impacts = self._term_impacts(term)
+                if tombstones:
+                    live = alive[docs]
+                    docs, impacts = docs[live], impacts[live]
+                if not len(docs):
+                    continue
+                idf = math.log(1 + (live_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                # Accumulate into one dense score array; cost scales with the postings touched
+                if scores is None:
+                    scores = np.zeros(len(self.doc_ids), dtype=np.float32)
+                np.add.at(scores, docs, np.float32(idf) * impacts)
+                if len(docs) >= top_k and (sample is None or len(docs) < len(sample)):
+                    sample = docs
+            if scores is None:
+                return []
+
+            # The k-th best score among any k documents bounds the k-th best overall, so only the
+            # documents scoring at least that (taken from the rarest term's matches) need ranking
+            if sample is None:
+                candidates = np.flatnonzero(scores)
+            else:
+                threshold = -np.partition(-scores[sample], top_k - 1)[top_k - 1]
+                candidates = np.flatnonzero(scores >= threshold)
+            top_k = min(top_k, len(candidates))
+            top = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+            top = top[np.argsort(-scores[top])]
+            return [(self.doc_ids[doc], float(scores[doc])) for doc in top]
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+            self._pending = []
+            self._snapshot_due = True
+
+    def save(self):
+        """Writes the changes made since the last save to disk (as a new snapshot, when one is due)."""
+        with self._lock:
+            changes = self.logged_changes + len(self._pending)
+            if self._snapshot_due or changes >= max(SNAPSHOT_MIN_CHANGES, SNAPSHOT_CHANGE_RATIO * len(self.id_to_doc)):
+                self._snapshot()
+            elif self._pending:
+                self._log.executemany("INSERT INTO changes (chunk_id, text) VALUES (?, ?)", self._pending)
+                self._log.commit()
+                self.logged_changes = changes
+            self._pending = []
+
+    def _snapshot(self):
+        """Pickles the whole index atomically, then empties the change log it now includes."""
+        state = (self.doc_ids, self.doc_lengths, self.alive, self.postings)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+        self._log.execute("DELETE FROM changes")
+        self._log.commit()
+        self.logged_changes = 0
+        self._snapshot_due = False
@@ -1,24 +1,28 @@
 
 import os
+import time
+import logging
 from dotenv import load_dotenv
 
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from langchain_groq import ChatGroq
-
 from mcp import create_mcp_message
+from semantic_cache import SemanticAnswerCache
+from context_builder import ContextBuilder
+from tracing import span, traced
+
+logger = logging.getLogger(__name__)
 
 # --- Agent Configuration ---
 # Using a fast and capable model from Groq
 LLM_MODEL = "llama3-8b-8192" 
 
 class LLMResponseAgent:
-    def __init__(self, agent_name="LLMResponseAgent"):
+    def __init__(self, agent_name="LLMResponseAgent", llm=None):
         self.name = agent_name
-        print(f"[{self.name}] Initializing...")
+        logger.info("Initializing...")
         
         load_dotenv()
-        if not os.getenv("GROQ_API_KEY"):
+        # `llm` lets callers supply any LangChain chat model (e.g. the benchmark fake) instead of Groq
+        if llm is None and not os.getenv("GROQ_API_KEY"):
             raise ValueError("GROQ_API_KEY is not set in the .env file.")
 
         # The RAG prompt template is crucial for instructing the LLM
@@ -40,22 +44,36 @@ class LLMResponseAgent:
         4. Do not use any external knowledge or make up information.
         """
         
-        # Initialize the LangChain components
+        # Initialize the LangChain components (imported here: they are slow to import and only needed once)
+        start = time.perf_counter()
+        from langchain_core.prompts import ChatPromptTemplate
+        from langchain_core.output_parsers import StrOutputParser
+
         prompt = ChatPromptTemplate.from_template(prompt_template)
         
-        llm = ChatGroq(
-            model=LLM_MODEL,
-            temperature=0, # Low temperature for factual, less creative answers
-        )
+        if llm is None:
+            from langchain_groq import ChatGroq
+            llm = ChatGroq(
+                model=LLM_MODEL,
+                temperature=0, # Low temperature for factual, less creative answers
+            )
         
         # Define the chain of operations: Prompt -> LLM -> String Output
         self.rag_chain = prompt | llm | StrOutputParser()
+        self.startup_timings = {"llm_client": (time.perf_counter() - start) * 1000}
+
+        # Answers for paraphrased questions over the same chunks are served without an LLM call
+        self.semantic_cache = SemanticAnswerCache()
+        # Merges overlapping chunks, drops near-duplicates and keeps the context within a token budget
+        self.context_builder = ContextBuilder()
         
-        print(f"[{self.name}] Initialized with model {LLM_MODEL}.")
+        logger.info(f"Initialized with model {getattr(llm, 'model_name', type(llm).__name__)}.")
 
-    def generate_response(self, mcp_message):
-        """Receives context and a query, then generates a final answer."""
-        payload = mcp_message.get('payload', {})
+    def _early_response(self, payload):
+        """
+        Returns a response that needs no LLM call (missing query, no context, or a
+        semantic cache hit), or None when the answer has to be generated.
+        """
         query = payload.get('query')
         context_chunks = payload.get('top_chunks', [])
 
@@ -64,41 +82,173 @@ class LLMResponseAgent:
 
         # If the retrieval agent found no relevant context, respond accordingly without calling the LLM.
         if not context_chunks:
-            print(f"[{self.name}] No context provided. Replying directly.")
+            logger.info("No context provided. Replying directly.")
             no_context_answer = "The provided documents do not contain information on this topic."
             return create_mcp_message(
                 self.name, "Orchestrator", "FINAL_RESPONSE",
                 {"answer": no_context_answer, "source_context": []}
             )
 
-        print(f"[{self.name}] Generating response for query: '{query}'")
+        # Reuse the answer to an earlier paraphrase of this question, if one retrieved the same chunks
+        query_embedding = payload.get('query_embedding')
+        if query_embedding is not None:
+            cached = self.semantic_cache.lookup(query_embedding, self._chunk_ids(context_chunks), payload.get('kb_version'))
+            if cached is not None:
+                logger.info(f"Semantic cache hit (similarity {cached['similarity']:.3f}). Skipping the LLM.")
+                return create_mcp_message(
+                    self.name, "Orchestrator", "FINAL_RESPONSE",
+                    {"answer": cached['answer'], "source_context": cached['source_context'], "cached": "semantic"}
+                )
+        return None
+
+    def _build_context(self, context_chunks):
+        """Returns the formatted context for the prompt and its token statistics."""
+        built = self.context_builder.build(context_chunks)
+        context_stats = {
+            key: built[key] for key in ("prompt_tokens", "prompt_tokens_saved", "merged", "duplicates", "omitted")
+        }
+        logger.info(f"Context: ~{built['prompt_tokens']} tokens, ~{built['prompt_tokens_saved']} saved "
+                    f"({built['merged']} merged, {built['duplicates']} duplicates, {built['omitted']} over budget).")
+        return built['context'], context_stats
+
+    @staticmethod
+    def _chunk_ids(context_chunks):
+        return [chunk['id'] for chunk in context_chunks if 'id' in chunk]
+
+    def _remember_answer(self, payload, answer):
+        if payload.get('query_embedding') is not None:
+            context_chunks = payload.get('top_chunks', [])
+            self.semantic_cache.store(
+                payload['query_embedding'], self._chunk_ids(context_chunks), answer, context_chunks, payload.get('kb_version')
+            )
+
+    @traced
+    def generate_response(self, mcp_message):
+        """Receives context and a query, then generates a final answer."""
+        payload = mcp_message.get('payload', {})
+        early_response = self._early_response(payload)
+        if early_response is not None:
+            return early_response
+
+        query = payload['query']
+        context_chunks = payload['top_chunks']
+        logger.info(f"Generating response for query: '{query}'")
         
-        # Format the context chunks into a single string for the prompt
-        formatted_context = "\n\n---\n\n".join([chunk['text'] for chunk in context_chunks])
+        # Format the context chunks into a single, de-duplicated string for the prompt
+        formatted_context, context_stats = self._build_context(context_chunks)
         
         # Invoke the RAG chain with the context and question
         try:
-            final_answer = self.rag_chain.invoke({
-                "context": formatted_context,
-                "question": query
-            })
+            with span("llm", prompt_tokens=context_stats['prompt_tokens']) as attributes:
+                final_answer = self.rag_chain.invoke({
+                    "context": formatted_context,
+                    "question": query
+                })
+                attributes["answer_chars"] = len(final_answer)
         except Exception as e:
-            print(f"[{self.name}] Error during LLM invocation: {e}")
+            logger.error(f"Error during LLM invocation: {e}")
             return create_mcp_message(self.name, "Orchestrator", "RESPONSE_ERROR", {"error": str(e)})
 
-        print(f"[{self.name}] Successfully generated answer.")
+        logger.info("Successfully generated answer.")
+        self._remember_answer(payload, final_answer)
         
         # Return the final, structured response, including the source context for transparency.
         return create_mcp_message(
             self.name, "Orchestrator", "FINAL_RESPONSE",
-            {"answer": final_answer, "source_context": context_chunks}
+            {"answer": final_answer, "source_context": context_chunks, "context_stats": context_stats}
+        )
+
+    @traced
+    async def agenerate_response(self, mcp_message):
+        """Async variant of generate_response; awaits the LLM through the chain's native async client."""
+        payload = mcp_message.get('payload', {})
+        early_response = self._early_response(payload)
+        if early_response is not None:
+            return early_response
+
+        query = payload['query']
+        context_chunks = payload['top_chunks']
+        logger.info(f"Generating response asynchronously for query: '{query}'")
+        formatted_context, context_stats = self._build_context(context_chunks)
+
+        try:
+            with span("llm", prompt_tokens=context_stats['prompt_tokens']) as attributes:
+                final_answer = await self.rag_chain.ainvoke({
+                    "context": formatted_context,
+                    "question": query
+                })
+                attributes["answer_chars"] = len(final_answer)
+        except Exception as e:
+            logger.error(f"Error during LLM invocation: {e}")
+            return create_mcp_message(self.name, "Orchestrator", "RESPONSE_ERROR", {"error": str(e)})
+
+        logger.info("Successfully generated answer.")
+        self._remember_answer(payload, final_answer)
+        return create_mcp_message(
+            self.name, "Orchestrator", "FINAL_RESPONSE",
+            {"answer": final_answer, "source_context": context_chunks, "context_stats": context_stats}
+        )
+
+    @traced
+    def generate_response_stream(self, mcp_message):
+        """
+        Streaming variant of generate_response. Yields a RESPONSE_TOKEN message for every
+        token as the LLM produces it, then one FINAL_RESPONSE (or RESPONSE_ERROR) message
+        carrying the full answer, the source context and the LLM's time-to-first-token.
+        """
+        payload = mcp_message.get('payload', {})
+        early_response = self._early_response(payload)
+        if early_response is not None:
+            yield early_response
+            return
+
+        query = payload['query']
+        context_chunks = payload['top_chunks']
+        logger.info(f"Streaming response for query: '{query}'")
+        formatted_context, context_stats = self._build_context(context_chunks)
+
+        start = time.perf_counter()
+        time_to_first_token_ms = None
+        answer_parts = []
+        try:
+            with span("llm", prompt_tokens=context_stats['prompt_tokens']) as attributes:
+                for token in self.rag_chain.stream({"context": formatted_context, "question": query}):
+                    if not token:
+                        continue
+                    if time_to_first_token_ms is None:
+                        time_to_first_token_ms = (time.perf_counter() - start) * 1000
+                        attributes["first_token_ms"] = time_to_first_token_ms
+                    answer_parts.append(token)
+                    yield create_mcp_message(self.name, "Orchestrator", "RESPONSE_TOKEN", {"token": token})
+                attributes["answer_chars"] = sum(len(part) for part in answer_parts)
+        except Exception as e:
+            logger.error(f"Error during LLM streaming: {e}")
+            yield create_mcp_message(self.name, "Orchestrator", "RESPONSE_ERROR", {"error": str(e)})
+            return
+
+        final_answer = "".join(answer_parts)
+        total_ms = (time.perf_counter() - start) * 1000
+        logger.info(f"Finished streaming answer (first token after {time_to_first_token_ms or total_ms:.0f} ms, "
+                    f"total {total_ms:.0f} ms).")
+        self._remember_answer(payload, final_answer)
+
+        yield create_mcp_message(
+            self.name, "Orchestrator", "FINAL_RESPONSE",
+            {
+                "answer": final_answer,
+                "source_context": context_chunks,
+                "context_stats": context_stats,
+                "timings": {"llm_time_to_first_token_ms": time_to_first_token_ms, "llm_total_ms": total_ms}
+            }
         )
 
 # --- Let's test this step in isolation ---
 if __name__ == "__main__":
     import json
+    from tracing import configure_logging
     
     # 1. Initialize the agent
+    configure_logging()
     llm_agent = LLMResponseAgent()
 
     # 2. Simulate a "successful retrieval" message from RetrievalAgent
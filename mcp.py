@@ -1,16 +1,19 @@
 # mcp.py
-import uuid
 import json
 
-def create_mcp_message(sender, receiver, msg_type, payload=None):
+from tracing import current_trace_id, new_trace_id
+
+def create_mcp_message(sender, receiver, msg_type, payload=None, trace_id=None):
     """
     Creates a structured message following the Model Context Protocol (MCP).
+    The message joins the current request's trace (see tracing.trace) unless a
+    `trace_id` is given; outside any trace it starts a new one.
     """
     return {
         "sender": sender,
         "receiver": receiver,
         "type": msg_type,
-        "trace_id": str(uuid.uuid4()),
+        "trace_id": trace_id or current_trace_id() or new_trace_id(),
         "payload": payload if payload is not None else {}
     }
 
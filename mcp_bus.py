@@ -0,0 +1,522 @@
+# mcp_bus.py
+import os
+import time
+import uuid
+import queue
+import asyncio
+import logging
+import importlib
+import threading
+import multiprocessing
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+import numpy as np
+
+from mcp import create_mcp_message
+from mcp_codec import decode, discard, encode
+from tracing import METRICS, configure_logging, trace
+
+logger = logging.getLogger(__name__)
+
+# --- MCP Bus Configuration ---
+# Worker processes per agent type; override with INGESTION_POOL_SIZE, RETRIEVAL_POOL_SIZE, LLM_POOL_SIZE.
+# RETRIEVAL_POOL_SIZE sizes the retrieval side's EmbeddingAgent pool, which encodes for the RetrievalAgent.
+DEFAULT_POOL_SIZES = {"IngestionAgent": 2, "EmbeddingAgent": 2, "RetrievalAgent": 1, "LLMResponseAgent": 4}
+# Agents whose workers write on-disk state they also keep in memory (a RetrievalAgent's local vector
+# store rows, lexical index and manifest): a second worker would overwrite the first one's writes.
+SINGLE_WORKER_AGENTS = ("RetrievalAgent",)
+POOL_SIZE_ENV = {"IngestionAgent": "INGESTION_POOL_SIZE", "EmbeddingAgent": "RETRIEVAL_POOL_SIZE",
+                 "LLMResponseAgent": "LLM_POOL_SIZE"}
+EMBED_REQUEST_CHUNKS = 256 # Chunks per request to the EmbeddingAgent pool; a document's requests run in parallel
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("MCP_REQUEST_TIMEOUT_SECONDS", 300))
+HEARTBEAT_INTERVAL_SECONDS = 2.0 # Idle workers report in this often
+HEALTH_CHECK_INTERVAL_SECONDS = 1.0 # How often dead workers are detected and replaced
+
+AGENT_CLASSES = {
+    "IngestionAgent": ("ingestion_agent", "IngestionAgent"),
+    "EmbeddingAgent": ("embedding_agent", "EmbeddingAgent"),
+    "RetrievalAgent": ("retrieval_agent", "RetrievalAgent"),
+    "LLMResponseAgent": ("llm_response_agent", "LLMResponseAgent"),
+}
+
+
+def _persist(agent, message):
+    agent.persist()
+    return create_mcp_message(agent.name, message['sender'], "PERSISTED", {})
+
+
+# (receiver, message type) -> (handler, error type reported when the request fails in transport)
+ROUTES = {
+    ("IngestionAgent", "INGEST_REQUEST"): (
+        lambda agent, message: agent.parse_and_chunk_document(
+            message['payload']['file_path'], message['payload'].get('source_file')
+        ), "INGESTION_ERROR"),
+    ("EmbeddingAgent", "EMBED_CHUNKS_REQUEST"): (lambda agent, message: agent.embed_chunks(message), "EMBEDDING_ERROR"),
+    ("EmbeddingAgent", "EMBED_QUERIES_REQUEST"): (
+        lambda agent, message: agent.embed_queries(message), "EMBEDDING_ERROR"),
+    ("EmbeddingAgent", "STATS_REQUEST"): (
+        lambda agent, message: create_mcp_message(
+            agent.name, message['sender'], "STATS_RESPONSE", {"query_embedding_cache": agent.query_embedding_cache.stats()}
+        ), "STATS_ERROR"),
+    ("RetrievalAgent", "CHUNKS_READY"): (
+        lambda agent, message: agent.embed_and_store(message, persist=message['payload'].get('persist', True)),
+        "STORAGE_ERROR"),
+    ("RetrievalAgent", "PERSIST_REQUEST"): (lambda agent, message: _persist(agent, message), "STORAGE_ERROR"),
+    ("RetrievalAgent", "RETRIEVE_REQUEST"): (lambda agent, message: agent.retrieve_context(message), "CONTEXT_ERROR"),
+    ("RetrievalAgent", "RETRIEVE_BATCH_REQUEST"): (
+        lambda agent, message: agent.retrieve_context_batch(message), "CONTEXT_ERROR"),
+    ("RetrievalAgent", "CLEAR_REQUEST"): (lambda agent, message: agent.clear_knowledge_base(), "STORAGE_ERROR"),
+    ("LLMResponseAgent", "CONTEXT_RESPONSE"): (lambda agent, message: agent.generate_response(message), "RESPONSE_ERROR"),
+    ("LLMResponseAgent", "STREAM_REQUEST"): (
+        lambda agent, message: agent.generate_response_stream(message), "RESPONSE_ERROR"),
+    ("LLMResponseAgent", "STATS_REQUEST"): (
+        lambda agent, message: create_mcp_message(
+            agent.name, message['sender'], "STATS_RESPONSE", {"semantic_cache": agent.semantic_cache.stats()}
+        ), "STATS_ERROR"),
+}
+
+
+def _worker_main(agent_name, worker_id, requests, responses):
+    """
+    Worker process loop: builds one agent, then handles requests from its pool's queue
+    until it receives None. Every reply is tagged with the request's correlation id;
+    spans recorded while handling it travel back with the reply. Messages cross the
+    queues as mcp_codec frames.
+    """
+    configure_logging()
+    module_name, class_name = AGENT_CLASSES[agent_name]
+    try:
+        agent = getattr(importlib.import_module(module_name), class_name)()
+    except Exception as e:
+        responses.put(("failed", worker_id, f"{type(e).__name__}: {e}"))
+        return
+    responses.put(("ready", worker_id, os.getpid()))
+
+    while True:
+        try:
+            envelope = requests.get(timeout=HEARTBEAT_INTERVAL_SECONDS)
+        except queue.Empty:
+            responses.put(("heartbeat", worker_id, None))
+            continue
+        if envelope is None:
+            return
+        correlation_id, frame = envelope
+        message = decode(frame)
+        responses.put(("started", worker_id, correlation_id))
+        handler, error_type = ROUTES[(message['receiver'], message['type'])]
+        try:
+            with trace(message.get('trace_id')):
+                result = handler(agent, message)
+                if hasattr(result, "__next__"): # Streaming handler: forward every message as it is produced
+                    for item in result:
+                        responses.put(("item", correlation_id, encode(item, shared_memory=True)))
+                    result = None
+        except Exception as e:
+            logger.exception(f"{agent_name} failed to handle {message['type']}")
+            # Retryable like the same exception raised by an in-process agent
+            result = create_mcp_message(
+                agent_name, message['sender'], error_type, {"error": f"{type(e).__name__}: {e}", "retryable": True},
+                trace_id=message.get('trace_id')
+            )
+        responses.put(("done", correlation_id, encode((result, METRICS.drain()), shared_memory=True)))
+
+
+class _Pending:
+    """A request awaiting its reply: a Future for the final message, plus a queue for streamed ones."""
+
+    def __init__(self, correlation_id, message, error_type, stream):
+        self.correlation_id = correlation_id
+        self.message = message
+        self.error_type = error_type
+        self.future = Future()
+        self.items = queue.Queue() if stream else None
+
+
+class MCPBus:
+    """
+    Runs IngestionAgent, EmbeddingAgent, RetrievalAgent and LLMResponseAgent in separately
+    sized pools of worker processes, so parsing, embedding and LLM calls no longer share one GIL.
+
+    Messages are routed by their `receiver` and `type` (see ROUTES) to the receiver's pool
+    queue, where the next free worker takes them. The RetrievalAgent pool is limited to a
+    single writer process (see SINGLE_WORKER_AGENTS); the stateless EmbeddingAgent pool does
+    its encoding, so retrieval scales with that pool. Replies are matched to requests by a
+    correlation id. Requests that outlive their timeout, or whose worker dies, are answered
+    with the route's error message; dead workers are replaced by a monitor thread, and
+    `health` reports each worker's state.
+    """
+
+    def __init__(self, pool_sizes=None, request_timeout=REQUEST_TIMEOUT_SECONDS):
+        self.pool_sizes = {
+            name: int(os.getenv(POOL_SIZE_ENV[name], size)) if name in POOL_SIZE_ENV else size
+            for name, size in DEFAULT_POOL_SIZES.items()
+        }
+        self.pool_sizes.update(pool_sizes or {})
+        for name in SINGLE_WORKER_AGENTS:
+            if self.pool_sizes.get(name, 0) > 1:
+                raise ValueError(
+                    f"{name} supports a single worker process (got {self.pool_sizes[name]}): its workers would "
+                    f"each keep their own view of the same vector store, lexical index and manifest files."
+                )
+        self.request_timeout = request_timeout
+        # 'spawn' keeps workers from inheriting model threads and locks from this process
+        self._context = multiprocessing.get_context("spawn")
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._workers = {} # worker_id -> {"agent", "process", "state", "last_seen", "correlation_id"}
+        self._request_queues = {}
+        self._responses = None
+        self.restarts = {name: 0 for name in self.pool_sizes}
+        self._started = False
+        self._closed = threading.Event()
+
+    def start(self):
+        """Spawns every worker pool. Safe to call more than once."""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            self._responses = self._context.Queue()
+            for agent_name, size in self.pool_sizes.items():
+                self._request_queues[agent_name] = self._context.Queue()
+                for index in range(size):
+                    self._spawn(agent_name, f"{agent_name}-{index}")
+        threading.Thread(target=self._dispatch_responses, name="mcp-bus-dispatch", daemon=True).start()
+        threading.Thread(target=self._monitor_workers, name="mcp-bus-monitor", daemon=True).start()
+        logger.info(f"Started worker pools: {self.pool_sizes}")
+
+    def _spawn(self, agent_name, worker_id):
+        process = self._context.Process(
+            target=_worker_main, args=(agent_name, worker_id, self._request_queues[agent_name], self._responses),
+            name=f"mcp-{worker_id}", daemon=True
+        )
+        process.start()
+        self._workers[worker_id] = {
+            "agent": agent_name, "process": process, "state": "starting", "last_seen": time.monotonic(),
+            "correlation_id": None, "error": None,
+        }
+
+    def _dispatch_responses(self):
+        while not self._closed.is_set():
+            try:
+                kind, key, value = self._responses.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+            with self._lock:
+                if kind in ("ready", "heartbeat", "started", "failed"):
+                    worker = self._workers.get(key)
+                    if worker is None:
+                        continue
+                    worker["last_seen"] = time.monotonic()
+                    if kind == "started":
+                        worker["state"], worker["correlation_id"] = "busy", value
+                    elif kind == "failed":
+                        worker["state"], worker["error"] = "failed", value
+                    else: # 'ready', or a heartbeat from a worker waiting for work
+                        worker["state"] = "idle"
+                    continue
+                pending = self._pending.get(key)
+                if kind == "done":
+                    self._pending.pop(key, None)
+                    for worker in self._workers.values():
+                        if worker["correlation_id"] == key:
+                            worker["state"], worker["correlation_id"] = "idle", None
+                            worker["last_seen"] = time.monotonic()
+            if pending is None: # The request already timed out
+                discard(value)
+                continue
+            if kind == "item":
+                pending.items.put(decode(value))
+            elif kind == "done":
+                result, spans = decode(value)
+                for span_record in spans:
+                    METRICS.record(span_record)
+                if pending.items is not None:
+                    if result is not None: # A streaming handler that failed part-way
+                        pending.items.put(result)
+                    pending.items.put(None)
+                pending.future.set_result(result)
+
+    def _monitor_workers(self):
+        while not self._closed.wait(HEALTH_CHECK_INTERVAL_SECONDS):
+            with self._lock:
+                dead = [
+                    (worker_id, worker) for worker_id, worker in self._workers.items()
+                    if not worker["process"].is_alive() and worker["state"] != "failed"
+                ]
+                for worker_id, worker in dead:
+                    logger.warning(f"Worker {worker_id} exited with code {worker['process'].exitcode}. Restarting it.")
+                    if worker["correlation_id"] in self._pending:
+                        self._fail(self._pending.pop(worker["correlation_id"]), f"Worker {worker_id} died.")
+                    self.restarts[worker["agent"]] += 1
+                    self._spawn(worker["agent"], worker_id)
+
+    def _fail(self, pending, error):
+        # Timeouts, dead workers and a closed bus say nothing about the request itself
+        response = create_mcp_message(
+            pending.message['receiver'], pending.message['sender'], pending.error_type,
+            {"error": error, "retryable": True}, trace_id=pending.message.get('trace_id')
+        )
+        if pending.items is not None:
+            pending.items.put(response)
+            pending.items.put(None)
+        if not pending.future.done():
+            pending.future.set_result(response)
+
+    def submit(self, message, stream=False):
+        """Queues `message` for its receiver's pool and returns a Future for the reply."""
+        route = ROUTES.get((message['receiver'], message['type']))
+        if route is None:
+            raise ValueError(f"No route for message type '{message['type']}' to '{message['receiver']}'.")
+        self.start()
+        correlation_id = uuid.uuid4().hex
+        pending = _Pending(correlation_id, message, route[1], stream)
+        with self._lock:
+            self._pending[correlation_id] = pending
+        self._request_queues[message['receiver']].put((correlation_id, encode(message, shared_memory=True)))
+        return pending
+
+    def _timed_out(self, pending, timeout):
+        with self._lock:
+            self._pending.pop(pending.correlation_id, None)
+        self._fail(pending, f"{pending.message['receiver']} did not answer within {timeout:.0f} s.")
+
+    def request(self, message, timeout=None):
+        """Sends `message` and waits for the reply (an error message of the route's type on timeout)."""
+        timeout = timeout or self.request_timeout
+        pending = self.submit(message)
+        try:
+            return pending.future.result(timeout)
+        except FutureTimeoutError:
+            self._timed_out(pending, timeout)
+            return pending.future.result()
+
+    def request_all(self, messages, timeout=None):
+        """Sends every message at once, so the receiving pool works on them in parallel, and returns the replies in order."""
+        timeout = timeout or self.request_timeout
+        deadline = time.monotonic() + timeout
+        pending_requests = [self.submit(message) for message in messages]
+        responses = []
+        for pending in pending_requests:
+            try:
+                responses.append(pending.future.result(max(0.0, deadline - time.monotonic())))
+            except FutureTimeoutError:
+                self._timed_out(pending, timeout)
+                responses.append(pending.future.result())
+        return responses
+
+    async def arequest(self, message, timeout=None):
+        timeout = timeout or self.request_timeout
+        pending = self.submit(message)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(pending.future), timeout)
+        except asyncio.TimeoutError:
+            self._timed_out(pending, timeout)
+            return pending.future.result()
+
+    def request_stream(self, message, timeout=None):
+        """Sends a streaming request and yields its messages; `timeout` bounds the wait for each one."""
+        timeout = timeout or self.request_timeout
+        pending = self.submit(message, stream=True)
+        while True:
+            try:
+                item = pending.items.get(timeout=timeout)
+            except queue.Empty:
+                self._timed_out(pending, timeout)
+                item = pending.items.get()
+            if item is None:
+                return
+            yield item
+
+    def health(self):
+        """Per pool: configured size, live and ready workers, restarts, and every worker's state."""
+        now = time.monotonic()
+        with self._lock:
+            report = {}
+            for agent_name, size in self.pool_sizes.items():
+                workers = {
+                    worker_id: {
+                        "pid": worker["process"].pid,
+                        "alive": worker["process"].is_alive(),
+                        "state": worker["state"],
+                        "seconds_since_seen": round(now - worker["last_seen"], 1),
+                        "error": worker["error"],
+                    }
+                    for worker_id, worker in self._workers.items() if worker["agent"] == agent_name
+                }
+                report[agent_name] = {
+                    "pool_size": size,
+                    "alive": sum(worker["alive"] for worker in workers.values()),
+                    "ready": sum(worker["state"] in ("idle", "busy") for worker in workers.values()),
+                    "restarts": self.restarts[agent_name],
+                    "workers": workers,
+                }
+            report["in_flight"] = len(self._pending)
+        return report
+
+    def close(self, timeout=10):
+        """Stops every worker after its current request and fails anything still pending."""
+        if not self._started or self._closed.is_set():
+            return
+        self._closed.set()
+        for agent_name, requests in self._request_queues.items():
+            for _ in range(self.pool_sizes[agent_name]):
+                requests.put(None)
+        deadline = time.monotonic() + timeout
+        for worker in self._workers.values():
+            worker["process"].join(max(0.0, deadline - time.monotonic()))
+            if worker["process"].is_alive():
+                worker["process"].terminate()
+        with self._lock:
+            pending, self._pending = list(self._pending.values()), {}
+        for request in pending:
+            self._fail(request, "The MCP bus was closed.")
+
+
+class RemoteAgent:
+    """Stand-in for an agent that lives in a bus worker pool; the Orchestrator calls it like the local agent."""
+
+    def __init__(self, bus, name):
+        self.bus = bus
+        self.name = name
+        bus.start()
+
+    def _send(self, message, msg_type, payload=None, receiver=None):
+        """
+        Re-addresses an incoming MCP message (or a new payload) to this agent's pool, or to
+        `receiver`'s, keeping its trace.
+        """
+        message = message or {}
+        return create_mcp_message(
+            message.get('sender', "Orchestrator"), receiver or self.name, msg_type,
+            message.get('payload', {}) if payload is None else payload, trace_id=message.get('trace_id')
+        )
+
+
+class _RemoteStats:
+    """Answers `.stats()` for a cache inside a worker process (whichever worker of the pool takes the request)."""
+
+    def __init__(self, agent, key, receiver=None):
+        self.agent = agent
+        self.key = key
+        self.receiver = receiver
+
+    def stats(self):
+        response = self.agent.bus.request(self.agent._send(None, "STATS_REQUEST", {}, receiver=self.receiver))
+        return response['payload'].get(self.key, response['payload'])
+
+
+class RemoteIngestionAgent(RemoteAgent):
+    def __init__(self, bus):
+        super().__init__(bus, "IngestionAgent")
+
+    def parse_and_chunk_document(self, file_path, source_name=None):
+        return self.bus.request(self._send(None, "INGEST_REQUEST", {
+            "file_path": file_path, "source_file": source_name or os.path.basename(file_path)
+        }))
+
+    def stream_document(self, file_path, source_name=None):
+        # Generators cannot cross process boundaries, so the worker returns the full chunk list
+        return self.parse_and_chunk_document(file_path, source_name)
+
+
+class RemoteRetrievalAgent(RemoteAgent):
+    """
+    The RetrievalAgent on the bus: the EmbeddingAgent pool encodes chunks and queries in
+    parallel, and the single RetrievalAgent worker only stores and searches. Should the
+    EmbeddingAgent pool fail to answer a query, the RetrievalAgent encodes it itself.
+    """
+
+    def __init__(self, bus):
+        super().__init__(bus, "RetrievalAgent")
+        self.query_embedding_cache = _RemoteStats(self, "query_embedding_cache", receiver="EmbeddingAgent")
+
+    def embed_and_store(self, mcp_message, on_batch_stored=None, persist=True):
+        # Callbacks cannot cross the process boundary, so per-batch progress is not reported
+        chunks = list(mcp_message['payload'].get('chunks') or [])
+        payload = {**mcp_message['payload'], "chunks": chunks, "persist": persist}
+        if chunks:
+            # 1. Encode the document's chunks across the EmbeddingAgent pool
+            responses = self.bus.request_all(
+                self._send(mcp_message, "EMBED_CHUNKS_REQUEST", {"chunks": chunks[i:i + EMBED_REQUEST_CHUNKS]},
+                           receiver="EmbeddingAgent")
+                for i in range(0, len(chunks), EMBED_REQUEST_CHUNKS)
+            )
+            failed = next((response for response in responses if response['type'] != "CHUNK_EMBEDDINGS"), None)
+            if failed is not None:
+                return create_mcp_message(
+                    self.name, "Orchestrator", "STORAGE_ERROR",
+                    {"source_file": payload.get('source_file'),
+                     "error": f"Embedding failed: {failed['payload'].get('error')}",
+                     "retryable": failed['payload'].get('retryable', False)}
+                )
+            payload["embeddings"] = np.concatenate([response['payload']['embeddings'] for response in responses])
+        # 2. The RetrievalAgent worker diffs the document against its manifest and stores the new chunks
+        return self.bus.request(self._send(mcp_message, "CHUNKS_READY", payload))
+
+    def persist(self):
+        self.bus.request(self._send(None, "PERSIST_REQUEST", {}))
+
+    def _embed_queries_request(self, mcp_message, queries):
+        return self._send(mcp_message, "EMBED_QUERIES_REQUEST", {"queries": queries}, receiver="EmbeddingAgent")
+
+    def _query_embeddings(self, response):
+        """The embeddings in an EmbeddingAgent reply, or None when it failed."""
+        if response['type'] != "QUERY_EMBEDDINGS":
+            logger.warning(f"Query encoding on the EmbeddingAgent pool failed: {response['payload'].get('error')}")
+            return None
+        return response['payload']['embeddings']
+
+    def _with_query_embedding(self, mcp_message, embeddings):
+        if embeddings is None:
+            return self._send(mcp_message, "RETRIEVE_REQUEST")
+        return self._send(mcp_message, "RETRIEVE_REQUEST", {**mcp_message['payload'], "query_embedding": embeddings[0]})
+
+    def retrieve_context(self, mcp_message):
+        query = mcp_message['payload'].get('query')
+        embeddings = None
+        if query:
+            embeddings = self._query_embeddings(self.bus.request(self._embed_queries_request(mcp_message, [query])))
+        return self.bus.request(self._with_query_embedding(mcp_message, embeddings))
+
+    async def aretrieve_context(self, mcp_message):
+        query = mcp_message['payload'].get('query')
+        embeddings = None
+        if query:
+            embeddings = self._query_embeddings(
+                await self.bus.arequest(self._embed_queries_request(mcp_message, [query]))
+            )
+        return await self.bus.arequest(self._with_query_embedding(mcp_message, embeddings))
+
+    def retrieve_context_batch(self, mcp_message):
+        queries = mcp_message['payload'].get('queries') or []
+        message = self._send(mcp_message, "RETRIEVE_BATCH_REQUEST")
+        if queries:
+            embeddings = self._query_embeddings(self.bus.request(self._embed_queries_request(mcp_message, queries)))
+            if embeddings is not None:
+                message = self._send(mcp_message, "RETRIEVE_BATCH_REQUEST",
+                                     {**mcp_message['payload'], "query_embeddings": embeddings})
+        responses = self.bus.request(message)
+        if isinstance(responses, dict): # Transport error: one error per query
+            return [responses for _ in mcp_message['payload'].get('queries') or []]
+        return responses
+
+    def clear_knowledge_base(self):
+        return self.bus.request(self._send(None, "CLEAR_REQUEST", {}))
+
+
+class RemoteLLMResponseAgent(RemoteAgent):
+    def __init__(self, bus):
+        super().__init__(bus, "LLMResponseAgent")
+        self.semantic_cache = _RemoteStats(self, "semantic_cache")
+
+    def generate_response(self, mcp_message):
+        return self.bus.request(self._send(mcp_message, "CONTEXT_RESPONSE"))
+
+    async def agenerate_response(self, mcp_message):
+        return await self.bus.arequest(self._send(mcp_message, "CONTEXT_RESPONSE"))
+
+    def generate_response_stream(self, mcp_message):
+        return self.bus.request_stream(self._send(mcp_message, "STREAM_REQUEST"))
@@ -0,0 +1,143 @@
+# mcp_codec.py
+import os
+import mmap
+import pickle
+import struct
+from multiprocessing import shared_memory
+
+# --- Codec Configuration ---
+FRAME_MAGIC = b"MCP5"
+SHARED_MEMORY_MIN_BYTES = 1024 * 1024 # Smaller array buffers are copied into the frame; shared memory setup costs more than the copy
+SHARED_MEMORY_DIR = "/dev/shm" # Where Linux exposes POSIX shared memory segments as files
+
+_HEADER = struct.Struct("<4sII") # magic, body length, buffer count
+_DESCRIPTOR = struct.Struct("<BQH") # kind, byte length, shared memory name length
+_INLINE, _SHARED = 0, 1
+
+
+def encode(message, shared_memory=False):
+    """
+    Serialises an MCP message (or any picklable value) into one binary frame.
+
+    The message is pickled with protocol 5, so NumPy arrays such as query embeddings are
+    not converted to Python lists: their raw buffers are taken out of band and appended to
+    the frame after the pickled body. With `shared_memory=True`, buffers of at least
+    SHARED_MEMORY_MIN_BYTES are placed in a shared memory segment instead and only its name
+    travels in the frame, so large arrays never pass through the queue's pipe.
+
+    Frames are meant for the processes of one application (see mcp_bus.MCPBus). Never
+    decode a frame from an untrusted source: unpickling can run arbitrary code.
+    """
+    buffers = []
+    body = pickle.dumps(message, protocol=5, buffer_callback=buffers.append)
+
+    descriptors, payloads = [], []
+    for buffer in buffers:
+        raw = buffer.raw()
+        if shared_memory and raw.nbytes >= SHARED_MEMORY_MIN_BYTES:
+            segment = _shared_memory_segment(raw)
+            name = segment.name.encode("ascii")
+            descriptors.append(_DESCRIPTOR.pack(_SHARED, raw.nbytes, len(name)) + name)
+        else:
+            descriptors.append(_DESCRIPTOR.pack(_INLINE, raw.nbytes, 0))
+            payloads.append(raw)
+    return b"".join([_HEADER.pack(FRAME_MAGIC, len(body), len(buffers)), *descriptors, body, *payloads])
+
+
+def _shared_memory_segment(raw):
+    segment = shared_memory.SharedMemory(create=True, size=raw.nbytes)
+    segment.buf[:raw.nbytes] = raw
+    segment.close() # The segment outlives this handle until the receiver unlinks it
+    return segment
+
+
+def _read_frame(frame):
+    """Returns (frame view, body view, [(kind, length, segment name)], offset of the first inline buffer)."""
+    view = memoryview(frame)
+    magic, body_length, count = _HEADER.unpack_from(view, 0)
+    if magic != FRAME_MAGIC:
+        raise ValueError("Not an MCP codec frame.")
+    offset = _HEADER.size
+    descriptors = []
+    for _ in range(count):
+        kind, length, name_length = _DESCRIPTOR.unpack_from(view, offset)
+        offset += _DESCRIPTOR.size
+        name = bytes(view[offset:offset + name_length]).decode("ascii") if kind == _SHARED else None
+        offset += name_length
+        descriptors.append((kind, length, name))
+    return view, view[offset:offset + body_length], descriptors, offset + body_length
+
+
+def decode(frame):
+    """
+    Rebuilds the value encoded in `frame`. Arrays from inline buffers are zero-copy,
+    read-only views of the frame. Shared memory segments are unlinked at once (see
+    `_shared_buffer`); on Linux their arrays are zero-copy views of the segment, which
+    stays mapped until the last array using it is freed.
+    """
+    view, body, descriptors, offset = _read_frame(frame)
+    buffers = []
+    for kind, length, name in descriptors:
+        if kind == _SHARED:
+            buffers.append(_shared_buffer(name, length))
+        else:
+            buffers.append(view[offset:offset + length])
+            offset += length
+    return pickle.loads(body, buffers=buffers)
+
+
+def _shared_buffer(name, length):
+    """
+    Maps a shared memory segment and unlinks it. Where segments are files (Linux), the
+    buffer is a mapping of its own: it keeps the memory alive after the unlink, for as long
+    as any array built on it exists, and is unmapped when the last one is freed. Elsewhere
+    the bytes are copied out in one memcpy.
+    """
+    segment = shared_memory.SharedMemory(name=name)
+    try:
+        path = os.path.join(SHARED_MEMORY_DIR, name)
+        if os.path.exists(path):
+            with open(path, "r+b") as f:
+                return memoryview(mmap.mmap(f.fileno(), length))
+        return bytearray(segment.buf[:length])
+    finally:
+        segment.close()
+        segment.unlink()
+
+
+def discard(frame):
+    """Frees the shared memory of a frame that will never be decoded (e.g. a reply to a timed-out request)."""
+    for kind, _, name in _read_frame(frame)[2]:
+        if kind == _SHARED:
+            try:
+                segment = shared_memory.SharedMemory(name=name)
+            except FileNotFoundError:
+                continue
+            segment.close()
+            segment.unlink()
+
+
+if __name__ == "__main__":
+    import numpy as np
+
+    from mcp import create_mcp_message
+
+    print("--- Testing MCP Codec ---")
+    message = create_mcp_message(
+        sender="RetrievalAgent",
+        receiver="LLMResponseAgent",
+        msg_type="CONTEXT_RESPONSE",
+        payload={
+            "query": "What is Groq's LPU?",
+            "top_chunks": [{"id": "doc-0", "text": "The LPU is designed for sequential processing tasks."}],
+            "query_embedding": np.random.default_rng(0).random(384, dtype=np.float32),
+            "embeddings": np.random.default_rng(1).random((1024, 384), dtype=np.float32),
+        }
+    )
+    for use_shared_memory in (False, True):
+        frame = encode(message, shared_memory=use_shared_memory)
+        decoded = decode(frame)
+        assert decoded["payload"]["top_chunks"] == message["payload"]["top_chunks"]
+        assert np.array_equal(decoded["payload"]["query_embedding"], message["payload"]["query_embedding"])
+        assert np.array_equal(decoded["payload"]["embeddings"], message["payload"]["embeddings"])
+        print(f"shared_memory={use_shared_memory}: frame of {len(frame)} bytes decoded correctly.")
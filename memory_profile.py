@@ -0,0 +1,44 @@
+# memory_profile.py
+import os
+import sys
+
+
+def current_rss_mb():
+    """Returns the resident set size of this process in MB, or None if it cannot be read."""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+    try:
+        import resource
+        # Only the peak is available here; ru_maxrss is in KB on Linux and bytes on macOS.
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        return None
+
+
+class StageMemoryTracker:
+    """Records the highest RSS observed after each pipeline stage."""
+
+    def __init__(self):
+        self.baseline_mb = current_rss_mb()
+        self.peaks_mb = {}
+
+    def sample(self, stage):
+        rss = current_rss_mb()
+        if rss is not None:
+            self.peaks_mb[stage] = max(self.peaks_mb.get(stage, 0.0), rss)
+
+    def report(self):
+        report = {"baseline_mb": round(self.baseline_mb, 1) if self.baseline_mb is not None else None}
+        for stage, peak in self.peaks_mb.items():
+            report[f"{stage}_peak_mb"] = round(peak, 1)
+        return report
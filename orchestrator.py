@@ -2,86 +2,585 @@
 import os
 import json
 import time
+import asyncio
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dotenv import load_dotenv
 
-from ingestion_agent import IngestionAgent
+from ingestion_agent import IngestionAgent, DocumentParseError, parse_document_worker
 from retrieval_agent import RetrievalAgent
 from llm_response_agent import LLMResponseAgent
+from reranker import Reranker, RERANK_CANDIDATES
 from mcp import create_mcp_message
+from query_cache import TTLCache, normalize_query
+from tracing import METRICS, bind_context, current_trace_id, span, traced
+from mcp_bus import MCPBus, RemoteIngestionAgent, RemoteRetrievalAgent, RemoteLLMResponseAgent
+from ingestion_jobs import IngestionJobQueue
+
+logger = logging.getLogger(__name__)
+
+# --- Orchestrator Configuration ---
+DEFAULT_INGESTION_WORKERS = os.cpu_count() or 1 # Override with INGESTION_WORKERS
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", 1024))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", 3600))
+MAX_CONCURRENT_QUESTIONS = int(os.getenv("MAX_CONCURRENT_QUESTIONS", 32))
+BATCH_LLM_WORKERS = int(os.getenv("BATCH_LLM_WORKERS", 8)) # Parallel LLM calls in ask_questions
+RETRIEVAL_TOP_K = 5 # Chunks sent to the LLM; with RERANK_ENABLED=1 a wider pool is reranked down to this
 
 class Orchestrator:
-    def __init__(self):
+    def __init__(self, warm_up=False, transport=None, pool_sizes=None):
         """
         Initializes the entire agentic system.
-        This is where we instantiate our agents, loading models and connections
-        only once for efficiency.
+        Each agent loads its models and connections only once, on first use, so startup
+        pays only for what a request needs. `warm_up=True` builds every agent on a
+        background thread instead. `startup_timings` records how long each phase took.
+
+        `transport` (or MCP_TRANSPORT) selects where the agents run: 'inprocess' (default)
+        calls them directly; 'bus' runs them in worker process pools behind an MCPBus,
+        sized by `pool_sizes` (e.g. {"LLMResponseAgent": 8}).
+        """
+        start = time.perf_counter()
+        logger.info("Initializing the RAG system...")
+        load_dotenv()
+        self.startup_timings = {}
+        self._agents = {}
+        self._agent_locks = {
+            name: threading.Lock() for name in ("IngestionAgent", "RetrievalAgent", "LLMResponseAgent", "Reranker")
+        }
+        # Optional cross-encoder stage between retrieval and generation
+        self.rerank_enabled = os.getenv("RERANK_ENABLED", "0") == "1"
+
+        self.transport = transport or os.getenv("MCP_TRANSPORT", "inprocess")
+        if self.transport not in ("inprocess", "bus"):
+            raise ValueError(f"Unknown MCP transport '{self.transport}'. Expected 'inprocess' or 'bus'.")
+        # Worker processes are only spawned when an agent is first needed
+        self.bus = MCPBus(pool_sizes) if self.transport == "bus" else None
+
+        # Final answers are cached per knowledge-base version; every ingest or clear bumps
+        # the version, so cached answers never outlive the data they were generated from.
+        self.kb_version = 0
+        self._kb_version_lock = threading.Lock()
+        self.answer_cache = TTLCache(ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL_SECONDS)
+
+        # Limits in-flight questions on the async path; created per event loop on first use
+        self._question_limiter = None
+        self._question_limiter_loop = None
+        self._ingestion_queue = None
+        self._ingestion_queue_lock = threading.Lock()
+        self.startup_timings["orchestrator_ms"] = (time.perf_counter() - start) * 1000
+        logger.info(f"Ready in {self.startup_timings['orchestrator_ms']:.0f} ms. Agents will load on first use.")
+        if warm_up:
+            self.warm_up(background=True)
+
+    def _get_agent(self, name, factory):
+        """Returns the named agent, building it on first use. Concurrent callers wait for one build."""
+        agent = self._agents.get(name)
+        if agent is None:
+            with self._agent_locks[name]:
+                agent = self._agents.get(name)
+                if agent is None:
+                    start = time.perf_counter()
+                    agent = factory()
+                    self.startup_timings[f"{name}_ms"] = (time.perf_counter() - start) * 1000
+                    for phase, phase_ms in getattr(agent, "startup_timings", {}).items():
+                        self.startup_timings[f"{name}.{phase}_ms"] = phase_ms
+                    logger.info(f"{name} ready in {self.startup_timings[f'{name}_ms']:.0f} ms.")
+                    self._agents[name] = agent
+        return agent
+
+    @property
+    def ingestion_agent(self):
+        if self.bus is not None:
+            return self._get_agent("IngestionAgent", lambda: RemoteIngestionAgent(self.bus))
+        return self._get_agent("IngestionAgent", IngestionAgent)
+
+    @property
+    def retrieval_agent(self):
+        if self.bus is not None:
+            return self._get_agent("RetrievalAgent", lambda: RemoteRetrievalAgent(self.bus))
+        return self._get_agent("RetrievalAgent", RetrievalAgent)
+
+    @property
+    def llm_agent(self):
+        if self.bus is not None:
+            return self._get_agent("LLMResponseAgent", lambda: RemoteLLMResponseAgent(self.bus))
+        return self._get_agent("LLMResponseAgent", LLMResponseAgent)
+
+    @property
+    def reranker(self):
+        return self._get_agent("Reranker", Reranker) if self.rerank_enabled else None
+
+    def warm_up(self, background=True):
+        """
+        Builds every agent ahead of its first use. With `background=True` this runs on a
+        daemon thread (returned) so the caller, e.g. the Streamlit page, is not blocked;
+        a request arriving meanwhile waits only for the agent it needs.
         """
-        print("[Orchestrator] Initializing the RAG system...")
-        self.ingestion_agent = IngestionAgent()
-        self.retrieval_agent = RetrievalAgent()
-        self.llm_agent = LLMResponseAgent()
-        print("[Orchestrator] All agents initialized.")
+        def build_agents():
+            start = time.perf_counter()
+            try:
+                for agent in ("retrieval_agent", "llm_agent", "ingestion_agent", "reranker"):
+                    getattr(self, agent)
+            except Exception as e:
+                # The same error surfaces again, to the caller, when the agent is first used
+                logger.warning(f"Warm-up failed: {e}")
+                return
+            self.startup_timings["warm_up_ms"] = (time.perf_counter() - start) * 1000
+            logger.info(f"Warm-up complete in {self.startup_timings['warm_up_ms']:.0f} ms.")
+
+        if not background:
+            build_agents()
+            return None
+        thread = threading.Thread(target=build_agents, name="orchestrator-warm-up", daemon=True)
+        thread.start()
+        return thread
 
-    def ingest_document(self, file_path: str):
+    def _knowledge_base_changed(self):
+        with self._kb_version_lock:
+            self.kb_version += 1
+
+    @traced
+    def ingest_document(self, file_path: str, source_name: str = None, persist=True):
         """
         Orchestrates the ingestion pipeline:
         1. IngestionAgent: Parses and chunks the document.
-        2. RetrievalAgent: Embeds and stores the chunks.
+        2. RetrievalAgent: Embeds and stores the new chunks and deletes the stale ones.
+        Re-ingesting the same `source_name` only touches the chunks that changed.
+        With `persist=False` the vector index is not saved; see RetrievalAgent.persist.
         """
-        print(f"\n[Orchestrator] --- Starting Ingestion Pipeline for: {os.path.basename(file_path)} ---")
+        try:
+            with span("ingest_document"):
+                return self._ingest_document(file_path, source_name, persist)
+        finally:
+            self._knowledge_base_changed()
+
+    def _ingest_document(self, file_path, source_name, persist=True):
+        source_name = source_name or os.path.basename(file_path)
+        logger.info(f"--- Starting Ingestion Pipeline for: {source_name} ---")
         
-        # 1. Pass the file to the IngestionAgent
-        print("[Orchestrator] -> Calling IngestionAgent to parse and chunk...")
-        mcp_from_ingestion = self.ingestion_agent.parse_and_chunk_document(file_path)
+        # 1. Pass the file to the IngestionAgent, which streams chunks as it parses
+        logger.debug("-> Calling IngestionAgent to parse and chunk...")
+        mcp_from_ingestion = self.ingestion_agent.stream_document(file_path, source_name)
 
         # Error handling
         if mcp_from_ingestion['type'] == 'INGESTION_ERROR':
-            print(f"[Orchestrator] Ingestion failed: {mcp_from_ingestion['payload']['error']}")
+            logger.error(f"Ingestion failed: {mcp_from_ingestion['payload']['error']}")
             return mcp_from_ingestion
 
-        # 2. Pass the chunks to the RetrievalAgent
-        print("[Orchestrator] Chunks received. -> Calling RetrievalAgent to embed and store...")
-        mcp_from_retrieval = self.retrieval_agent.embed_and_store(mcp_from_ingestion)
+        # 2. Pass the chunk stream to the RetrievalAgent, which embeds and stores it in micro-batches
+        logger.debug("Chunks streaming. -> Calling RetrievalAgent to embed and store...")
+        try:
+            mcp_from_retrieval = self.retrieval_agent.embed_and_store(mcp_from_ingestion, persist=persist)
+        except DocumentParseError as e:
+            logger.error(f"Ingestion failed mid-stream: {e}")
+            return create_mcp_message(
+                "IngestionAgent", "Orchestrator", "INGESTION_ERROR",
+                {"file_path": file_path, "source_file": source_name, "error": str(e)}
+            )
         
-        print("[Orchestrator] --- Ingestion Pipeline Complete ---")
+        logger.info("--- Ingestion Pipeline Complete ---")
         return mcp_from_retrieval
 
-    def ask_question(self, query: str):
+    @traced
+    def ingest_documents(self, file_paths, source_names=None, max_workers=None):
         """
-        Orchestrates the question-answering pipeline:
-        1. RetrievalAgent: Retrieves relevant context for the query.
-        2. LLMResponseAgent: Generates an answer based on the context.
+        Orchestrates ingestion of many documents at once:
+        1. IngestionAgent workers parse and chunk the files in a process pool.
+        2. RetrievalAgent embeds and stores each file's chunks as soon as its parse finishes.
+        Yields one MCP result per file, in completion order; `payload['source_file']` names the file.
+        The vector index is saved once, after the last file, rather than after every file.
         """
-        print(f"\n[Orchestrator] --- Starting Query Pipeline for: '{query}' ---")
-        
-        # 1. Create an MCP request for the RetrievalAgent
-        mcp_retrieve_request = create_mcp_message(
-            "Orchestrator", "RetrievalAgent", "RETRIEVE_REQUEST", {"query": query, "top_k": 5}
+        file_paths = list(file_paths)
+        source_names = list(source_names) if source_names else [os.path.basename(path) for path in file_paths]
+        try:
+            yield from self._ingest_document_batch(file_paths, source_names, max_workers)
+        finally:
+            if "RetrievalAgent" in self._agents:
+                self.retrieval_agent.persist()
+
+    def _ingest_document_batch(self, file_paths, source_names, max_workers):
+        """ingest_documents without the final save: every file is stored with persist=False."""
+        if self.bus is not None:
+            yield from self._ingest_documents_on_bus(file_paths, source_names)
+            return
+        if max_workers is None:
+            max_workers = int(os.getenv("INGESTION_WORKERS", DEFAULT_INGESTION_WORKERS))
+        max_workers = max(1, min(max_workers, len(file_paths)))
+
+        # A single file or worker gains nothing from a pool, so keep the streaming path.
+        if max_workers == 1:
+            for file_path, source_name in zip(file_paths, source_names):
+                yield self.ingest_document(file_path, source_name, persist=False)
+            return
+
+        logger.info(f"--- Starting Parallel Ingestion of {len(file_paths)} documents with {max_workers} workers ---")
+        # 'spawn' keeps workers from inheriting the embedding model's threads from this process.
+        pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+        try:
+            futures = {
+                pool.submit(parse_document_worker, file_path, source_name, current_trace_id()): (file_path, source_name)
+                for file_path, source_name in zip(file_paths, source_names)
+            }
+            for future in as_completed(futures):
+                file_path, source_name = futures[future]
+                try:
+                    mcp_from_ingestion, spans = future.result()
+                    for span_record in spans: # Parse spans from the worker process join this process's metrics
+                        METRICS.record(span_record)
+                except Exception as e:
+                    mcp_from_ingestion = create_mcp_message(
+                        "IngestionAgent", "Orchestrator", "INGESTION_ERROR",
+                        {"file_path": file_path, "source_file": source_name, "error": f"Ingestion worker failed: {e}"}
+                    )
+
+                if mcp_from_ingestion['type'] == 'INGESTION_ERROR':
+                    logger.error(f"Ingestion failed for '{source_name}': {mcp_from_ingestion['payload']['error']}")
+                    yield mcp_from_ingestion
+                    continue
+
+                # The embedding stage is shared: it runs here while the pool keeps parsing other files.
+                logger.debug(f"'{source_name}' parsed. -> Calling RetrievalAgent to embed and store...")
+                try:
+                    mcp_from_retrieval = self.retrieval_agent.embed_and_store(mcp_from_ingestion, persist=False)
+                finally:
+                    self._knowledge_base_changed()
+                yield mcp_from_retrieval
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+        logger.info("--- Parallel Ingestion Complete ---")
+
+    def _ingest_documents_on_bus(self, file_paths, source_names):
+        """ingest_documents over the MCP bus: the IngestionAgent pool parses while the RetrievalAgent pool stores."""
+        logger.info(f"--- Starting Ingestion of {len(file_paths)} documents on the MCP bus ---")
+        self.ingestion_agent # Starts the worker pools
+        requests = {}
+        for file_path, source_name in zip(file_paths, source_names):
+            mcp_ingest_request = create_mcp_message(
+                "Orchestrator", "IngestionAgent", "INGEST_REQUEST", {"file_path": file_path, "source_file": source_name}
+            )
+            requests[self.bus.submit(mcp_ingest_request).future] = source_name
+
+        for future in as_completed(requests):
+            mcp_from_ingestion = future.result()
+            if mcp_from_ingestion['type'] == 'INGESTION_ERROR':
+                logger.error(f"Ingestion failed for '{requests[future]}': {mcp_from_ingestion['payload']['error']}")
+                yield mcp_from_ingestion
+                continue
+            logger.debug(f"'{requests[future]}' parsed. -> Sending it to the RetrievalAgent pool to embed and store...")
+            try:
+                mcp_from_retrieval = self.retrieval_agent.embed_and_store(mcp_from_ingestion, persist=False)
+            finally:
+                self._knowledge_base_changed()
+            yield mcp_from_retrieval
+        logger.info("--- Ingestion on the MCP bus Complete ---")
+
+    @property
+    def ingestion_queue(self):
+        """The durable ingestion job queue; created on first use, resuming any interrupted jobs."""
+        if self._ingestion_queue is None:
+            with self._ingestion_queue_lock:
+                if self._ingestion_queue is None:
+                    # In process, jobs parse in a process pool; on the MCP bus the IngestionAgent pool parses
+                    queue = IngestionJobQueue(
+                        lambda: self.ingestion_agent, lambda: self.retrieval_agent,
+                        on_stored=self._knowledge_base_changed, parse_in_processes=self.bus is None
+                    )
+                    queue.start()
+                    self._ingestion_queue = queue
+        return self._ingestion_queue
+
+    def submit_ingestion(self, file_path, source_name=None):
+        """
+        Queues a document for ingestion in the background and returns the job id. The job
+        survives restarts: it resumes from its last checkpoint (see ingestion_jobs).
+        """
+        return self.ingestion_queue.submit(file_path, source_name)
+
+    def ingestion_status(self, job_id):
+        """State, stage and progress of a job from `submit_ingestion`, or None for an unknown id."""
+        return self.ingestion_queue.status(job_id)
+
+    def _cached_answer(self, cache_key):
+        """Returns a copy of the cached FINAL_RESPONSE for this question and KB version, if any."""
+        cached_response = self.answer_cache.get(cache_key)
+        if cached_response is None:
+            return None
+        return create_mcp_message(
+            cached_response['sender'], "Orchestrator", cached_response['type'],
+            {**cached_response['payload'], "cached": True}
+        )
+
+    def _cache_answer(self, cache_key, response):
+        """Caches a FINAL_RESPONSE without its `timings`, which describe only the request that produced it."""
+        payload = {key: value for key, value in response['payload'].items() if key != "timings"}
+        self.answer_cache.put(cache_key, {**response, "payload": payload})
+
+    def _retrieval_top_k(self):
+        """Number of chunks to retrieve: the reranker's candidate pool, or what the LLM will see."""
+        return RERANK_CANDIDATES if self.rerank_enabled else RETRIEVAL_TOP_K
+
+    def _retrieve_request(self, query, kb_version):
+        """Creates the MCP request asking the RetrievalAgent for a query's context."""
+        return create_mcp_message(
+            "Orchestrator", "RetrievalAgent", "RETRIEVE_REQUEST",
+            {"query": query, "top_k": self._retrieval_top_k(), "kb_version": kb_version}
         )
+
+    def _rerank(self, mcp_from_retrieval):
+        """Passes retrieved context through the Reranker, when enabled, keeping only the best chunks."""
+        if not self.rerank_enabled or mcp_from_retrieval['type'] != 'CONTEXT_RESPONSE':
+            return mcp_from_retrieval
+        logger.debug("-> Calling Reranker to score the candidate chunks...")
+        return self.reranker.rerank_context(mcp_from_retrieval)
+
+    def _retrieve(self, query, kb_version):
+        """Asks the RetrievalAgent for the context of a query and returns its MCP response."""
+        # 1. Create an MCP request for the RetrievalAgent
+        mcp_retrieve_request = self._retrieve_request(query, kb_version)
         
         # 2. Call the RetrievalAgent to get context
-        print("[Orchestrator] -> Calling RetrievalAgent to retrieve context...")
+        logger.debug("-> Calling RetrievalAgent to retrieve context...")
         mcp_from_retrieval = self.retrieval_agent.retrieve_context(mcp_retrieve_request)
 
         # Error handling
         if mcp_from_retrieval['type'] == 'CONTEXT_ERROR':
-            print(f"[Orchestrator] Context retrieval failed: {mcp_from_retrieval['payload']['error']}")
+            logger.error(f"Context retrieval failed: {mcp_from_retrieval['payload']['error']}")
+        return self._rerank(mcp_from_retrieval)
+
+    @traced
+    def ask_question(self, query: str):
+        """
+        Orchestrates the question-answering pipeline:
+        1. RetrievalAgent: Retrieves relevant context for the query.
+        2. LLMResponseAgent: Generates an answer based on the context.
+        """
+        logger.info(f"--- Starting Query Pipeline for: '{query}' ---")
+
+        # 0. Serve repeated questions straight from the answer cache
+        cache_key = (normalize_query(query), self.kb_version)
+        cached_response = self._cached_answer(cache_key)
+        if cached_response is not None:
+            logger.info("Answer cache hit. --- Query Pipeline Complete ---")
+            return cached_response
+        
+        # 1-2. Retrieve the context for the query
+        mcp_from_retrieval = self._retrieve(query, cache_key[1])
+        if mcp_from_retrieval['type'] == 'CONTEXT_ERROR':
             return mcp_from_retrieval
             
         # 3. Pass the context to the LLMResponseAgent
-        print("[Orchestrator] Context received. -> Calling LLMResponseAgent to generate answer...")
+        logger.debug("Context received. -> Calling LLMResponseAgent to generate answer...")
         final_response_mcp = self.llm_agent.generate_response(mcp_from_retrieval)
+        if final_response_mcp['type'] == 'FINAL_RESPONSE':
+            self._cache_answer(cache_key, final_response_mcp)
         
-        print("[Orchestrator] --- Query Pipeline Complete ---")
+        logger.info("--- Query Pipeline Complete ---")
         return final_response_mcp
 
+    @traced
+    def ask_questions(self, queries, max_workers=None):
+        """
+        Orchestrates the question-answering pipeline for a batch of questions:
+        1. RetrievalAgent: Encodes all questions in one pass and searches for them together.
+        2. LLMResponseAgent: Generates the answers with at most `max_workers` parallel LLM calls.
+        Returns one MCP message per question, in input order.
+        """
+        queries = list(queries)
+        max_workers = max_workers or BATCH_LLM_WORKERS
+        logger.info(f"--- Starting Batch Query Pipeline for {len(queries)} questions ---")
+        kb_version = self.kb_version
+        results = [None] * len(queries)
+
+        # 0. Answer repeated questions from the cache; identical questions in the batch are asked once
+        pending = {}
+        for i, query in enumerate(queries):
+            cache_key = (normalize_query(query or ""), kb_version)
+            cached_response = self._cached_answer(cache_key) if query else None
+            if cached_response is not None:
+                results[i] = cached_response
+            else:
+                pending.setdefault(cache_key, (query, []))[1].append(i)
+
+        # 1. Retrieve the context for every remaining question in one batched call
+        mcp_retrieve_request = create_mcp_message(
+            "Orchestrator", "RetrievalAgent", "RETRIEVE_BATCH_REQUEST",
+            {"queries": [query for query, _ in pending.values()], "top_k": self._retrieval_top_k(), "kb_version": kb_version}
+        )
+        logger.debug(f"-> Calling RetrievalAgent to retrieve context for {len(pending)} questions...")
+        retrievals = self.retrieval_agent.retrieve_context_batch(mcp_retrieve_request) if pending else []
+
+        # 2. Generate the answers with bounded parallelism
+        def answer(mcp_from_retrieval):
+            if mcp_from_retrieval['type'] == 'CONTEXT_ERROR':
+                return mcp_from_retrieval
+            return self.llm_agent.generate_response(self._rerank(mcp_from_retrieval))
+
+        logger.debug(f"Context received. -> Generating answers with up to {max_workers} parallel LLM calls...")
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            responses = list(executor.map(bind_context(answer), retrievals))
+
+        for (cache_key, (_, indices)), response in zip(pending.items(), responses):
+            if response['type'] == 'FINAL_RESPONSE':
+                self._cache_answer(cache_key, response)
+            for i in indices:
+                results[i] = response
+
+        logger.info("--- Batch Query Pipeline Complete ---")
+        return results
+
+    @traced
+    async def aask_question(self, query: str):
+        """
+        Async variant of ask_question, for serving many questions concurrently from one
+        process. At most MAX_CONCURRENT_QUESTIONS run at once; the rest wait their turn.
+        """
+        loop = asyncio.get_running_loop()
+        if self._question_limiter_loop is not loop:
+            self._question_limiter = asyncio.Semaphore(MAX_CONCURRENT_QUESTIONS)
+            self._question_limiter_loop = loop
+
+        async with self._question_limiter:
+            logger.info(f"--- Starting Async Query Pipeline for: '{query}' ---")
+
+            # 0. Serve repeated questions straight from the answer cache
+            cache_key = (normalize_query(query), self.kb_version)
+            cached_response = self._cached_answer(cache_key)
+            if cached_response is not None:
+                logger.info("Answer cache hit. --- Query Pipeline Complete ---")
+                return cached_response
+
+            # 1. Retrieve the context for the query
+            mcp_retrieve_request = self._retrieve_request(query, cache_key[1])
+            mcp_from_retrieval = await self.retrieval_agent.aretrieve_context(mcp_retrieve_request)
+            if mcp_from_retrieval['type'] == 'CONTEXT_ERROR':
+                logger.error(f"Context retrieval failed: {mcp_from_retrieval['payload']['error']}")
+                return mcp_from_retrieval
+            mcp_from_retrieval = await asyncio.to_thread(self._rerank, mcp_from_retrieval) # CPU-bound scoring
+
+            # 2. Generate the answer
+            final_response_mcp = await self.llm_agent.agenerate_response(mcp_from_retrieval)
+            if final_response_mcp['type'] == 'FINAL_RESPONSE':
+                self._cache_answer(cache_key, final_response_mcp)
+
+            logger.info("--- Async Query Pipeline Complete ---")
+            return final_response_mcp
+
+    @traced
+    def ask_question_stream(self, query: str):
+        """
+        Streaming variant of ask_question. Yields RESPONSE_TOKEN messages as the answer is
+        generated and ends with the FINAL_RESPONSE (or an error message). The final payload's
+        `timings` separate retrieval time, time-to-first-token and total latency.
+        """
+        logger.info(f"--- Starting Streaming Query Pipeline for: '{query}' ---")
+        start = time.perf_counter()
+
+        # 0. Serve repeated questions straight from the answer cache
+        cache_key = (normalize_query(query), self.kb_version)
+        cached_response = self._cached_answer(cache_key)
+        if cached_response is not None:
+            total_ms = (time.perf_counter() - start) * 1000
+            cached_response['payload']['timings'] = {
+                "retrieval_ms": 0.0, "time_to_first_token_ms": total_ms, "total_ms": total_ms
+            }
+            logger.info("Answer cache hit. --- Query Pipeline Complete ---")
+            yield cached_response
+            return
+
+        # 1-2. Retrieve the context for the query
+        mcp_from_retrieval = self._retrieve(query, cache_key[1])
+        if mcp_from_retrieval['type'] == 'CONTEXT_ERROR':
+            yield mcp_from_retrieval
+            return
+        retrieval_ms = (time.perf_counter() - start) * 1000
+
+        # 3. Stream the answer from the LLMResponseAgent
+        logger.debug("Context received. -> Streaming answer from LLMResponseAgent...")
+        time_to_first_token_ms = None
+        for mcp_from_llm in self.llm_agent.generate_response_stream(mcp_from_retrieval):
+            if mcp_from_llm['type'] == 'RESPONSE_TOKEN':
+                if time_to_first_token_ms is None:
+                    time_to_first_token_ms = (time.perf_counter() - start) * 1000
+                yield mcp_from_llm
+                continue
+
+            if mcp_from_llm['type'] == 'FINAL_RESPONSE':
+                total_ms = (time.perf_counter() - start) * 1000
+                mcp_from_llm['payload']['timings'] = {
+                    **mcp_from_llm['payload'].get('timings', {}),
+                    "retrieval_ms": retrieval_ms,
+                    "time_to_first_token_ms": time_to_first_token_ms if time_to_first_token_ms is not None else total_ms,
+                    "total_ms": total_ms,
+                }
+                self._cache_answer(cache_key, mcp_from_llm)
+                logger.info(f"Time to first token: {mcp_from_llm['payload']['timings']['time_to_first_token_ms']:.0f} ms, "
+                            f"total: {total_ms:.0f} ms.")
+            yield mcp_from_llm
+
+        logger.info("--- Streaming Query Pipeline Complete ---")
+
+    @traced
+    def clear_knowledge_base(self):
+        """Removes every document from the knowledge base."""
+        logger.debug("-> Calling RetrievalAgent to clear the knowledge base...")
+        try:
+            return self.retrieval_agent.clear_knowledge_base()
+        finally:
+            self._knowledge_base_changed()
+
+    def cache_stats(self):
+        """Hit/miss metrics for the answer cache and the query embedding cache."""
+        return {
+            "kb_version": self.kb_version,
+            "answer_cache": self.answer_cache.stats(),
+            "query_embedding_cache": self.retrieval_agent.query_embedding_cache.stats(),
+            "semantic_cache": self.llm_agent.semantic_cache.stats(),
+            "reranker": self.reranker.stats() if self.reranker is not None else None,
+        }
+
+    def health(self):
+        """Worker pool health on the MCP bus, or which agents are loaded when running in-process."""
+        if self.bus is not None:
+            return self.bus.health()
+        return {name: {"loaded": name in self._agents} for name in self._agent_locks}
+
+    def close(self):
+        """Stops the ingestion job workers and the MCP bus worker pools, if any."""
+        if self._ingestion_queue is not None:
+            self._ingestion_queue.close()
+        if self.bus is not None:
+            self.bus.close()
+
+    async def aclose(self):
+        """
+        Closes the async clients opened by aask_question. Await it before the serving event
+        loop ends; worker processes on the MCP bus answer synchronously and hold none.
+        """
+        if self.bus is None and "RetrievalAgent" in self._agents:
+            await self.retrieval_agent.aclose()
+
+    def metrics(self, fmt="json"):
+        """
+        Latency histograms and item totals of every pipeline stage (partition, split, encode,
+        upsert, vector_query, lexical_query, rerank, llm), as a dict or Prometheus text.
+        """
+        if fmt == "prometheus":
+            return METRICS.to_prometheus()
+        return METRICS.snapshot()
+
 # --- Let's test the full end-to-end pipeline ---
 if __name__ == "__main__":
     # This test simulates the entire process from document upload to getting an answer
+    from tracing import configure_logging
+
+    configure_logging()
     orchestrator = Orchestrator()
     
     # Optional: Clear the index for a clean test run
-    print("\n[Test Runner] Clearing Pinecone index for a fresh start...")
-    orchestrator.retrieval_agent.index.delete(delete_all=True)
+    print("\n[Test Runner] Clearing the vector store for a fresh start...")
+    orchestrator.clear_knowledge_base()
     
     # 1. Create a dummy document to ingest
     test_file_path = "test_data.txt"
@@ -98,13 +597,12 @@ if __name__ == "__main__":
     ingestion_result = orchestrator.ingest_document(test_file_path)
     print("\n[Test Runner] Ingestion Result:", json.dumps(ingestion_result, indent=2))
     
-    # 3. Wait for Pinecone to index (using our robust waiting loop)
+    # 3. Wait for the vector store to index (using our robust waiting loop)
     print("\n[Test Runner] Waiting for indexing...")
-    time.sleep(10) # Initial sleep, then poll
     while True:
-        stats = orchestrator.retrieval_agent.index.describe_index_stats()
-        if stats.get('total_vector_count', 0) > 0:
-            print(f"[Test Runner] Indexing complete! Vector count: {stats['total_vector_count']}")
+        vector_count = orchestrator.retrieval_agent.vector_store.count()
+        if vector_count > 0:
+            print(f"[Test Runner] Indexing complete! Vector count: {vector_count}")
             break
         print("[Test Runner] Waiting for vectors to appear in index...")
         time.sleep(5)
@@ -0,0 +1,222 @@
+# parse_cache.py
+import os
+import glob
+import gzip
+import json
+import time
+import uuid
+import sqlite3
+import hashlib
+import threading
+
+# --- Cache Configuration ---
+DEFAULT_CACHE_DIR = os.path.join(".rag_data", "parse_cache") # Override with PARSE_CACHE_DIR
+DEFAULT_CACHE_MAX_MB = 1024 # Override with PARSE_CACHE_MAX_MB (compressed bytes)
+HASH_BLOCK_BYTES = 1024 * 1024
+COMPRESS_LEVEL = 1 # Parts are written while the document streams through ingestion: favour speed over size
+STALE_TEMP_FILE_SECONDS = 24 * 3600 # Partial writes left behind by a crashed process are removed after this
+
+
+class ParseCache:
+    """
+    Persistent cache of parsed documents, so a file that was seen before (e.g. uploaded
+    again in a new session, under a new temp file name) is never parsed twice.
+
+    Entries are keyed by the SHA-256 of the file's bytes plus the parser settings that
+    shape the output (parser name and version, chunk size and overlap). Each entry has up
+    to two parts, the extracted element texts and the chunks, each a gzip file holding one
+    JSON string per line. Parts are written and read as streams, one text at a time, so
+    caching never holds a whole document in memory. A small SQLite index records each
+    part's size and last use, and a running total of the cached bytes; when it exceeds
+    `max_bytes`, the least recently used parts are evicted until the cache is back under
+    90% of the limit.
+    """
+
+    def __init__(self, directory=None, max_bytes=None):
+        directory = directory or os.getenv("PARSE_CACHE_DIR", DEFAULT_CACHE_DIR)
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv("PARSE_CACHE_MAX_MB", DEFAULT_CACHE_MAX_MB)) * 1024 * 1024)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        # Ingestion worker processes share the index, so wait for each other's writes;
+        # transactions are explicit (BEGIN IMMEDIATE) to keep the running total exact
+        self._db = sqlite3.connect(
+            os.path.join(directory, "index.sqlite3"), timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS parts ("
+            "cache_key TEXT NOT NULL, part TEXT NOT NULL, bytes INTEGER NOT NULL, last_used REAL NOT NULL, "
+            "PRIMARY KEY (cache_key, part))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS parts_last_used ON parts (last_used)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._db.execute("INSERT OR IGNORE INTO info VALUES ('total_bytes', 0)")
+        self._remove_stale_temp_files()
+
+    @staticmethod
+    def file_key(file_path, **settings):
+        """Cache key for a file's content under the given parser settings."""
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b""):
+                digest.update(block)
+        settings_json = json.dumps(settings, sort_keys=True)
+        return f"{digest.hexdigest()}-{hashlib.sha256(settings_json.encode('utf-8')).hexdigest()[:16]}"
+
+    def _path(self, cache_key, part):
+        return os.path.join(self.directory, f"{cache_key}.{part}.jsonl.gz")
+
+    def get(self, cache_key):
+        """Returns the set of parts ('elements', 'chunks') cached for this key, or None for a miss."""
+        with self._lock:
+            parts = {part for (part,) in self._db.execute("SELECT part FROM parts WHERE cache_key = ?", (cache_key,))}
+            if not parts:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE parts SET last_used = ? WHERE cache_key = ?", (time.time(), cache_key))
+            self.hits += 1
+        return parts
+
+    def read(self, cache_key, part):
+        """
+        Opens a cached part and returns an iterator over its texts, or None if the part has
+        just been evicted. Once open, the part stays readable even if it is evicted meanwhile.
+        """
+        try:
+            f = gzip.open(self._path(cache_key, part), "rt", encoding="utf-8")
+        except FileNotFoundError:
+            return None
+        return self._texts(f)
+
+    @staticmethod
+    def _texts(f):
+        with f:
+            for line in f:
+                yield json.loads(line)
+
+    def writer(self, cache_key, part):
+        """Returns a ParseCacheWriter that streams one part of an entry to disk."""
+        return ParseCacheWriter(self, cache_key, part)
+
+    def _store(self, cache_key, part, temp_path, size):
+        """Publishes a fully written part, then evicts old parts if the cache is over budget."""
+        os.replace(temp_path, self._path(cache_key, part))
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT bytes FROM parts WHERE cache_key = ? AND part = ?", (cache_key, part)
+                ).fetchone()
+                self._db.execute(
+                    "INSERT OR REPLACE INTO parts (cache_key, part, bytes, last_used) VALUES (?, ?, ?, ?)",
+                    (cache_key, part, size, time.time())
+                )
+                self._db.execute(
+                    "UPDATE info SET value = value + ? WHERE key = 'total_bytes'", (size - (row[0] if row else 0),)
+                )
+                if self._total_bytes() > self.max_bytes:
+                    self._evict(int(self.max_bytes * 0.9))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _total_bytes(self):
+        return self._db.execute("SELECT value FROM info WHERE key = 'total_bytes'").fetchone()[0]
+
+    def total_bytes(self):
+        with self._lock:
+            return self._total_bytes()
+
+    def _evict(self, target_bytes):
+        """Deletes least recently used parts until at most `target_bytes` remain. Runs inside a transaction."""
+        remaining = self._total_bytes()
+        to_delete = []
+        for cache_key, part, size in self._db.execute("SELECT cache_key, part, bytes FROM parts ORDER BY last_used"):
+            if remaining <= target_bytes:
+                break
+            to_delete.append((cache_key, part))
+            remaining -= size
+        self._db.executemany("DELETE FROM parts WHERE cache_key = ? AND part = ?", to_delete)
+        self._db.execute("UPDATE info SET value = ? WHERE key = 'total_bytes'", (remaining,))
+        for cache_key, part in to_delete:
+            try:
+                os.remove(self._path(cache_key, part))
+            except FileNotFoundError:
+                pass
+        self.evictions += len(to_delete)
+
+    def _remove_stale_temp_files(self):
+        cutoff = time.time() - STALE_TEMP_FILE_SECONDS
+        for path in glob.glob(os.path.join(self.directory, "*.tmp")):
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "size_mb": round(self.total_bytes() / (1024 * 1024), 2),
+        }
+
+
+class ParseCacheWriter:
+    """
+    Streams the texts of one cache part into a compressed temp file. `commit` publishes
+    it; `abort` (or a part that outgrows the whole cache) discards it.
+    """
+
+    def __init__(self, cache, cache_key, part):
+        self.cache = cache
+        self.cache_key = cache_key
+        self.part = part
+        self.temp_path = os.path.join(cache.directory, f"{cache_key}.{part}.{uuid.uuid4().hex}.tmp")
+        self._file = open(self.temp_path, "wb")
+        self._gzip = gzip.GzipFile(fileobj=self._file, mode="wb", compresslevel=COMPRESS_LEVEL)
+
+    def write(self, text):
+        if self._gzip is None:
+            return
+        self._gzip.write(json.dumps(text).encode("utf-8") + b"\n")
+        if self._file.tell() > self.cache.max_bytes:
+            self.abort() # Too large to ever fit in the cache
+
+    def record(self, texts):
+        """Passes `texts` through, writing each one to the part on the way."""
+        for text in texts:
+            self.write(text)
+            yield text
+
+    def _close(self):
+        self._gzip.close()
+        self._file.close()
+        self._gzip = None
+
+    def commit(self):
+        if self._gzip is None:
+            return
+        self._close()
+        try:
+            self.cache._store(self.cache_key, self.part, self.temp_path, os.path.getsize(self.temp_path))
+        except Exception:
+            if os.path.exists(self.temp_path):
+                os.remove(self.temp_path)
+            raise
+
+    def abort(self):
+        if self._gzip is None:
+            return
+        self._close()
+        os.remove(self.temp_path)
@@ -0,0 +1,148 @@
+# quantization.py
+import numpy as np
+
+# --- Quantization Configuration ---
+SCORE_BLOCK_ROWS = 8192 # Codes are decoded/scored in cache-sized blocks to bound temporary memory
+KMEANS_ITERATIONS = 20
+PQ_CENTROIDS = 256 # One uint8 code per subspace
+
+
+class ScalarQuantizer:
+    """
+    int8 scalar quantization: every dimension is mapped linearly from its trained
+    [min, max] range onto 0..255, so a vector costs `dimension` bytes instead of 4x that.
+    Queries stay in float32 and are scored directly against the codes (asymmetric distance).
+    """
+    kind = "sq8"
+    train_size = 1000 # Vectors needed before the quantizer is trained
+
+    def __init__(self, dimension):
+        self.dimension = dimension
+        self.code_size = dimension
+        self.minimum = None
+        self.scale = None
+
+    def fit(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self.minimum = vectors.min(axis=0)
+        self.scale = np.maximum(vectors.max(axis=0) - self.minimum, 1e-12) / 255.0
+
+    def encode(self, vectors):
+        codes = np.rint((np.asarray(vectors, dtype=np.float32) - self.minimum) / self.scale)
+        return np.clip(codes, 0, 255).astype(np.uint8)
+
+    def decode(self, codes):
+        return codes.astype(np.float32) * self.scale + self.minimum
+
+    def scores(self, codes, query):
+        """Inner products of `query` with the decoded vectors, without materialising them all."""
+        query = np.asarray(query, dtype=np.float32)
+        weights = query * self.scale
+        offset = float(query @ self.minimum)
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_BLOCK_ROWS):
+            block = codes[start:start + SCORE_BLOCK_ROWS]
+            scores[start:start + len(block)] = block.astype(np.float32) @ weights + offset
+        return scores
+
+    def state(self):
+        return {"minimum": self.minimum, "scale": self.scale}
+
+    def load_state(self, state):
+        self.minimum = state["minimum"]
+        self.scale = state["scale"]
+
+
+class ProductQuantizer:
+    """
+    Product quantization: the vector is split into `subspaces` slices and each slice is
+    replaced by the id of its nearest k-means centroid (one byte). With 384 dimensions and
+    48 subspaces a vector shrinks from 1536 to 48 bytes. Scoring builds a per-query lookup
+    table of slice-centroid inner products and sums one table entry per subspace (ADC).
+    """
+    kind = "pq"
+    train_size = 10 * PQ_CENTROIDS
+
+    def __init__(self, dimension, subspaces=None):
+        subspaces = subspaces or max(1, dimension // 8)
+        if dimension % subspaces:
+            raise ValueError(f"Dimension {dimension} is not divisible into {subspaces} subspaces.")
+        self.dimension = dimension
+        self.subspaces = subspaces
+        self.code_size = subspaces
+        self.sub_dimension = dimension // subspaces
+        self.centroids = None # (subspaces, PQ_CENTROIDS, sub_dimension)
+
+    def _split(self, vectors):
+        return np.asarray(vectors, dtype=np.float32).reshape(len(vectors), self.subspaces, self.sub_dimension)
+
+    def fit(self, vectors, seed=0):
+        rng = np.random.default_rng(seed)
+        slices = self._split(vectors)
+        self.centroids = np.empty((self.subspaces, PQ_CENTROIDS, self.sub_dimension), dtype=np.float32)
+        for subspace in range(self.subspaces):
+            points = slices[:, subspace]
+            centroids = points[rng.choice(len(points), PQ_CENTROIDS, replace=len(points) < PQ_CENTROIDS)].copy()
+            for _ in range(KMEANS_ITERATIONS):
+                assignment = self._nearest(points, centroids)
+                counts = np.bincount(assignment, minlength=PQ_CENTROIDS)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assignment, points)
+                filled = counts > 0
+                centroids[filled] = sums[filled] / counts[filled, None]
+                # Re-seed empty clusters with random points so every code stays useful
+                empty = np.flatnonzero(~filled)
+                if len(empty):
+                    centroids[empty] = points[rng.choice(len(points), len(empty))]
+            self.centroids[subspace] = centroids
+
+    @staticmethod
+    def _nearest(points, centroids):
+        distances = (points ** 2).sum(axis=1, keepdims=True) - 2 * points @ centroids.T + (centroids ** 2).sum(axis=1)
+        return distances.argmin(axis=1)
+
+    def encode(self, vectors):
+        slices = self._split(vectors)
+        codes = np.empty((len(slices), self.subspaces), dtype=np.uint8)
+        for subspace in range(self.subspaces):
+            codes[:, subspace] = self._nearest(slices[:, subspace], self.centroids[subspace])
+        return codes
+
+    def decode(self, codes):
+        return self.centroids[np.arange(self.subspaces), codes].reshape(len(codes), self.dimension)
+
+    def scores(self, codes, query):
+        query_slices = np.asarray(query, dtype=np.float32).reshape(self.subspaces, self.sub_dimension)
+        table = np.einsum("sd,scd->sc", query_slices, self.centroids) # (subspaces, PQ_CENTROIDS)
+        scores = np.zeros(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_BLOCK_ROWS):
+            block = codes[start:start + SCORE_BLOCK_ROWS]
+            block_scores = scores[start:start + len(block)]
+            for subspace in range(self.subspaces):
+                block_scores += table[subspace, block[:, subspace]]
+        return scores
+
+    def state(self):
+        return {"centroids": self.centroids}
+
+    def load_state(self, state):
+        self.centroids = state["centroids"]
+
+
+def create_quantizer(kind, dimension):
+    """Builds the quantizer selected by name ('sq8' or 'pq')."""
+    if kind == "sq8":
+        return ScalarQuantizer(dimension)
+    if kind == "pq":
+        return ProductQuantizer(dimension)
+    raise ValueError(f"Unknown quantization '{kind}'. Expected 'none', 'sq8' or 'pq'.")
+
+
+def recall_at_k(exact_ids, approximate_ids):
+    """Mean fraction of each exact top-k list that the approximate search also returned."""
+    if not exact_ids:
+        return 0.0
+    return float(np.mean([
+        len(set(exact) & set(approximate)) / len(exact) if exact else 1.0
+        for exact, approximate in zip(exact_ids, approximate_ids)
+    ]))
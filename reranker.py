@@ -0,0 +1,100 @@
+# reranker.py
+import time
+import logging
+
+from mcp import create_mcp_message
+from tracing import span, traced
+
+logger = logging.getLogger(__name__)
+
+# --- Reranker Configuration ---
+RERANK_MODEL = 'cross-encoder/ms-marco-MiniLM-L-6-v2' # Small enough to score a few dozen pairs on CPU
+RERANK_CANDIDATES = 20 # Chunks fetched from the vector store per question when reranking
+RERANK_TOP_N = 5 # Chunks kept for the LLM
+RERANK_BATCH_SIZE = 8
+RERANK_BUDGET_MS = 200 # Per-request scoring budget; beyond it the vector order is kept
+
+
+class Reranker:
+    """
+    Reorders retrieved chunks with a cross-encoder, which reads the question and a chunk
+    together and scores their relevance far more precisely than embedding similarity.
+
+    Candidates are scored in small batches. If the request's millisecond budget runs out
+    before every candidate is scored, the reranker gives up and keeps the vector order, so
+    a slow CPU never delays an answer by more than roughly one batch.
+    """
+
+    def __init__(self, agent_name="Reranker", model_name=RERANK_MODEL, top_n=RERANK_TOP_N,
+                 budget_ms=RERANK_BUDGET_MS, batch_size=RERANK_BATCH_SIZE):
+        self.name = agent_name
+        self.top_n = top_n
+        self.budget_ms = budget_ms
+        self.batch_size = batch_size
+        logger.info(f"Loading cross-encoder: {model_name}")
+        from sentence_transformers import CrossEncoder
+        self.model = CrossEncoder(model_name, device='cpu')
+        self.reranked = 0
+        self.fallbacks = 0
+        logger.info("Cross-encoder loaded.")
+
+    def rerank(self, query, chunks, top_n=None, budget_ms=None):
+        """
+        Returns (best `top_n` chunks, info). `info` reports whether the cross-encoder order
+        was used and how long scoring took.
+        """
+        top_n = top_n or self.top_n
+        budget_ms = self.budget_ms if budget_ms is None else budget_ms
+        if len(chunks) <= 1:
+            return chunks[:top_n], {"reranked": False, "rerank_ms": 0.0}
+
+        start = time.perf_counter()
+        scores = []
+        for i in range(0, len(chunks), self.batch_size):
+            batch = chunks[i:i + self.batch_size]
+            scores.extend(self.model.predict([(query, chunk['text']) for chunk in batch], batch_size=self.batch_size))
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if elapsed_ms > budget_ms and len(scores) < len(chunks):
+                self.fallbacks += 1
+                logger.warning(f"Budget of {budget_ms} ms exceeded after {len(scores)}/{len(chunks)} chunks. "
+                               f"Keeping vector order.")
+                return chunks[:top_n], {"reranked": False, "rerank_ms": elapsed_ms, "budget_exceeded": True}
+
+        order = sorted(range(len(chunks)), key=lambda i: scores[i], reverse=True)[:top_n]
+        self.reranked += 1
+        return (
+            [{**chunks[i], "rerank_score": float(scores[i])} for i in order],
+            {"reranked": True, "rerank_ms": (time.perf_counter() - start) * 1000},
+        )
+
+    @traced
+    def rerank_context(self, mcp_message):
+        """Receives a CONTEXT_RESPONSE and forwards it to the LLMResponseAgent with only the best chunks."""
+        payload = mcp_message.get('payload', {})
+        with span("rerank", candidates=len(payload.get('top_chunks', []))) as attributes:
+            chunks, info = self.rerank(payload.get('query', ""), payload.get('top_chunks', []))
+            attributes["chunks"] = len(chunks)
+        logger.info(f"Kept {len(chunks)} of {len(payload.get('top_chunks', []))} chunks "
+                    f"({'reranked' if info['reranked'] else 'vector order'}, {info['rerank_ms']:.0f} ms).")
+        return create_mcp_message(
+            self.name, "LLMResponseAgent", "CONTEXT_RESPONSE",
+            {**payload, "top_chunks": chunks, "rerank": info}
+        )
+
+    def stats(self):
+        return {"reranked": self.reranked, "fallbacks": self.fallbacks}
+
+
+# --- Let's test this step in isolation ---
+if __name__ == "__main__":
+    from tracing import configure_logging
+
+    configure_logging()
+    reranker = Reranker()
+    candidates = [
+        {"text": "Groq is a company that builds custom chips for high-speed AI inference.", "id": "a"},
+        {"text": "Pinecone is a vector database used for storing and retrieving high-dimensional data.", "id": "b"},
+        {"text": "The LPU (Language Processing Unit) from Groq is designed for sequential processing tasks.", "id": "c"},
+    ]
+    chunks, info = reranker.rerank("What is Groq's LPU?", candidates, top_n=2)
+    print("Reranked:", [chunk['id'] for chunk in chunks], info)
@@ -1,99 +1,210 @@
 # retrieval_agent.py
 import os
 import time
+import asyncio
+import logging
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from dotenv import load_dotenv
-from pinecone import Pinecone, ServerlessSpec
-from sentence_transformers import SentenceTransformer
 
 from mcp import create_mcp_message
+from vector_store import create_vector_store
+from embedding_agent import EmbeddingAgent
+from document_manifest import DocumentManifest, make_chunk_id
+from memory_profile import StageMemoryTracker
+from upsert_engine import UpsertEngine, UpsertError
+from lexical_index import BM25Index, reciprocal_rank_fusion
+from tracing import span, traced, bind_context
+
+logger = logging.getLogger(__name__)
 
 # --- Agent Configuration ---
-PINECONE_INDEX_NAME = "rag"
-EMBEDDING_MODEL = 'all-MiniLM-L6-v2' # 384 dimensions
+DEFAULT_VECTOR_STORE_BACKEND = "pinecone" # Override with VECTOR_STORE_BACKEND='local' to run offline
+EMBED_BATCH_SIZE = 64 # Chunks embedded per micro-batch; the UpsertEngine merges micro-batches into full requests
+ENCODE_WORKERS = 2 # Threads used by the async path for CPU-bound query encoding
+HYBRID_CANDIDATES = 20 # Dense and lexical candidates fused per query (set HYBRID_RETRIEVAL=0 for dense only)
 
 class RetrievalAgent:
-    def __init__(self, agent_name="RetrievalAgent"):
+    def __init__(self, agent_name="RetrievalAgent", vector_store=None, embedding_cache=None, embedding_model=None):
         self.name = agent_name
-        print(f"[{self.name}] Initializing...")
+        logger.info("Initializing...")
         
         # Load environment variables
         load_dotenv()
-        pinecone_api_key = os.getenv("PINECONE_API_KEY")
-        if not pinecone_api_key:
-            raise ValueError("PINECONE_API_KEY is not set in the .env file.")
-
-        # 1. Initialize Embedding Model (do this once for efficiency)
-        print(f"[{self.name}] Loading embedding model: {EMBEDDING_MODEL}")
-        self.embedding_model = SentenceTransformer(EMBEDDING_MODEL, device='cpu') # Use 'cuda' if GPU is available
-        self.embedding_dimension = self.embedding_model.get_sentence_embedding_dimension()
-        print(f"[{self.name}] Embedding model loaded. Dimension: {self.embedding_dimension}")
+
+        self.startup_timings = {}
+
+        # 1. Initialize the embedding model and its caches (requests may also bring their own embeddings,
+        # encoded by the EmbeddingAgent pool on the MCP bus)
+        self.embedder = EmbeddingAgent(embedding_model=embedding_model, embedding_cache=embedding_cache)
+        self.embedding_model = self.embedder.embedding_model
+        self.embedding_dimension = self.embedder.embedding_dimension
+        self.embedding_cache = self.embedder.embedding_cache
+        self.query_embedding_cache = self.embedder.query_embedding_cache
+        self.startup_timings["embedding_model"] = self.embedder.load_ms
+        self._encode_executor = ThreadPoolExecutor(max_workers=ENCODE_WORKERS, thread_name_prefix="encode")
         
-        # 2. Initialize Pinecone connection
-        print(f"[{self.name}] Initializing Pinecone...")
-        self.pc = Pinecone(api_key=pinecone_api_key)
-        self._ensure_pinecone_index()
-        self.index = self.pc.Index(PINECONE_INDEX_NAME)
-        print(f"[{self.name}] Pinecone initialized. Index stats: {self.index.describe_index_stats()}")
-
-    def _ensure_pinecone_index(self):
-        """Checks if the Pinecone index exists, and if not, creates it."""
-        if PINECONE_INDEX_NAME not in self.pc.list_indexes().names():
-            print(f"[{self.name}] Index '{PINECONE_INDEX_NAME}' not found. Creating new index...")
-            try:
-                self.pc.create_index(
-                    name=PINECONE_INDEX_NAME,
-                    dimension=self.embedding_dimension,
-                    metric='cosine',
-                    spec=ServerlessSpec(
-                        cloud='aws', 
-                        region='us-east-1'
-                    )
-                )
-                print(f"[{self.name}] Index created successfully. Waiting for initialization...")
-                time.sleep(10) # Wait a bit for the index to be ready
-            except Exception as e:
-                print(f"[{self.name}] Error creating index: {e}")
-                raise
-        else:
-            print(f"[{self.name}] Found existing index '{PINECONE_INDEX_NAME}'.")
-
-    def embed_and_store(self, mcp_message):
-        """Receives chunks from IngestionAgent, creates embeddings, and stores them."""
+        # 2. Initialize the vector store (Pinecone or the in-process local store)
+        start = time.perf_counter()
+        if vector_store is None:
+            backend = os.getenv("VECTOR_STORE_BACKEND", DEFAULT_VECTOR_STORE_BACKEND)
+            logger.info(f"Initializing '{backend}' vector store...")
+            vector_store = create_vector_store(backend, self.embedding_dimension)
+        self.vector_store = vector_store
+        self.startup_timings["vector_store"] = (time.perf_counter() - start) * 1000
+        logger.info(f"'{self.vector_store.name}' vector store initialized.")
+
+        # 3. Per-document manifest of stored chunk ids, used for incremental re-ingestion
+        self.manifest = DocumentManifest(self.vector_store.name)
+
+        # 4. BM25 index over the same chunks, fused with dense results to catch exact identifiers and acronyms.
+        # With HYBRID_RETRIEVAL=0 it is neither loaded nor maintained; chunks stored meanwhile are indexed
+        # when their document is next ingested with hybrid retrieval on.
+        self.hybrid_retrieval = os.getenv("HYBRID_RETRIEVAL", "1") != "0"
+        self.lexical_index = None
+        if self.hybrid_retrieval:
+            start = time.perf_counter()
+            self.lexical_index = BM25Index(self.vector_store.name)
+            self.startup_timings["lexical_index"] = (time.perf_counter() - start) * 1000
+            logger.info(f"Lexical index loaded with {len(self.lexical_index)} chunks.")
+
+    @traced
+    def embed_and_store(self, mcp_message, on_batch_stored=None, persist=True):
+        """
+        Receives chunks from IngestionAgent, creates embeddings, and stores them.
+        `chunks` may be a list or a generator: it is consumed in micro-batches that are
+        embedded and upserted before more chunks are pulled, so memory stays bounded.
+        An optional `embeddings` sequence aligned with `chunks` (encoded by EmbeddingAgent
+        workers) is used instead of encoding here.
+        `on_batch_stored(chunk_count)` is called as each micro-batch lands in the vector store.
+        Saving the vector store's in-memory index (e.g. the HNSW graph) rewrites all of it, so
+        callers storing many documents pass `persist=False` and call `persist` once at the end.
+        """
         payload = mcp_message.get('payload', {})
         chunks = payload.get('chunks')
+        embeddings = payload.get('embeddings')
         source_file = payload.get('source_file', 'unknown_source')
 
         if not chunks:
-            return create_mcp_message(self.name, "Orchestrator", "STORAGE_ERROR", {"error": "No chunks received."})
+            return create_mcp_message(
+                self.name, "Orchestrator", "STORAGE_ERROR", {"source_file": source_file, "error": "No chunks received."}
+            )
 
-        print(f"[{self.name}] Received {len(chunks)} chunks from '{source_file}'. Creating embeddings...")
-        
-        # Create embeddings for all chunks in a single, efficient batch operation
-        embeddings = self.embedding_model.encode(chunks, show_progress_bar=True)
-
-        # Prepare vectors for Pinecone upsert
-        vectors_to_upsert = []
-        for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-            vector_id = f"{source_file}-{i}"
-            metadata = {"text": chunk, "source": source_file}
-            vectors_to_upsert.append((vector_id, embedding.tolist(), metadata))
-        
-        print(f"[{self.name}] Upserting {len(vectors_to_upsert)} vectors to Pinecone...")
-        
-        # Upsert in batches for performance and to stay within limits
-        batch_size = 100
-        for i in range(0, len(vectors_to_upsert), batch_size):
-            batch = vectors_to_upsert[i:i + batch_size]
-            self.index.upsert(vectors=batch)
+        logger.info(f"Receiving chunks from '{source_file}'. Embedding and storing in batches of {EMBED_BATCH_SIZE}...")
+        memory = StageMemoryTracker()
+
+        # The manifest of what is already stored for this document drives the diff
+        stored_ids = self.manifest.chunk_ids(source_file)
+        seen_ids = set()
+        upserted = 0
+        chunk_iter = zip(chunks, embeddings) if embeddings is not None else ((chunk, None) for chunk in chunks)
+
+        def record_stored(batch):
+            # Runs on an upload thread once a batch has actually landed in the vector store
+            self.manifest.add(source_file, [vector_id for vector_id, _, _ in batch])
+            if self.lexical_index is not None:
+                self.lexical_index.add_many((vector_id, metadata['text']) for vector_id, _, metadata in batch)
+            if on_batch_stored is not None:
+                on_batch_stored(len(batch))
+
+        # Uploads run in the background, so encoding batch N+1 overlaps the upload of batch N
+        with UpsertEngine(self.vector_store) as upsert_engine:
+            while True:
+                # 1. Pull the next micro-batch of chunks from the (possibly streaming) producer
+                batch = list(itertools.islice(chunk_iter, EMBED_BATCH_SIZE))
+                memory.sample("chunk")
+                if not batch:
+                    break
+
+                # 2. Keep only new chunks: unchanged ones are already stored under the same id
+                new_vectors = {}
+                for chunk, embedding in batch:
+                    vector_id = make_chunk_id(source_file, chunk)
+                    if vector_id not in seen_ids:
+                        seen_ids.add(vector_id)
+                        if vector_id not in stored_ids:
+                            new_vectors[vector_id] = (chunk, embedding)
+                        elif self.lexical_index is not None and vector_id not in self.lexical_index:
+                            # Stored before the lexical index existed: index it without re-embedding
+                            self.lexical_index.add(vector_id, chunk)
+                if not new_vectors:
+                    continue
+
+                # 3. Embed the micro-batch, encoding only those chunks missing from the cache
+                if embeddings is None:
+                    batch_embeddings = self.embedder.encode_chunks([chunk for chunk, _ in new_vectors.values()])
+                else:
+                    batch_embeddings = [embedding for _, embedding in new_vectors.values()]
+                memory.sample("embed")
+
+                # 4. Hand the micro-batch to the upload buffer; this blocks only when too many uploads are in flight
+                vectors_to_upsert = [
+                    (vector_id, embedding, {"text": chunk, "source": source_file})
+                    for (vector_id, (chunk, _)), embedding in zip(new_vectors.items(), batch_embeddings)
+                ]
+                upsert_engine.submit(vectors_to_upsert, on_success=record_stored)
+                upserted += len(vectors_to_upsert)
+                memory.sample("upsert")
+
+            try:
+                upsert_engine.flush()
+            except UpsertError as e:
+                logger.error(f"Upsert failed: {e}")
+                return create_mcp_message(
+                    self.name, "Orchestrator", "STORAGE_ERROR",
+                    {"source_file": source_file, "error": str(e), "retryable": e.retryable}
+                )
+            upsert_stats = upsert_engine.stats()
+
+        if not seen_ids:
+            return create_mcp_message(
+                self.name, "Orchestrator", "STORAGE_ERROR", {"source_file": source_file, "error": "No chunks received."}
+            )
+
+        # 5. Remove chunks that no longer exist in the new version of the document
+        stale_ids = stored_ids - seen_ids
+        if stale_ids:
+            logger.info(f"Deleting {len(stale_ids)} stale vectors...")
+            self.vector_store.delete(stale_ids)
+            self.manifest.remove(source_file, stale_ids)
+            if self.lexical_index is not None:
+                self.lexical_index.remove(stale_ids)
+        if self.lexical_index is not None:
+            self.lexical_index.save() # Appends only this document's changes to the index's log
+        if persist:
+            self.persist()
 
-        print(f"[{self.name}] Upsert complete.")
+        unchanged = len(seen_ids) - upserted
+        logger.info(f"Upsert complete: {upserted} new, {unchanged} unchanged, {len(stale_ids)} stale. "
+                    f"Upload: {upsert_stats}. Embedding cache: {self.embedding_cache.stats()}. Memory: {memory.report()}")
         return create_mcp_message(
             self.name, "Orchestrator", "STORAGE_SUCCESS", 
-            {"message": f"Successfully stored {len(vectors_to_upsert)} chunks from {source_file}."}
+            {
+                "message": f"Successfully stored {len(seen_ids)} chunks from {source_file}.",
+                "source_file": source_file,
+                "upserted": upserted,
+                "unchanged": unchanged,
+                "deleted": len(stale_ids),
+                "upsert_stats": upsert_stats,
+                "memory": memory.report()
+            }
         )
 
+    def persist(self):
+        """Saves the vector store's in-memory index to disk (a no-op for stores that persist every write)."""
+        self.vector_store.persist()
+
+    async def aclose(self):
+        """Closes the vector store's async client; await it before the serving event loop ends."""
+        await self.vector_store.aclose()
+
+    @traced
     def retrieve_context(self, mcp_message):
-        """Receives a query, embeds it, and retrieves relevant context from Pinecone."""
+        """
+        Receives a query, embeds it (unless the payload brings its `query_embedding`), and
+        retrieves relevant context from the vector store.
+        """
         payload = mcp_message.get('payload', {})
         query = payload.get('query')
         top_k = payload.get('top_k', 5) # Default to retrieving top 5 chunks
@@ -101,39 +212,157 @@ class RetrievalAgent:
         if not query:
             return create_mcp_message(self.name, "LLMResponseAgent", "CONTEXT_ERROR", {"error": "No query received."})
 
-        print(f"[{self.name}] Received query: '{query}'. Retrieving context...")
+        logger.debug(f"Received query: '{query}'. Retrieving context...")
         
         # 1. Embed the user's query
-        query_embedding = self.embedding_model.encode(query).tolist()
+        query_embedding = payload.get('query_embedding')
+        if query_embedding is None:
+            query_embedding = self.embedder.encode_query(query)
         
-        # 2. Query Pinecone
-        query_result = self.index.query(
-            vector=query_embedding,
-            top_k=top_k,
-            include_metadata=True
-        )
+        # 2. Query the vector store, then fuse with the lexical matches
+        with span("vector_query", top_k=self._candidate_count(top_k)) as attributes:
+            matches = self.vector_store.query(query_embedding, top_k=attributes["top_k"])
+            attributes["matches"] = len(matches)
+        matches = self._hybrid_matches(query, matches, top_k)
+
+        return self._context_response(payload, query_embedding, matches)
+
+    @traced
+    async def aretrieve_context(self, mcp_message):
+        """
+        Async variant of retrieve_context. Query encoding is CPU-bound, so it runs on a small
+        dedicated executor; the vector store query uses the backend's async path.
+        """
+        payload = mcp_message.get('payload', {})
+        query = payload.get('query')
+        top_k = payload.get('top_k', 5)
+
+        if not query:
+            return create_mcp_message(self.name, "LLMResponseAgent", "CONTEXT_ERROR", {"error": "No query received."})
+
+        logger.debug(f"Received query: '{query}'. Retrieving context asynchronously...")
+        loop = asyncio.get_running_loop()
+        query_embedding = payload.get('query_embedding')
+        if query_embedding is None:
+            # run_in_executor does not carry context variables over, so bind the trace explicitly
+            query_embedding = await loop.run_in_executor(
+                self._encode_executor, bind_context(self.embedder.encode_query), query
+            )
+        with span("vector_query", top_k=self._candidate_count(top_k)) as attributes:
+            matches = await self.vector_store.aquery(query_embedding, top_k=attributes["top_k"])
+            attributes["matches"] = len(matches)
+        matches = await asyncio.to_thread(self._hybrid_matches, query, matches, top_k) # May fetch from the store
 
-        # 3. Extract the text from the results
-        context_chunks = [match['metadata'] for match in query_result['matches']]
+        return self._context_response(payload, query_embedding, matches)
+
+    @traced
+    def retrieve_context_batch(self, mcp_message):
+        """
+        Retrieves context for many queries at once: every uncached query is encoded in one
+        batched model call (skipped when the payload brings `query_embeddings`) and the
+        vector searches run as one batched store query.
+        Returns one CONTEXT_RESPONSE (or CONTEXT_ERROR) message per query, in input order.
+        """
+        payload = mcp_message.get('payload', {})
+        queries = payload.get('queries') or []
+        top_k = payload.get('top_k', 5)
+        logger.info(f"Received a batch of {len(queries)} queries. Retrieving context...")
+
+        # 1. Encode all queries missing from the query embedding cache in a single pass
+        query_embeddings = payload.get('query_embeddings')
+        if query_embeddings is None:
+            query_embeddings = self.embedder.encode_queries(queries)
+
+        # 2. Search the vector store for every valid query at once
+        valid = [i for i, query in enumerate(queries) if query]
+        candidates = self._candidate_count(top_k)
+        matches = []
+        if valid:
+            with span("vector_query", top_k=candidates, queries=len(valid)):
+                matches = self.vector_store.query_batch([query_embeddings[i] for i in valid], top_k=candidates)
+        matches = [self._hybrid_matches(queries[i], dense, top_k) for i, dense in zip(valid, matches)]
+        matches_by_index = dict(zip(valid, matches))
+
+        # 3. Build one response per query, preserving input order
+        responses = []
+        for i, query in enumerate(queries):
+            if not query:
+                responses.append(create_mcp_message(
+                    self.name, "LLMResponseAgent", "CONTEXT_ERROR", {"error": "No query received."}
+                ))
+                continue
+            responses.append(self._context_response(
+                {**payload, "query": query}, query_embeddings[i], matches_by_index[i]
+            ))
+        return responses
+
+    def _candidate_count(self, top_k):
+        """Number of dense candidates to fetch: a wider pool when they will be fused with lexical ones."""
+        return max(top_k, HYBRID_CANDIDATES) if self.hybrid_retrieval else top_k
+
+    def _hybrid_matches(self, query, dense_matches, top_k):
+        """Fuses dense and BM25 candidates with reciprocal rank fusion and returns the best `top_k`."""
+        if not self.hybrid_retrieval:
+            return dense_matches[:top_k]
+        with span("lexical_query", top_k=HYBRID_CANDIDATES) as attributes:
+            lexical_ids = [chunk_id for chunk_id, _ in self.lexical_index.search(query, HYBRID_CANDIDATES)]
+            attributes["matches"] = len(lexical_ids)
+        if not lexical_ids:
+            return dense_matches[:top_k]
+
+        fused = reciprocal_rank_fusion([[match['id'] for match in dense_matches], lexical_ids])[:top_k]
+        metadata = {match['id']: match['metadata'] for match in dense_matches}
+        # Lexical-only hits were not returned by the dense query, so look up their metadata
+        missing = [chunk_id for chunk_id, _ in fused if chunk_id not in metadata]
+        if missing:
+            metadata.update(self.vector_store.fetch(missing))
+        return [
+            {"id": chunk_id, "score": score, "metadata": metadata[chunk_id]}
+            for chunk_id, score in fused if chunk_id in metadata
+        ]
+
+    def _context_response(self, payload, query_embedding, matches):
+        """Builds the CONTEXT_RESPONSE message for a query's vector store matches."""
+        # Extract the text from the results, keeping each chunk's id for downstream caching
+        context_chunks = [{**match['metadata'], "id": match['id']} for match in matches]
         
-        print(f"[{self.name}] Retrieved {len(context_chunks)} context chunks.")
+        logger.debug(f"Retrieved {len(context_chunks)} context chunks.")
         
         return create_mcp_message(
             self.name, "LLMResponseAgent", "CONTEXT_RESPONSE",
-            {"query": query, "top_chunks": context_chunks}
+            {
+                "query": payload.get('query'),
+                "top_chunks": context_chunks,
+                "query_embedding": np.asarray(query_embedding, dtype=np.float32),
+                "kb_version": payload.get('kb_version')
+            }
         )
 
+    @traced
+    def clear_knowledge_base(self):
+        """Removes every stored vector from the active vector store."""
+        logger.info(f"Clearing the '{self.vector_store.name}' vector store...")
+        self.vector_store.clear()
+        self.manifest.clear()
+        if self.lexical_index is not None:
+            self.lexical_index.clear()
+            self.lexical_index.save()
+        return create_mcp_message(self.name, "Orchestrator", "KNOWLEDGE_BASE_CLEARED", {})
+
 # --- Let's test this step in isolation ---
 
 if __name__ == "__main__":
     import json
     
+    from tracing import configure_logging
+
     # 1. Initialize the agent
+    configure_logging()
     retrieval_agent = RetrievalAgent()
     
     # Clear the index to ensure a clean test run
     print("\n--- Clearing index for a fresh start ---")
-    retrieval_agent.index.delete(delete_all=True)
+    retrieval_agent.clear_knowledge_base()
     
     # 2. Simulate the "Ingestion" flow
     print("\n--- Testing Ingestion Flow ---")
@@ -156,14 +385,13 @@ if __name__ == "__main__":
     print("Storage Response:", json.dumps(storage_response, indent=2))
     
     # --- NEW: Robust waiting loop ---
-    print("\n--- Waiting for Pinecone to finish indexing... ---")
+    print("\n--- Waiting for the vector store to finish indexing... ---")
     expected_vectors = len(fake_chunks)
     max_wait_seconds = 60
     start_time = time.time()
     
     while time.time() - start_time < max_wait_seconds:
-        stats = retrieval_agent.index.describe_index_stats()
-        current_vectors = stats.get('total_vector_count', 0)
+        current_vectors = retrieval_agent.vector_store.count()
         print(f"Current vector count: {current_vectors} / {expected_vectors}")
         if current_vectors >= expected_vectors:
             print("Indexing complete!")
@@ -182,7 +410,7 @@ if __name__ == "__main__":
     }
 
     context_response = retrieval_agent.retrieve_context(fake_query_mcp)
-    print("Context Response:", json.dumps(context_response, indent=2))
+    print("Context Response:", json.dumps(context_response, indent=2, default=lambda value: value.tolist()))
 
-    print(f"\n--- Final Pinecone Index Stats ---")
-    print(retrieval_agent.index.describe_index_stats())
\ No newline at end of file
+    print(f"\n--- Final Vector Store Stats ---")
+    print(retrieval_agent.vector_store.describe())
\ No newline at end of file
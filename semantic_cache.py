@@ -0,0 +1,124 @@
+# semantic_cache.py
+import os
+import time
+import threading
+
+import numpy as np
+
+# --- Semantic Cache Configuration ---
+SIMILARITY_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.92))
+MIN_CHUNK_OVERLAP = float(os.getenv("SEMANTIC_CACHE_MIN_OVERLAP", 0.6))
+MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_SIZE", 2048))
+TTL_SECONDS = float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", 3600))
+
+
+class SemanticAnswerCache:
+    """
+    Reuses answers for paraphrased questions.
+
+    Every generated answer is stored with its (normalised) query embedding and the ids of
+    the chunks it was generated from. A new question is a hit when its cosine similarity to
+    a stored question reaches `similarity_threshold` and the Jaccard overlap of the two
+    retrieved chunk-id sets reaches `min_chunk_overlap`. Similarities against all stored
+    questions are computed with one matrix-vector product. Entries are tagged with the
+    knowledge-base version they were built from; a newer version empties the cache, while
+    requests still in flight for an older version bypass it (a miss, and nothing stored).
+    """
+
+    def __init__(self, similarity_threshold=SIMILARITY_THRESHOLD, min_chunk_overlap=MIN_CHUNK_OVERLAP,
+                 max_entries=MAX_ENTRIES, ttl_seconds=TTL_SECONDS):
+        self.similarity_threshold = similarity_threshold
+        self.min_chunk_overlap = min_chunk_overlap
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.kb_version = None
+        self._lock = threading.Lock()
+        self._matrix = None
+        self._entries = []
+        self._next_slot = 0 # Once full, slots are overwritten oldest-first
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def _empty(self):
+        self._matrix = None
+        self._entries = []
+        self._next_slot = 0
+
+    def _sync_version(self, kb_version):
+        """Moves the cache forward to a newer `kb_version`; returns False for a request on an older one."""
+        if kb_version == self.kb_version:
+            return True
+        if self.kb_version is not None and (kb_version is None or kb_version < self.kb_version):
+            return False
+        self._empty()
+        self.kb_version = kb_version
+        return True
+
+    def lookup(self, query_embedding, chunk_ids, kb_version=None):
+        """Returns the cached entry (answer, source_context, similarity) for a paraphrase, or None."""
+        query_vector = self._normalize(query_embedding)
+        chunk_ids = set(chunk_ids)
+        with self._lock:
+            if not self._sync_version(kb_version) or not self._entries:
+                self.misses += 1
+                return None
+
+            similarities = self._matrix[:len(self._entries)] @ query_vector
+            candidates = np.flatnonzero(similarities >= self.similarity_threshold)
+            now = time.monotonic()
+            for slot in candidates[np.argsort(-similarities[candidates])]:
+                entry = self._entries[slot]
+                if entry["expires_at"] < now:
+                    continue
+                union = chunk_ids | entry["chunk_ids"]
+                overlap = len(chunk_ids & entry["chunk_ids"]) / len(union) if union else 1.0
+                if overlap >= self.min_chunk_overlap:
+                    self.hits += 1
+                    return {
+                        "answer": entry["answer"],
+                        "source_context": entry["source_context"],
+                        "similarity": float(similarities[slot]),
+                    }
+            self.misses += 1
+            return None
+
+    def store(self, query_embedding, chunk_ids, answer, source_context, kb_version=None):
+        if self.max_entries <= 0:
+            return
+        query_vector = self._normalize(query_embedding)
+        entry = {
+            "chunk_ids": set(chunk_ids),
+            "answer": answer,
+            "source_context": source_context,
+            "expires_at": time.monotonic() + self.ttl_seconds,
+        }
+        with self._lock:
+            if not self._sync_version(kb_version):
+                return # Generated from an older knowledge base
+            if self._matrix is None:
+                self._matrix = np.zeros((self.max_entries, query_vector.shape[0]), dtype=np.float32)
+            slot = self._next_slot
+            if slot < len(self._entries):
+                self._entries[slot] = entry
+            else:
+                self._entries.append(entry)
+            self._matrix[slot] = query_vector
+            self._next_slot = (slot + 1) % self.max_entries
+
+    def clear(self):
+        with self._lock:
+            self._empty()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
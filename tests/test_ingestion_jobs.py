@@ -0,0 +1,150 @@
+# tests/test_ingestion_jobs.py
+import pytest
+
+from mcp import create_mcp_message
+from ingestion_jobs import IngestionJobQueue, MAX_JOB_ATTEMPTS
+from tracing import METRICS
+
+
+class Crash(BaseException):
+    """Stands in for the process dying: not caught by the queue's error handling."""
+
+
+class FakeIngestionAgent:
+    def __init__(self, fail_with=None):
+        self.fail_with = fail_with
+        self.parses = 0
+        self.chunked_from = None
+
+    def iter_elements(self, file_path):
+        self.parses += 1
+        if self.fail_with is not None:
+            raise self.fail_with
+        with open(file_path) as f:
+            return [paragraph for paragraph in f.read().split("\n\n") if paragraph]
+
+    def chunk_texts(self, texts):
+        self.chunked_from = texts
+        return iter(texts)
+
+
+class FakeRetrievalAgent:
+    def __init__(self, crash=False, error=None):
+        self.crash = crash
+        self.error = error # Payload of a STORAGE_ERROR to answer with
+        self.calls = 0
+        self.stored = []
+        self.received = None
+        self.persisted = 0
+
+    def embed_and_store(self, mcp_message, on_batch_stored=None, persist=True):
+        self.calls += 1
+        if self.crash:
+            raise Crash()
+        if self.error is not None:
+            return create_mcp_message("RetrievalAgent", "Orchestrator", "STORAGE_ERROR", self.error)
+        self.received = mcp_message['payload']['chunks']
+        chunks = list(self.received)
+        self.stored.extend(chunks)
+        if on_batch_stored is not None:
+            on_batch_stored(len(chunks))
+        return create_mcp_message(
+            "RetrievalAgent", "Orchestrator", "STORAGE_SUCCESS", {"source_file": mcp_message['payload']['source_file']}
+        )
+
+    def persist(self):
+        self.persisted += 1
+
+
+@pytest.fixture
+def document(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text("First paragraph.\n\nSecond paragraph.\n\nThird paragraph.")
+    return str(path)
+
+
+def make_queue(tmp_path, ingestion_agent, retrieval_agent):
+    return IngestionJobQueue(
+        lambda: ingestion_agent, lambda: retrieval_agent, directory=str(tmp_path / "jobs"), workers=1
+    )
+
+
+def test_job_is_stored_and_index_saved_when_queue_drains(tmp_path, document):
+    ingestion_agent, retrieval_agent = FakeIngestionAgent(), FakeRetrievalAgent()
+    queue = make_queue(tmp_path, ingestion_agent, retrieval_agent)
+    job_id = queue.submit(document, "notes.txt")
+    status = queue.wait(job_id, timeout=10)
+    queue.close()
+
+    assert status["state"] == "succeeded" and status["stage"] == "stored"
+    assert status["chunks_total"] == status["chunks_stored"] == 3
+    assert retrieval_agent.stored == ["First paragraph.", "Second paragraph.", "Third paragraph."]
+    assert retrieval_agent.persisted >= 1
+    # Both stages read their input back from the checkpoint as a stream, not as a list
+    assert not isinstance(ingestion_agent.chunked_from, list)
+    assert not isinstance(retrieval_agent.received, list)
+    assert not list((tmp_path / "jobs").glob("*.gz")) # Checkpoints are removed once the job is done
+
+
+def test_unexpected_parse_error_is_reported_by_the_parse_step_and_retried(tmp_path, document):
+    ingestion_agent = FakeIngestionAgent(fail_with=OSError("disk unavailable"))
+    queue = make_queue(tmp_path, ingestion_agent, FakeRetrievalAgent())
+    status = queue.wait(queue.submit(document), timeout=10)
+    queue.close()
+
+    assert status["state"] == "failed"
+    assert status["attempts"] == ingestion_agent.parses == MAX_JOB_ATTEMPTS
+    assert status["result"]["sender"] == "IngestionAgent"
+    assert status["result"]["type"] == "INGESTION_ERROR"
+    assert status["result"]["payload"]["stage"] == "parse"
+    assert "disk unavailable" in status["error"]
+
+
+def test_interrupted_job_resumes_from_its_checkpoint(tmp_path, document):
+    ingestion_agent = FakeIngestionAgent()
+    crashed = make_queue(tmp_path, ingestion_agent, FakeRetrievalAgent(crash=True))
+    crashed.start = lambda: None # No worker threads: the job is run by hand below
+    job_id = crashed.submit(document, "notes.txt")
+    with pytest.raises(Crash):
+        crashed._run(crashed._claim())
+    assert crashed.status(job_id)["state"] == "running"
+    assert crashed.status(job_id)["stage"] == "chunked"
+
+    retrieval_agent = FakeRetrievalAgent()
+    resumed = make_queue(tmp_path, ingestion_agent, retrieval_agent)
+    assert resumed.status(job_id)["state"] == "queued"
+    resumed.start()
+    status = resumed.wait(job_id, timeout=10)
+    resumed.close()
+
+    assert status["state"] == "succeeded"
+    assert ingestion_agent.parses == 1 # The checkpointed chunks were reused, not parsed again
+    assert retrieval_agent.stored == ["First paragraph.", "Second paragraph.", "Third paragraph."]
+
+
+@pytest.mark.parametrize("retryable, attempts", [(False, 1), (True, MAX_JOB_ATTEMPTS)])
+def test_only_transient_storage_errors_are_retried(tmp_path, document, retryable, attempts):
+    retrieval_agent = FakeRetrievalAgent(error={"error": "upsert failed", "retryable": retryable})
+    queue = make_queue(tmp_path, FakeIngestionAgent(), retrieval_agent)
+    status = queue.wait(queue.submit(document), timeout=10)
+    queue.close()
+
+    assert status["state"] == "failed"
+    assert status["attempts"] == retrieval_agent.calls == attempts
+    assert status["error"] == "upsert failed"
+
+
+def test_jobs_parse_in_worker_processes_and_keep_their_spans(tmp_path, document):
+    pytest.importorskip("langchain.text_splitter")
+    METRICS.reset()
+    retrieval_agent = FakeRetrievalAgent()
+    queue = IngestionJobQueue(
+        lambda: None, lambda: retrieval_agent, directory=str(tmp_path / "jobs"), workers=1, parse_in_processes=True
+    )
+    status = queue.wait(queue.submit(document, "notes.txt"), timeout=120)
+    queue.close()
+
+    assert status["state"] == "succeeded"
+    assert "".join(retrieval_agent.stored).count("paragraph") == 3
+    # Spans recorded in the worker process were sent back and merged into this process's metrics
+    assert "split" in {record["stage"] for record in METRICS.spans_for_trace(status["trace_id"])}
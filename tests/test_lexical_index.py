@@ -0,0 +1,123 @@
+# tests/test_lexical_index.py
+import math
+import random
+from collections import Counter
+
+import pytest
+
+import lexical_index
+from lexical_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+
+def test_tokenize_keeps_identifiers_whole_and_split():
+    assert tokenize("Ticket AB-1234 uses v2.1") == ["ticket", "ab-1234", "ab", "1234", "uses", "v2.1", "v2", "1"]
+
+
+def test_search_ranks_exact_identifier_matches_first(tmp_path):
+    index = BM25Index("test", directory=str(tmp_path))
+    index.add_many([
+        ("a", "The LPU is designed for sequential processing."),
+        ("b", "Error code AB-1234 means the upload timed out."),
+        ("c", "Pinecone stores high-dimensional vectors."),
+    ])
+    assert index.search("what does AB-1234 mean", top_k=2)[0][0] == "b"
+    assert index.search("nothing matches this") == []
+
+
+def test_small_corpus_keeps_common_terms():
+    index = BM25Index("test")
+    index.add("a", "Groq LPU inference chip")
+    assert [chunk_id for chunk_id, _ in index.search("groq lpu")] == ["a"]
+    index.add("b", "Groq builds chips")
+    assert {chunk_id for chunk_id, _ in index.search("groq")} == {"a", "b"}
+
+
+def test_very_common_terms_are_skipped_in_large_corpora():
+    index = BM25Index("test")
+    index.add_many((f"doc{i}", f"common filler text number{i}") for i in range(lexical_index.MIN_DOCS_FOR_DOC_FREQ_CUTOFF))
+    assert index.search("common") == []
+    assert index.search("number7")[0][0] == "doc7"
+
+
+def test_saved_changes_are_replayed_on_reload(tmp_path):
+    directory = str(tmp_path)
+    index = BM25Index("test", directory=directory)
+    index.add_many([("a", "alpha beta"), ("b", "beta gamma"), ("c", "gamma delta")])
+    index.save()
+    assert not (tmp_path / "lexical-test.pkl").exists() # Only the change log was written
+    index.remove(["b"])
+    index.add("a", "alpha epsilon")
+    index.save()
+
+    reloaded = BM25Index("test", directory=directory)
+    assert len(reloaded) == 2 and "b" not in reloaded
+    assert reloaded.search("epsilon")[0][0] == "a"
+    assert reloaded.search("beta") == []
+    assert reloaded.search("delta gamma") == index.search("delta gamma")
+
+
+def test_log_is_folded_into_a_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(lexical_index, "SNAPSHOT_MIN_CHANGES", 10)
+    directory = str(tmp_path)
+    index = BM25Index("test", directory=directory)
+    index.add_many((f"doc{i}", f"text number{i}") for i in range(12))
+    index.save()
+    assert (tmp_path / "lexical-test.pkl").exists()
+    assert index.logged_changes == 0
+    index.add("extra", "one more chunk")
+    index.save()
+
+    reloaded = BM25Index("test", directory=directory)
+    assert len(reloaded) == 13 and reloaded.logged_changes == 1
+    assert reloaded.search("number3")[0][0] == "doc3"
+
+
+def test_clear_survives_reload(tmp_path):
+    index = BM25Index("test", directory=str(tmp_path))
+    index.add("a", "alpha")
+    index.save()
+    index.clear()
+    index.save()
+    assert len(BM25Index("test", directory=str(tmp_path))) == 0
+
+
+def _exact_bm25(texts, query):
+    """Scores every text against the query the slow way, straight from the BM25 formula."""
+    term_counts = {chunk_id: Counter(tokenize(text)) for chunk_id, text in texts.items()}
+    doc_freqs = Counter(term for counts in term_counts.values() for term in counts)
+    avg_length = sum(sum(counts.values()) for counts in term_counts.values()) / len(texts)
+    scores = {}
+    for term in set(tokenize(query)):
+        idf = math.log(1 + (len(texts) - doc_freqs[term] + 0.5) / (doc_freqs[term] + 0.5))
+        for chunk_id, counts in term_counts.items():
+            if counts[term]:
+                norm = lexical_index.BM25_K1 * (1 - lexical_index.BM25_B + lexical_index.BM25_B * sum(counts.values()) / avg_length)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * counts[term] * (lexical_index.BM25_K1 + 1) / (counts[term] + norm)
+    return sorted(scores.values(), reverse=True)
+
+
+def test_search_matches_exact_bm25_after_changes():
+    rng = random.Random(0)
+    words = [f"w{i}" for i in range(40)]
+    texts = {f"doc{i}": " ".join(rng.choices(words, k=rng.randint(3, 12))) for i in range(60)}
+    queries = [" ".join(rng.sample(words, rng.randint(1, 4))) for _ in range(20)]
+    index = BM25Index("test")
+    index.add_many(texts.items())
+    for query in queries: # Fills the cached term weights, which every change below must invalidate
+        index.search(query)
+
+    index.remove([f"doc{i}" for i in range(0, 60, 4)])
+    index.add("doc1", "w1 w1 w2")
+    for i in range(0, 60, 4):
+        del texts[f"doc{i}"]
+    texts["doc1"] = "w1 w1 w2"
+    for query in queries:
+        top_k = rng.randint(1, 10)
+        found = index.search(query, top_k=top_k)
+        assert [score for _, score in found] == pytest.approx(_exact_bm25(texts, query)[:top_k], rel=1e-5)
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "a", "d"]], k=60)
+    assert [item_id for item_id, _ in fused] == ["a", "c", "b", "d"]
+    assert fused[0][1] == 1 / 61 + 1 / 62
@@ -0,0 +1,53 @@
+# tests/test_mcp_bus.py
+import pytest
+
+from mcp import create_mcp_message
+from mcp_bus import MCPBus, ROUTES, RemoteRetrievalAgent
+from embedding_agent import EmbeddingAgent
+from test_retrieval_agent import FakeEmbeddingModel, make_agent
+
+
+class InlineBus:
+    """Routes each message straight to an in-process agent, as a bus worker would."""
+
+    def __init__(self, agents):
+        self.agents = agents
+
+    def start(self):
+        pass
+
+    def request(self, message, timeout=None):
+        handler, _ = ROUTES[(message['receiver'], message['type'])]
+        return handler(self.agents[message['receiver']], message)
+
+    def request_all(self, messages, timeout=None):
+        return [self.request(message) for message in messages]
+
+
+def test_retrieval_pool_size_sizes_the_embedding_workers(monkeypatch):
+    monkeypatch.setenv("RETRIEVAL_POOL_SIZE", "3")
+    pool_sizes = MCPBus().pool_sizes
+    assert pool_sizes["EmbeddingAgent"] == 3
+    assert pool_sizes["RetrievalAgent"] == 1 # The single writer
+    with pytest.raises(ValueError, match="single worker"):
+        MCPBus({"RetrievalAgent": 2})
+
+
+def test_embedding_workers_encode_for_the_retrieval_writer(tmp_path):
+    writer_model, worker_model = FakeEmbeddingModel(), FakeEmbeddingModel()
+    agents = {"RetrievalAgent": make_agent(tmp_path, writer_model),
+              "EmbeddingAgent": EmbeddingAgent(embedding_model=worker_model)}
+    remote = RemoteRetrievalAgent(InlineBus(agents))
+
+    chunks = ["Groq builds LPUs.", "LPUs run inference.", "Pinecone stores vectors."]
+    stored = remote.embed_and_store(create_mcp_message(
+        "IngestionAgent", "RetrievalAgent", "CHUNKS_READY", {"chunks": chunks, "source_file": "notes.txt"}
+    ))
+    assert stored['type'] == "STORAGE_SUCCESS" and stored['payload']['upserted'] == 3
+
+    context = remote.retrieve_context(create_mcp_message(
+        "Orchestrator", "RetrievalAgent", "RETRIEVE_REQUEST", {"query": "LPUs run inference.", "top_k": 1}
+    ))
+    assert context['payload']['top_chunks'][0]['text'] == "LPUs run inference."
+    assert worker_model.encoded == 4
+    assert writer_model.encoded == 0 # The writer only stores and searches
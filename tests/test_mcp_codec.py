@@ -0,0 +1,77 @@
+# tests/test_mcp_codec.py
+import os
+import mmap
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+import mcp_codec
+from mcp import create_mcp_message
+from mcp_codec import decode, discard, encode
+
+
+def make_message():
+    return create_mcp_message(
+        "RetrievalAgent", "LLMResponseAgent", "CONTEXT_RESPONSE",
+        {
+            "query": "What is Groq's LPU?",
+            "top_chunks": [{"id": "doc-0", "text": "The LPU is designed for sequential processing."}],
+            "query_embedding": np.random.default_rng(0).random(384, dtype=np.float32),
+            "embeddings": np.random.default_rng(1).random((1024, 384), dtype=np.float32), # 1.5 MB
+        }
+    )
+
+
+def shared_segment_names(frame):
+    return [name for kind, _, name in mcp_codec._read_frame(frame)[2] if kind == mcp_codec._SHARED]
+
+
+@pytest.mark.parametrize("use_shared_memory", [False, True])
+def test_messages_round_trip(use_shared_memory):
+    message = make_message()
+    frame = encode(message, shared_memory=use_shared_memory)
+    assert len(shared_segment_names(frame)) == (1 if use_shared_memory else 0) # Only the large array
+
+    decoded = decode(frame)
+    assert decoded["payload"]["top_chunks"] == message["payload"]["top_chunks"]
+    for key in ("query_embedding", "embeddings"):
+        assert decoded["payload"][key].dtype == np.float32
+        assert np.array_equal(decoded["payload"][key], message["payload"][key])
+
+
+def test_inline_arrays_are_read_only_views_of_the_frame():
+    decoded = decode(encode({"vector": np.arange(4, dtype=np.float32)}))
+    assert not decoded["vector"].flags.writeable
+
+
+def test_shared_memory_is_freed_on_decode_and_discard():
+    first = encode(make_message(), shared_memory=True)
+    second = encode(make_message(), shared_memory=True)
+    names = shared_segment_names(first) + shared_segment_names(second)
+
+    decode(first)
+    discard(second)
+    discard(second) # Already freed: a no-op
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+
+
+def test_foreign_frames_are_rejected():
+    with pytest.raises(ValueError):
+        decode(b"JSON" + bytes(16))
+
+
+@pytest.mark.skipif(not os.path.isdir(mcp_codec.SHARED_MEMORY_DIR), reason="shared memory segments are not files here")
+def test_shared_memory_arrays_are_views_of_the_segment():
+    message = make_message()
+    frame = encode(message, shared_memory=True)
+    embeddings = decode(frame)["payload"]["embeddings"]
+    assert not os.path.exists(os.path.join(mcp_codec.SHARED_MEMORY_DIR, shared_segment_names(frame)[0]))
+
+    base = embeddings
+    while isinstance(base, np.ndarray):
+        base = base.base
+    assert isinstance(base.obj, mmap.mmap) # Not a copy: the array still reads the unlinked segment
+    assert np.array_equal(embeddings, message["payload"]["embeddings"])
@@ -0,0 +1,46 @@
+# tests/test_orchestrator.py
+from mcp import create_mcp_message
+from orchestrator import Orchestrator
+
+
+class FakeRetrievalAgent:
+    def retrieve_context(self, mcp_message):
+        return create_mcp_message(
+            "RetrievalAgent", "LLMResponseAgent", "CONTEXT_RESPONSE",
+            {"query": mcp_message['payload']['query'], "retrieved_context": ["Groq builds LPUs."]}
+        )
+
+
+class FakeLLMResponseAgent:
+    def __init__(self):
+        self.calls = 0
+
+    def generate_response_stream(self, mcp_message):
+        self.calls += 1
+        yield create_mcp_message("LLMResponseAgent", "Orchestrator", "RESPONSE_TOKEN", {"token": "LPUs"})
+        yield create_mcp_message(
+            "LLMResponseAgent", "Orchestrator", "FINAL_RESPONSE",
+            {"answer": "LPUs", "timings": {"llm_time_to_first_token_ms": 1.0, "llm_total_ms": 2.0}}
+        )
+
+
+def make_orchestrator():
+    orchestrator = Orchestrator(transport="inprocess")
+    orchestrator._agents["RetrievalAgent"] = FakeRetrievalAgent()
+    orchestrator._agents["LLMResponseAgent"] = FakeLLMResponseAgent()
+    return orchestrator
+
+
+def test_streamed_answer_is_cached_without_its_timings():
+    orchestrator = make_orchestrator()
+    first = list(orchestrator.ask_question_stream("What does Groq build?"))[-1]
+    assert "llm_total_ms" in first['payload']['timings']
+
+    cached = list(orchestrator.ask_question_stream("  what does GROQ build?"))
+    assert len(cached) == 1 and orchestrator.llm_agent.calls == 1
+    payload = cached[0]['payload']
+    assert payload['cached'] and payload['answer'] == "LPUs"
+    assert set(payload['timings']) == {"retrieval_ms", "time_to_first_token_ms", "total_ms"}
+    assert payload['timings']['retrieval_ms'] == 0.0 # Measured for this request, not copied from the first
+
+    assert "timings" not in orchestrator.ask_question("What does Groq build?")['payload']
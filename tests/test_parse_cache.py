@@ -0,0 +1,94 @@
+# tests/test_parse_cache.py
+import os
+
+import pytest
+
+from parse_cache import ParseCache
+
+
+def write_part(cache, cache_key, part, texts):
+    writer = cache.writer(cache_key, part)
+    for text in texts:
+        writer.write(text)
+    writer.commit()
+
+
+def test_parts_round_trip_as_streams(tmp_path):
+    cache = ParseCache(directory=str(tmp_path / "cache"))
+    texts = ["First paragraph.", "Line one\nline two", "Unicode: café ✓", ""]
+    write_part(cache, "doc", "elements", texts)
+
+    assert cache.get("doc") == {"elements"}
+    assert list(cache.read("doc", "elements")) == texts
+    assert cache.get("other") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_aborted_writer_stores_nothing(tmp_path):
+    directory = tmp_path / "cache"
+    cache = ParseCache(directory=str(directory))
+    writer = cache.writer("doc", "elements")
+    writer.write("partial text")
+    writer.abort()
+
+    assert cache.get("doc") is None
+    assert cache.total_bytes() == 0
+    assert [name for name in os.listdir(directory) if name != "index.sqlite3"] == []
+
+
+def test_least_recently_used_parts_are_evicted(tmp_path):
+    cache = ParseCache(directory=str(tmp_path / "cache"), max_bytes=60000)
+    for i in range(6):
+        write_part(cache, f"doc{i}", "elements", [os.urandom(3000).hex() for _ in range(5)])
+        cache.get("doc0") # Keeps doc0 recently used
+
+    cached = {f"doc{i}" for i in range(6) if cache.get(f"doc{i}")}
+    assert "doc0" in cached and "doc5" in cached and "doc1" not in cached
+    assert cache.evictions > 0
+    on_disk = sum(os.path.getsize(os.path.join(cache.directory, name))
+                  for name in os.listdir(cache.directory) if name.endswith(".gz"))
+    assert cache.total_bytes() == on_disk <= 60000
+
+
+def test_total_survives_reopen_and_replacement(tmp_path):
+    directory = str(tmp_path / "cache")
+    cache = ParseCache(directory=directory)
+    write_part(cache, "doc", "elements", ["a" * 1000])
+    write_part(cache, "doc", "elements", ["b" * 1000, "c" * 1000])
+    write_part(cache, "doc", "chunks", ["bc"])
+
+    reopened = ParseCache(directory=directory)
+    assert reopened.get("doc") == {"elements", "chunks"}
+    assert list(reopened.read("doc", "elements")) == ["b" * 1000, "c" * 1000]
+    assert reopened.total_bytes() == sum(
+        os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory) if name.endswith(".gz")
+    )
+
+
+def test_part_larger_than_the_cache_is_skipped(tmp_path):
+    cache = ParseCache(directory=str(tmp_path / "cache"), max_bytes=10000)
+    write_part(cache, "huge", "elements", [os.urandom(3000).hex() for _ in range(10)])
+    assert cache.get("huge") is None
+    assert cache.total_bytes() == 0
+
+
+def test_agent_caches_only_fully_consumed_streams(tmp_path):
+    pytest.importorskip("langchain.text_splitter")
+    from ingestion_agent import IngestionAgent
+
+    document = tmp_path / "notes.txt"
+    document.write_text("\n\n".join(f"Paragraph {i}. " + "Groq builds LPUs. " * 40 for i in range(100)))
+    cache = ParseCache(directory=str(tmp_path / "cache"))
+    agent = IngestionAgent(parse_cache=cache)
+
+    chunks = agent.iter_chunks(str(document))
+    next(chunks)
+    chunks.close()
+    assert cache.total_bytes() == 0
+
+    elements = list(agent.iter_elements(str(document)))
+    assert len(elements) == 100
+    expected = list(IngestionAgent(parse_cache=False).iter_chunks(str(document)))
+    assert list(agent.iter_chunks(str(document))) == expected # Chunked from the cached elements
+    assert list(agent.iter_chunks(str(document))) == expected # Served from the cached chunks
+    assert cache.stats()["hits"] == 2
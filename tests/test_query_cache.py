@@ -0,0 +1,45 @@
+# tests/test_query_cache.py
+import query_cache
+from query_cache import TTLCache, normalize_query
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_normalize_query_ignores_case_and_whitespace():
+    assert normalize_query("  What is\tGroq's\n LPU? ") == "what is groq's lpu?"
+
+
+def test_entries_expire_after_their_ttl(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(query_cache.time, "monotonic", clock)
+    cache = TTLCache(max_size=10, ttl_seconds=60)
+    cache.put("q", "answer")
+    clock.now += 59
+    assert cache.get("q") == "answer"
+    clock.now += 2
+    assert cache.get("q") is None
+    assert len(cache) == 0
+    assert cache.stats() == {"size": 0, "hits": 1, "misses": 1, "hit_rate": 0.5, "evictions": 0, "expirations": 1}
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.evictions == 1
+
+
+def test_zero_size_cache_stores_nothing():
+    cache = TTLCache(max_size=0)
+    cache.put("a", 1)
+    assert cache.get("a") is None and len(cache) == 0
@@ -0,0 +1,81 @@
+# tests/test_retrieval_agent.py
+import hashlib
+
+import numpy as np
+
+from mcp import create_mcp_message
+from document_manifest import DocumentManifest, make_chunk_id
+from retrieval_agent import RetrievalAgent
+from vector_store import LocalVectorStore
+
+DIMENSION = 16
+
+
+class FakeEmbeddingModel:
+    """Deterministic embeddings derived from a hash of the text; counts how many texts it encoded."""
+
+    def __init__(self):
+        self.encoded = 0
+
+    def get_sentence_embedding_dimension(self):
+        return DIMENSION
+
+    def _embed(self, text):
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        return np.random.default_rng(seed).standard_normal(DIMENSION).astype(np.float32)
+
+    def encode(self, texts, **kwargs):
+        if isinstance(texts, str):
+            self.encoded += 1
+            return self._embed(texts)
+        self.encoded += len(texts)
+        return np.stack([self._embed(text) for text in texts])
+
+
+def make_agent(tmp_path, embedding_model):
+    vector_store = LocalVectorStore(DIMENSION, directory=str(tmp_path / "store"))
+    return RetrievalAgent(vector_store=vector_store, embedding_model=embedding_model)
+
+
+def store(agent, chunks, source_file="notes.txt"):
+    response = agent.embed_and_store(create_mcp_message(
+        "IngestionAgent", "RetrievalAgent", "CHUNKS_READY", {"chunks": chunks, "source_file": source_file}
+    ))
+    assert response['type'] == "STORAGE_SUCCESS"
+    return response['payload']
+
+
+def test_chunk_ids_depend_only_on_source_and_text():
+    assert make_chunk_id("a.txt", "Groq builds LPUs.") == make_chunk_id("a.txt", "Groq builds LPUs.")
+    assert make_chunk_id("a.txt", "Groq builds LPUs.") != make_chunk_id("b.txt", "Groq builds LPUs.")
+    assert make_chunk_id("a.txt", "Groq builds LPUs.") != make_chunk_id("a.txt", "Groq builds GPUs.")
+
+
+def test_manifest_tracks_chunk_ids_per_source(tmp_path):
+    manifest = DocumentManifest("test", directory=str(tmp_path))
+    manifest.add("a.txt", ["a-1", "a-2"])
+    manifest.add("b.txt", ["b-1"])
+    manifest.remove("a.txt", ["a-1", "b-1"])
+    assert manifest.chunk_ids("a.txt") == {"a-2"}
+    assert DocumentManifest("test", directory=str(tmp_path)).sources() == ["a.txt", "b.txt"]
+
+
+def test_reingestion_stores_only_the_changed_chunks(tmp_path):
+    embedding_model = FakeEmbeddingModel()
+    agent = make_agent(tmp_path, embedding_model)
+
+    first = store(agent, ["Intro.", "Groq builds LPUs.", "LPUs run inference.", "Groq builds LPUs."])
+    assert (first['upserted'], first['unchanged'], first['deleted']) == (3, 0, 0)
+
+    # One chunk edited, one removed and one added; the unchanged chunks keep their ids
+    second = store(agent, ["Intro.", "Groq builds LPUs.", "LPUs run fast inference.", "Contact us."])
+    assert (second['upserted'], second['unchanged'], second['deleted']) == (2, 2, 1)
+    assert embedding_model.encoded == 5
+    expected_ids = {make_chunk_id("notes.txt", chunk)
+                    for chunk in ["Intro.", "Groq builds LPUs.", "LPUs run fast inference.", "Contact us."]}
+    assert agent.manifest.chunk_ids("notes.txt") == expected_ids
+    assert set(agent.vector_store.id_to_row) == expected_ids
+    assert set(agent.lexical_index.id_to_doc) == expected_ids # Stale chunks leave the BM25 index too
+
+    assert store(agent, ["Intro.", "Groq builds LPUs.", "LPUs run fast inference.", "Contact us."])['upserted'] == 0
+    assert agent.vector_store.count() == 4
@@ -0,0 +1,59 @@
+# tests/test_semantic_cache.py
+import numpy as np
+
+import semantic_cache
+from semantic_cache import SemanticAnswerCache
+
+QUERY = np.array([1.0, 0.0, 0.0, 0.0], dtype=np.float32)
+PARAPHRASE = np.array([0.98, 0.1, 0.05, 0.0], dtype=np.float32) # Cosine similarity ~0.99 to QUERY
+OTHER_QUESTION = np.array([0.0, 1.0, 0.0, 0.0], dtype=np.float32)
+
+
+def make_cache(**kwargs):
+    cache = SemanticAnswerCache(similarity_threshold=0.95, min_chunk_overlap=0.5, **kwargs)
+    cache.store(QUERY * 3, ["c1", "c2", "c3"], "LPUs.", ["context"], kb_version=1) # Stored normalised
+    return cache
+
+
+def test_paraphrase_with_overlapping_context_is_a_hit():
+    hit = make_cache().lookup(PARAPHRASE, ["c1", "c2", "c4"], kb_version=1)
+    assert hit["answer"] == "LPUs." and hit["source_context"] == ["context"]
+    assert hit["similarity"] > 0.95
+
+
+def test_dissimilar_question_or_different_context_is_a_miss():
+    cache = make_cache()
+    assert cache.lookup(OTHER_QUESTION, ["c1", "c2", "c3"], kb_version=1) is None
+    assert cache.lookup(PARAPHRASE, ["c1", "c5", "c6"], kb_version=1) is None # Jaccard overlap 0.2
+    assert cache.stats() == {"size": 1, "hits": 0, "misses": 2, "hit_rate": 0.0}
+
+
+def test_new_knowledge_base_version_empties_the_cache():
+    cache = make_cache()
+    assert cache.lookup(QUERY, ["c1", "c2", "c3"], kb_version=2) is None
+    assert cache.stats()["size"] == 0
+
+
+def test_expired_entries_are_skipped(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(semantic_cache.time, "monotonic", lambda: now[0])
+    cache = make_cache(ttl_seconds=60)
+    now[0] += 61
+    assert cache.lookup(QUERY, ["c1", "c2", "c3"], kb_version=1) is None
+
+
+def test_oldest_entry_is_overwritten_when_full():
+    cache = make_cache(max_entries=1)
+    cache.store(OTHER_QUESTION, ["c9"], "Chips.", [], kb_version=1)
+    assert cache.lookup(QUERY, ["c1", "c2", "c3"], kb_version=1) is None
+    assert cache.lookup(OTHER_QUESTION, ["c9"], kb_version=1)["answer"] == "Chips."
+
+
+def test_requests_for_an_older_version_bypass_the_cache():
+    cache = make_cache()
+    cache.store(OTHER_QUESTION, ["c9"], "Chips.", [], kb_version=2)
+    # A request still in flight for version 1 neither wipes nor reads nor fills the version 2 cache
+    assert cache.lookup(OTHER_QUESTION, ["c9"], kb_version=1) is None
+    cache.store(QUERY, ["c1", "c2", "c3"], "Stale.", [], kb_version=1)
+    assert cache.stats()["size"] == 1
+    assert cache.lookup(OTHER_QUESTION, ["c9"], kb_version=2)["answer"] == "Chips."
@@ -0,0 +1,59 @@
+# tests/test_upsert_engine.py
+import pytest
+
+from vector_store import VectorStore
+from upsert_engine import UpsertEngine, UpsertError
+
+
+class FailingStore(VectorStore):
+    name = "failing"
+
+    def __init__(self, error):
+        self.error = error
+
+    def upsert(self, vectors):
+        raise self.error
+
+
+@pytest.mark.parametrize("error, retryable", [
+    (ConnectionError("connection reset"), True),
+    (ValueError("vector dimension 3 does not match the index"), False),
+])
+def test_upsert_error_says_whether_a_retry_can_help(error, retryable):
+    with UpsertEngine(FailingStore(error), max_retries=0) as engine:
+        engine.submit([("a", [0.1, 0.2, 0.3], {"text": "a"})])
+        with pytest.raises(UpsertError) as raised:
+            engine.flush()
+    assert raised.value.retryable is retryable
+
+
+class RecordingStore(VectorStore):
+    name = "recording"
+
+    def __init__(self):
+        self.requests = []
+
+    def upsert(self, vectors):
+        self.requests.append(len(vectors))
+
+
+def test_small_submits_are_merged_into_full_requests():
+    store, stored = RecordingStore(), []
+    vectors = [(f"v{i}", [0.1] * 4, {"text": "x"}) for i in range(640)]
+    with UpsertEngine(store, max_batch_vectors=100) as engine:
+        for i in range(0, len(vectors), 64):
+            engine.submit(vectors[i:i + 64], on_success=stored.extend)
+        engine.flush()
+
+    assert store.requests == [100] * 6 + [40] # Ten micro-batches of 64 in seven requests
+    assert sorted(vector_id for vector_id, _, _ in stored) == sorted(vector_id for vector_id, _, _ in vectors)
+
+
+def test_requests_are_cut_by_estimated_bytes():
+    store = RecordingStore()
+    vector = ("v", [0.1] * 4, {"text": "x"})
+    with UpsertEngine(store, max_batch_bytes=3 * UpsertEngine._estimate_bytes(vector)) as engine:
+        for _ in range(4):
+            engine.submit([vector] * 2)
+        engine.flush()
+    assert store.requests == [3, 3, 2]
@@ -0,0 +1,200 @@
+# tests/test_vector_store.py
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from vector_store import LocalVectorStore, PineconeVectorStore
+
+DIMENSION = 16
+
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(0).random((12, DIMENSION), dtype=np.float32)
+
+
+def query_ids(store, vector, top_k=20):
+    return [match["id"] for match in store.query(vector, top_k=top_k)]
+
+
+def query_metadata(store, vector, top_k):
+    return {match["id"]: match["metadata"] for match in store.query(vector, top_k=top_k)}
+
+
+@pytest.mark.parametrize("quantization", ["none", "sq8"])
+def test_local_store_upsert_delete_and_reupsert(tmp_path, quantization):
+    vectors = np.random.default_rng(1).random((1100, DIMENSION), dtype=np.float32) # Enough to train sq8
+    rows = len(vectors)
+    directory = str(tmp_path / "store")
+    store = LocalVectorStore(DIMENSION, directory=directory, quantization=quantization)
+    store.upsert([(f"id{i}", vectors[i], {"text": f"chunk {i}"}) for i in range(rows)])
+    assert store.count() == rows
+    assert store.describe()["quantizer_trained"] == (quantization != "none")
+    assert query_ids(store, vectors[42], top_k=1) == ["id42"]
+
+    store.delete(["id42", "id43", "missing"])
+    assert store.count() == rows - 2
+    assert "id42" not in query_ids(store, vectors[42])
+    assert store.fetch(["id42", "id44"]) == {"id44": {"text": "chunk 44"}}
+
+    # Re-upserting replaces vector and metadata in place, and reuses the freed rows
+    store.upsert([("id42", vectors[7], {"text": "moved"}), ("id44", vectors[8], {"text": "changed"})])
+    assert store.count() == rows - 1 and store.size == rows
+    assert store.fetch(["id42", "id44"]) == {"id42": {"text": "moved"}, "id44": {"text": "changed"}}
+    assert query_metadata(store, vectors[7], top_k=2) == {"id7": {"text": "chunk 7"}, "id42": {"text": "moved"}}
+
+    reopened = LocalVectorStore(DIMENSION, directory=directory, quantization=quantization)
+    assert reopened.count() == rows - 1
+    assert query_metadata(reopened, vectors[8], top_k=2) == {"id8": {"text": "chunk 8"}, "id44": {"text": "changed"}}
+
+
+def test_local_store_rejects_a_different_dimension(tmp_path):
+    LocalVectorStore(DIMENSION, directory=str(tmp_path / "store"))
+    with pytest.raises(ValueError):
+        LocalVectorStore(DIMENSION * 2, directory=str(tmp_path / "store"))
+
+
+def test_hnsw_reupsert_after_delete_keeps_one_node_per_id(tmp_path, vectors):
+    pytest.importorskip("hnswlib")
+    store = LocalVectorStore(DIMENSION, directory=str(tmp_path / "store"), index_type="hnsw")
+    store.upsert([(f"id{i}", vectors[i], {}) for i in range(10)])
+    store.delete(["id3", "id4"])
+    store.upsert([("id5", vectors[5], {})])
+
+    ids = query_ids(store, vectors[5], top_k=8)
+    assert ids[0] == "id5"
+    assert len(ids) == len(set(ids)) == 8
+    assert store.hnsw.live == store.count() == 8
+
+    # Recycled rows and brand-new rows both land in the graph exactly once
+    store.upsert([("new1", vectors[10], {}), ("new2", vectors[11], {}), ("new3", vectors[3], {}), ("id6", vectors[6], {})])
+    ids = query_ids(store, vectors[0])
+    assert sorted(ids) == sorted([f"id{i}" for i in (0, 1, 2, 5, 6, 7, 8, 9)] + ["new1", "new2", "new3"])
+    assert store.hnsw.live == store.count() == 11
+
+
+def test_hnsw_graph_is_saved_by_persist(tmp_path, vectors):
+    pytest.importorskip("hnswlib")
+    directory = str(tmp_path / "store")
+    store = LocalVectorStore(DIMENSION, directory=directory, index_type="hnsw")
+    store.upsert([(f"id{i}", vectors[i], {}) for i in range(10)])
+    store.delete(["id2"])
+    store.persist()
+
+    reopened = LocalVectorStore(DIMENSION, directory=directory, index_type="hnsw")
+    assert reopened.hnsw.loaded
+    assert reopened.hnsw.live == reopened.count() == 9
+    assert query_ids(reopened, vectors[7])[0] == "id7"
+    assert "id2" not in query_ids(reopened, vectors[2])
+
+
+def test_hnsw_graph_older_than_the_store_is_rebuilt(tmp_path, vectors):
+    pytest.importorskip("hnswlib")
+    directory = str(tmp_path / "store")
+    store = LocalVectorStore(DIMENSION, directory=directory, index_type="hnsw")
+    store.upsert([(f"id{i}", vectors[i], {}) for i in range(10)])
+    store.persist()
+    # Written but never persisted: the saved graph holds as many vectors as the store, but not these
+    store.delete(["id2"])
+    store.upsert([("new", vectors[10], {})])
+
+    reopened = LocalVectorStore(DIMENSION, directory=directory, index_type="hnsw")
+    assert reopened.hnsw.generation == reopened.generation
+    assert query_ids(reopened, vectors[10])[0] == "new"
+    assert "id2" not in query_ids(reopened, vectors[2])
+
+
+class FakePineconeIndex:
+    """The subset of the Pinecone Index API used by PineconeVectorStore, kept in a dict."""
+
+    def __init__(self):
+        self.vectors = {}
+
+    def upsert(self, vectors):
+        for vector_id, values, metadata in vectors:
+            assert isinstance(values, list) # Pinecone takes plain lists, not NumPy arrays
+            self.vectors[vector_id] = (np.asarray(values), metadata)
+
+    def query(self, vector, top_k, include_metadata):
+        scored = sorted(
+            ((float(np.dot(values, vector)), vector_id, metadata)
+             for vector_id, (values, metadata) in self.vectors.items()),
+            reverse=True
+        )
+        return {"matches": [{"id": vector_id, "score": score, "metadata": metadata}
+                            for score, vector_id, metadata in scored[:top_k]]}
+
+    def fetch(self, ids):
+        found = [vector_id for vector_id in ids if vector_id in self.vectors]
+        return {"vectors": {vector_id: {"metadata": self.vectors[vector_id][1]} for vector_id in found}}
+
+    def delete(self, ids=None, delete_all=False):
+        assert delete_all or ids # Pinecone rejects a delete without ids
+        if delete_all:
+            self.vectors.clear()
+        for vector_id in ids or []:
+            self.vectors.pop(vector_id, None)
+
+    def describe_index_stats(self):
+        return {"total_vector_count": len(self.vectors)}
+
+
+def test_pinecone_store_upsert_delete_and_reupsert(vectors):
+    store = PineconeVectorStore(DIMENSION, index=FakePineconeIndex())
+    store.upsert([(f"id{i}", vectors[i], {"text": f"chunk {i}"}) for i in range(5)])
+    assert store.count() == 5
+    assert query_ids(store, vectors[3], top_k=1) == ["id3"]
+
+    store.delete(["id3"])
+    store.delete([]) # Sends no request
+    store.upsert([("id4", vectors[3], {"text": "changed"})])
+    assert store.count() == 4
+    assert store.fetch(["id3", "id4"]) == {"id4": {"text": "changed"}}
+    assert query_metadata(store, vectors[3], top_k=1) == {"id4": {"text": "changed"}}
+    assert asyncio.run(store.aquery(vectors[3], top_k=1))[0]["id"] == "id4" # Falls back to the sync client
+
+    store.clear()
+    assert store.count() == 0
+
+
+class FakeAsyncIndex:
+    def __init__(self):
+        self.closed = False
+
+    async def query(self, vector, top_k, include_metadata):
+        return {"matches": [{"id": "a", "score": 1.0, "metadata": {"text": "alpha"}}]}
+
+    async def close(self):
+        self.closed = True
+
+
+class FakePinecone:
+    def __init__(self):
+        self.describes = 0
+        self.clients = []
+
+    def describe_index(self, name):
+        self.describes += 1
+        return SimpleNamespace(host=f"{name}.example")
+
+    def IndexAsyncio(self, host):
+        self.clients.append(FakeAsyncIndex())
+        return self.clients[-1]
+
+
+def test_pinecone_async_client_is_reused_and_closed():
+    store = PineconeVectorStore(DIMENSION, index=object())
+    store.pc = FakePinecone()
+
+    async def serve():
+        for _ in range(3):
+            assert (await store.aquery([0.0] * DIMENSION, top_k=1))[0]["id"] == "a"
+        await store.aclose()
+
+    asyncio.run(serve())
+    asyncio.run(serve())
+    assert store.pc.describes == 1 # The host is resolved once
+    assert len(store.pc.clients) == 2 # One client per event loop
+    assert all(client.closed for client in store.pc.clients)
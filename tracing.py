@@ -0,0 +1,311 @@
+# tracing.py
+import os
+import json
+import time
+import uuid
+import bisect
+import logging
+import inspect
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+# --- Tracing Configuration ---
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text") # 'json' emits one JSON object per line
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+RECENT_SPANS = 2000 # Finished spans kept in memory for `spans_for_trace`
+
+_current_trace_id = contextvars.ContextVar("mcp_trace_id", default=None)
+
+
+def new_trace_id():
+    return str(uuid.uuid4())
+
+
+def current_trace_id():
+    """The trace id of the request being handled on this thread or task, or None outside one."""
+    return _current_trace_id.get()
+
+
+@contextmanager
+def trace(trace_id=None):
+    """
+    Makes `trace_id` (a new one if None) the current trace, so every MCP message created
+    and every span recorded inside the block carries it.
+    """
+    trace_id = trace_id or new_trace_id()
+    token = _current_trace_id.set(trace_id)
+    try:
+        yield trace_id
+    finally:
+        _current_trace_id.reset(token)
+
+
+def _trace_for_call(args):
+    """An incoming MCP message's trace id, else the caller's current trace, else a new one."""
+    message = args[1] if len(args) > 1 else None
+    if isinstance(message, dict) and message.get("trace_id"):
+        return message["trace_id"]
+    return current_trace_id() or new_trace_id()
+
+
+def traced(method):
+    """
+    Runs an Orchestrator or agent method inside a trace. Agent methods join the trace of
+    the MCP message they receive; Orchestrator entry points join the caller's trace or
+    start a new one. Works for plain, generator and async methods. Generators run every
+    step inside their own context, so the trace never leaks to the consumer between yields.
+    """
+    if inspect.isgeneratorfunction(method):
+        @wraps(method)
+        def generator_wrapper(*args, **kwargs):
+            context = contextvars.copy_context()
+            context.run(_current_trace_id.set, _trace_for_call(args))
+            generator = context.run(method, *args, **kwargs)
+            try:
+                while True:
+                    try:
+                        item = context.run(next, generator)
+                    except StopIteration:
+                        return
+                    yield item
+            finally:
+                context.run(generator.close)
+        return generator_wrapper
+
+    if inspect.iscoroutinefunction(method):
+        @wraps(method)
+        async def coroutine_wrapper(*args, **kwargs):
+            with trace(_trace_for_call(args)):
+                return await method(*args, **kwargs)
+        return coroutine_wrapper
+
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        with trace(_trace_for_call(args)):
+            return method(*args, **kwargs)
+    return wrapper
+
+
+def bind_context(function):
+    """Wraps `function` to run in a copy of the caller's context, e.g. when handing it to a thread pool."""
+    context = contextvars.copy_context()
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        return context.copy().run(function, *args, **kwargs)
+    return wrapper
+
+
+class Histogram:
+    """Cumulative latency histogram with Prometheus-style `le` buckets."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # The last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (the usual histogram estimate)."""
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return round(min(bound, self.max), 3)
+        return round(self.max, 3)
+
+    def cumulative(self):
+        running, result = 0, []
+        for bound, count in zip(list(self.buckets) + ["+Inf"], self.counts):
+            running += count
+            result.append((bound, running))
+        return result
+
+
+class StageMetrics:
+    """
+    In-process registry of span durations per pipeline stage, plus running totals of the
+    numeric span attributes (chunks, bytes, tokens, ...). Exported as JSON or Prometheus text.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.totals = {}
+        self.errors = {}
+        self.recent = deque(maxlen=RECENT_SPANS)
+
+    def record(self, span_record):
+        stage = span_record["stage"]
+        with self._lock:
+            self.histograms.setdefault(stage, Histogram()).observe(span_record["duration_ms"])
+            totals = self.totals.setdefault(stage, {})
+            for name, value in span_record["attributes"].items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    totals[name] = totals.get(name, 0) + value
+            if span_record["error"]:
+                self.errors[stage] = self.errors.get(stage, 0) + 1
+            self.recent.append(span_record)
+
+    def spans_for_trace(self, trace_id):
+        with self._lock:
+            return [record for record in self.recent if record["trace_id"] == trace_id]
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                stage: {
+                    "count": histogram.count,
+                    "errors": self.errors.get(stage, 0),
+                    "sum_ms": round(histogram.sum, 3),
+                    "mean_ms": round(histogram.sum / histogram.count, 3),
+                    "p50_ms": histogram.quantile(0.50),
+                    "p95_ms": histogram.quantile(0.95),
+                    "p99_ms": histogram.quantile(0.99),
+                    "max_ms": round(histogram.max, 3),
+                    "buckets": {str(bound): count for bound, count in histogram.cumulative()},
+                    "totals": {name: round(value, 3) for name, value in self.totals.get(stage, {}).items()},
+                }
+                for stage, histogram in sorted(self.histograms.items())
+            }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self, prefix="rag"):
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = [
+            f"# HELP {prefix}_stage_duration_ms Duration of pipeline stages in milliseconds.",
+            f"# TYPE {prefix}_stage_duration_ms histogram",
+        ]
+        with self._lock:
+            for stage, histogram in sorted(self.histograms.items()):
+                for bound, count in histogram.cumulative():
+                    lines.append(f'{prefix}_stage_duration_ms_bucket{{stage="{stage}",le="{bound}"}} {count}')
+                lines.append(f'{prefix}_stage_duration_ms_sum{{stage="{stage}"}} {histogram.sum:.3f}')
+                lines.append(f'{prefix}_stage_duration_ms_count{{stage="{stage}"}} {histogram.count}')
+            lines += [
+                f"# HELP {prefix}_stage_items_total Running totals of span attributes (chunks, bytes, tokens).",
+                f"# TYPE {prefix}_stage_items_total counter",
+            ]
+            for stage, totals in sorted(self.totals.items()):
+                for name, value in sorted(totals.items()):
+                    lines.append(f'{prefix}_stage_items_total{{stage="{stage}",item="{name}"}} {value}')
+            lines += [f"# TYPE {prefix}_stage_errors_total counter"]
+            for stage, errors in sorted(self.errors.items()):
+                lines.append(f'{prefix}_stage_errors_total{{stage="{stage}"}} {errors}')
+        return "\n".join(lines) + "\n"
+
+    def drain(self):
+        """
+        Returns the recent spans and resets the metrics. Worker processes send the drained
+        spans back with each result, and the parent `record`s them.
+        """
+        with self._lock:
+            spans = list(self.recent)
+        self.reset()
+        return spans
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.totals.clear()
+            self.errors.clear()
+            self.recent.clear()
+
+
+METRICS = StageMetrics()
+_span_logger = logging.getLogger("tracing")
+
+
+@contextmanager
+def span(stage, **attributes):
+    """
+    Times a pipeline stage of the current trace and records it in METRICS. The yielded
+    dict holds the span's attributes; callers add counts that are known only at the end:
+
+        with span("encode", texts=len(texts)) as attrs:
+            ...
+            attrs["cache_hits"] = hits
+    """
+    start = time.perf_counter()
+    error = None
+    try:
+        yield attributes
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        record_span(stage, (time.perf_counter() - start) * 1000, error=error, **attributes)
+
+
+def record_span(stage, duration_ms, error=None, **attributes):
+    """
+    Records a span whose duration was measured by the caller, e.g. a streaming stage that
+    only counts the time spent producing items, not the time its consumer spends on them.
+    """
+    span_record = {
+        "trace_id": current_trace_id(), "stage": stage, "duration_ms": duration_ms,
+        "attributes": attributes, "error": error,
+    }
+    METRICS.record(span_record)
+    _span_logger.debug(f"span {stage} {duration_ms:.2f} ms", extra={"span": span_record})
+
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record), "level": record.levelname, "logger": record.name,
+            "trace_id": getattr(record, "trace_id", None), "message": record.getMessage(),
+        }
+        if hasattr(record, "span"):
+            entry["span"] = record.span
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+_logging_configured = False
+
+
+def configure_logging(level=None, fmt=None):
+    """
+    Sets up level-controlled logging (LOG_LEVEL, LOG_FORMAT=text|json) with the current
+    trace id on every record. Safe to call more than once; an application that already
+    configured the root logger keeps its handlers and only gains the `trace_id` field.
+    """
+    global _logging_configured
+    if _logging_configured:
+        return
+    _logging_configured = True
+
+    base_factory = logging.getLogRecordFactory()
+
+    def record_factory(*args, **kwargs):
+        record = base_factory(*args, **kwargs)
+        record.trace_id = current_trace_id() or "-"
+        return record
+    logging.setLogRecordFactory(record_factory)
+
+    root = logging.getLogger()
+    if not root.handlers:
+        handler = logging.StreamHandler()
+        if (fmt or LOG_FORMAT) == "json":
+            handler.setFormatter(_JsonFormatter())
+        else:
+            handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] trace=%(trace_id).8s %(message)s"))
+        root.addHandler(handler)
+    root.setLevel((level or LOG_LEVEL).upper())
@@ -0,0 +1,201 @@
+# upsert_engine.py
+import json
+import time
+import random
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from tracing import span, bind_context
+
+# --- Upsert Engine Configuration ---
+MAX_IN_FLIGHT_REQUESTS = 4
+MAX_BATCH_BYTES = 1_500_000 # Stays under Pinecone's 2MB request limit
+MAX_BATCH_VECTORS = 1000
+MAX_RETRIES = 5
+BASE_BACKOFF_SECONDS = 0.2
+MAX_BACKOFF_SECONDS = 10.0
+# Errors that a later attempt cannot fix (e.g. a vector of the wrong dimension)
+DETERMINISTIC_ERRORS = (ValueError, TypeError)
+
+
+class UpsertError(Exception):
+    """
+    Raised by UpsertEngine.flush when a batch still failed after every retry. `retryable`
+    is False when the failure was deterministic, so retrying the whole document is pointless.
+    """
+
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class UpsertEngine:
+    """
+    Uploads vectors to a VectorStore on a bounded pool of background threads.
+
+    Submitted vectors are buffered and sent as soon as they fill a request, cut by estimated
+    payload bytes and vector count, so many small submits (e.g. one per embedding micro-batch)
+    share full-size requests; `flush` sends what is left. `submit` returns once any full
+    requests are queued, so the caller can encode the next batch while they are uploaded.
+    At most `max_in_flight` requests run at once; further submits block until one finishes
+    (backpressure). Failed requests are retried with jittered exponential backoff, and the
+    byte budget is halved after a failure and grows back after successful requests.
+    """
+
+    def __init__(self, vector_store, max_in_flight=MAX_IN_FLIGHT_REQUESTS, max_batch_bytes=MAX_BATCH_BYTES,
+                 max_batch_vectors=MAX_BATCH_VECTORS, max_retries=MAX_RETRIES):
+        self.vector_store = vector_store
+        self.max_batch_bytes = max_batch_bytes
+        self.max_batch_vectors = max_batch_vectors
+        self.max_retries = max_retries
+        self.batch_bytes = max_batch_bytes # Current adaptive byte budget per request
+
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="upsert")
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self._futures = []
+        self._errors = []
+        self._buffer = [] # (vector, on_success) pairs not yet sent
+        self._buffer_bytes = 0
+
+        self.started_at = None
+        self.vectors_upserted = 0
+        self.requests = 0
+        self.retries = 0
+        self.latencies_ms = []
+
+    @staticmethod
+    def _estimate_bytes(vector):
+        """Rough request size of one vector: ~10 bytes per serialized float plus its metadata."""
+        vector_id, values, metadata = vector
+        return len(vector_id) + 10 * len(values) + len(json.dumps(metadata))
+
+    def submit(self, vectors, on_success=None):
+        """
+        Adds `vectors` to the upload buffer, sending every request it fills. `on_success(vectors)`
+        runs on a worker thread with this submit's vectors from each request once it is stored,
+        which lets callers record progress only for data that really landed.
+        """
+        if self.started_at is None:
+            self.started_at = time.perf_counter()
+        for vector in vectors:
+            size = self._estimate_bytes(vector)
+            if self._buffer and (self._buffer_bytes + size > self.batch_bytes
+                                 or len(self._buffer) >= self.max_batch_vectors):
+                self._send_buffer()
+            self._buffer.append((vector, on_success))
+            self._buffer_bytes += size
+
+    def _send_buffer(self):
+        entries, self._buffer, self._buffer_bytes = self._buffer, [], 0
+        self._slots.acquire() # Blocks while max_in_flight requests are outstanding
+        # Upload threads join the caller's trace, so their spans are attributed to the request
+        future = self._executor.submit(bind_context(self._upsert_with_retry), entries)
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures.append(future)
+
+    def _upsert_with_retry(self, entries):
+        batch = [vector for vector, _ in entries]
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                with span("upsert", vectors=len(batch), bytes=sum(self._estimate_bytes(vector) for vector in batch)):
+                    self.vector_store.upsert(batch)
+            except Exception as e:
+                with self._lock:
+                    self.retries += 1
+                    self.batch_bytes = max(self.batch_bytes // 2, 1) # Back off on payload size too
+                if attempt == self.max_retries:
+                    with self._lock:
+                        self._errors.append(e)
+                    raise
+                backoff = min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * 2 ** attempt)
+                time.sleep(random.uniform(0, backoff)) # Full jitter
+                continue
+
+            with self._lock:
+                self.requests += 1
+                self.vectors_upserted += len(batch)
+                self.latencies_ms.append((time.perf_counter() - start) * 1000)
+                self.batch_bytes = min(self.max_batch_bytes, int(self.batch_bytes * 1.25))
+            # A request can hold vectors from several submits: report each submit's share to its callback
+            for on_success, group in itertools.groupby(entries, key=lambda entry: entry[1]):
+                if on_success is not None:
+                    on_success([vector for vector, _ in group])
+            return
+
+    def flush(self):
+        """Sends the buffered vectors and waits for every request; raises UpsertError if any ultimately failed."""
+        if self._buffer:
+            self._send_buffer()
+        for future in self._futures:
+            future.exception() # Wait without raising; errors are collected below
+        self._futures = []
+        if self._errors:
+            errors, self._errors = self._errors, []
+            raise UpsertError(
+                f"{len(errors)} upsert batch(es) failed after {self.max_retries} retries: {errors[0]}",
+                retryable=not all(isinstance(error, DETERMINISTIC_ERRORS) for error in errors)
+            )
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def stats(self):
+        with self._lock:
+            elapsed = time.perf_counter() - self.started_at if self.started_at else 0.0
+            latencies = sorted(self.latencies_ms)
+        def percentile(p):
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 2) if latencies else None
+        return {
+            "vectors": self.vectors_upserted,
+            "requests": self.requests,
+            "retries": self.retries,
+            "vectors_per_sec": round(self.vectors_upserted / elapsed, 1) if elapsed else 0.0,
+            "latency_ms_p50": percentile(0.50),
+            "latency_ms_p95": percentile(0.95),
+            "latency_ms_max": round(latencies[-1], 2) if latencies else None,
+        }
+
+
+# --- Let's test the engine against a local fake index ---
+if __name__ == "__main__":
+    from vector_store import VectorStore
+
+    class FlakyFakeIndex(VectorStore):
+        """In-memory stand-in for Pinecone with network-like latency and occasional failures."""
+        name = "fake"
+
+        def __init__(self, latency=0.02, failure_rate=0.1):
+            self.vectors = {}
+            self.latency = latency
+            self.failure_rate = failure_rate
+            self._lock = threading.Lock()
+
+        def upsert(self, vectors):
+            time.sleep(self.latency)
+            if random.random() < self.failure_rate:
+                raise ConnectionError("simulated transient network error")
+            with self._lock:
+                for vector_id, values, metadata in vectors:
+                    self.vectors[vector_id] = (values, metadata)
+
+        def count(self):
+            return len(self.vectors)
+
+    fake_index = FlakyFakeIndex()
+    fake_vectors = [(f"doc-{i}", [0.1] * 384, {"text": "x" * 500, "source": "doc"}) for i in range(5000)]
+
+    with UpsertEngine(fake_index) as engine:
+        for i in range(0, len(fake_vectors), 250):
+            engine.submit(fake_vectors[i:i + 250])
+        engine.flush()
+        print("Upsert stats:", engine.stats())
+    print(f"Vectors in fake index: {fake_index.count()} / {len(fake_vectors)}")
@@ -0,0 +1,534 @@
+# vector_store.py
+import os
+import json
+import time
+import asyncio
+import logging
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from quantization import SCORE_BLOCK_ROWS, create_quantizer, recall_at_k
+from ann_index import HnswIndex, HNSW_BUILD_BLOCK_ROWS
+
+logger = logging.getLogger(__name__)
+
+# --- Vector Store Configuration ---
+PINECONE_INDEX_NAME = "rag"
+DEFAULT_LOCAL_STORE_DIR = os.path.join(".rag_data", "vector_store") # Override with LOCAL_VECTOR_STORE_DIR
+LOCAL_INITIAL_CAPACITY = 1024
+BATCH_QUERY_WORKERS = 8 # Concurrent requests used by query_batch on remote backends
+RESCORE_FACTOR = 4 # With quantization, candidates re-scored with float vectors per requested result
+QUANTIZER_MAX_TRAIN_ROWS = 50000
+
+
+class VectorStore:
+    """
+    Minimal interface shared by every vector backend used by the RetrievalAgent.
+    Vectors are passed as (id, values, metadata) tuples, the same shape Pinecone expects,
+    and query results come back as a list of {"id", "score", "metadata"} dicts.
+    """
+    name = "base"
+
+    def upsert(self, vectors):
+        raise NotImplementedError
+
+    def query(self, vector, top_k=5):
+        raise NotImplementedError
+
+    async def aquery(self, vector, top_k=5):
+        """Async query. Backends without a native async client run `query` on the default executor."""
+        return await asyncio.to_thread(self.query, vector, top_k)
+
+    async def aclose(self):
+        """Closes the async client opened by `aquery`, if the backend keeps one."""
+
+    def query_batch(self, vectors, top_k=5):
+        """Runs one query per vector, concurrently, and returns the match lists in input order."""
+        vectors = list(vectors)
+        if len(vectors) <= 1:
+            return [self.query(vector, top_k) for vector in vectors]
+        with ThreadPoolExecutor(max_workers=min(BATCH_QUERY_WORKERS, len(vectors))) as executor:
+            return list(executor.map(lambda vector: self.query(vector, top_k), vectors))
+
+    def fetch(self, ids):
+        """Returns {id: metadata} for the given ids; unknown ids are left out."""
+        raise NotImplementedError
+
+    def delete(self, ids):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def count(self):
+        raise NotImplementedError
+
+    def persist(self):
+        """Writes in-memory index state to disk. A no-op for backends that persist every write."""
+
+    def describe(self):
+        return {"backend": self.name, "total_vector_count": self.count()}
+
+
+class PineconeVectorStore(VectorStore):
+    """Vector store backed by a (remote) Pinecone serverless index."""
+    name = "pinecone"
+
+    def __init__(self, dimension, index_name=PINECONE_INDEX_NAME, api_key=None, index=None):
+        self.dimension = dimension
+        self.index_name = index_name
+        self._async_host = None
+        self._async_index = None
+        self._async_loop = None
+        if index is not None:
+            # An already-connected index (or a compatible fake) was handed to us.
+            self.pc = None
+            self.index = index
+            return
+
+        from pinecone import Pinecone
+
+        api_key = api_key or os.getenv("PINECONE_API_KEY")
+        if not api_key:
+            raise ValueError("PINECONE_API_KEY is not set in the .env file.")
+        self.pc = Pinecone(api_key=api_key)
+        self._ensure_index()
+        self.index = self.pc.Index(self.index_name)
+
+    def _ensure_index(self):
+        """Checks if the Pinecone index exists, and if not, creates it."""
+        from pinecone import ServerlessSpec
+
+        if self.index_name not in self.pc.list_indexes().names():
+            logger.info(f"Index '{self.index_name}' not found. Creating new index...")
+            self.pc.create_index(
+                name=self.index_name,
+                dimension=self.dimension,
+                metric='cosine',
+                spec=ServerlessSpec(
+                    cloud='aws',
+                    region='us-east-1'
+                )
+            )
+            logger.info("Index created successfully. Waiting for initialization...")
+            # Poll readiness instead of sleeping a fixed 10 seconds
+            deadline = time.monotonic() + 60
+            while not self.pc.describe_index(self.index_name).status['ready'] and time.monotonic() < deadline:
+                time.sleep(1)
+        else:
+            logger.info(f"Found existing index '{self.index_name}'.")
+
+    def upsert(self, vectors):
+        vectors = [
+            (vector_id, values.tolist() if hasattr(values, "tolist") else values, metadata)
+            for vector_id, values, metadata in vectors
+        ]
+        self.index.upsert(vectors=vectors)
+
+    def query(self, vector, top_k=5):
+        if hasattr(vector, "tolist"):
+            vector = vector.tolist()
+        query_result = self.index.query(vector=vector, top_k=top_k, include_metadata=True)
+        return [
+            {"id": match['id'], "score": match['score'], "metadata": match['metadata']}
+            for match in query_result['matches']
+        ]
+
+    async def aquery(self, vector, top_k=5):
+        """Queries through Pinecone's asyncio client when the installed SDK provides one."""
+        if self.pc is None or not hasattr(self.pc, "IndexAsyncio"):
+            return await super().aquery(vector, top_k)
+        loop = asyncio.get_running_loop()
+        if self._async_loop is not loop:
+            # The async client's HTTP session is bound to the loop that created it
+            self._release_async_index()
+            if self._async_host is None:
+                # Resolved once, off the event loop: describe_index is a blocking HTTP call
+                description = await asyncio.to_thread(self.pc.describe_index, self.index_name)
+                self._async_host = description.host
+            if self._async_loop is not loop:
+                self._async_index = self.pc.IndexAsyncio(host=self._async_host)
+                self._async_loop = loop
+        if hasattr(vector, "tolist"):
+            vector = vector.tolist()
+        query_result = await self._async_index.query(vector=vector, top_k=top_k, include_metadata=True)
+        return [
+            {"id": match['id'], "score": match['score'], "metadata": match['metadata']}
+            for match in query_result['matches']
+        ]
+
+    def _release_async_index(self):
+        """Closes an async client left over from another event loop, on that loop if it is still running."""
+        async_index, old_loop = self._async_index, self._async_loop
+        self._async_index = self._async_loop = None
+        if async_index is None:
+            return
+        if old_loop.is_running():
+            asyncio.run_coroutine_threadsafe(async_index.close(), old_loop)
+        else:
+            logger.warning("Dropping a Pinecone async client whose event loop has stopped; call aclose() before the loop ends.")
+
+    async def aclose(self):
+        if self._async_index is None:
+            return
+        if self._async_loop is not asyncio.get_running_loop():
+            self._release_async_index()
+            return
+        async_index = self._async_index
+        self._async_index = self._async_loop = None
+        await async_index.close()
+
+    def fetch(self, ids):
+        ids = list(ids)
+        if not ids:
+            return {}
+        fetch_result = self.index.fetch(ids=ids)
+        vectors = fetch_result.vectors if hasattr(fetch_result, "vectors") else fetch_result['vectors']
+        return {
+            vector_id: vector.metadata if hasattr(vector, "metadata") else vector['metadata']
+            for vector_id, vector in vectors.items()
+        }
+
+    def delete(self, ids):
+        ids = list(ids)
+        if ids:
+            self.index.delete(ids=ids)
+
+    def clear(self):
+        self.index.delete(delete_all=True)
+
+    def count(self):
+        return self.index.describe_index_stats().get('total_vector_count', 0)
+
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process vector store for small and medium corpora.
+
+    Embeddings are L2-normalised and kept in a float32 matrix memory-mapped from disk,
+    so cosine top-k is a single matrix-vector product. Ids and metadata live in a small
+    SQLite file next to the matrix; rows freed by deletes are reused by later upserts.
+
+    With `quantization='sq8'` or `'pq'` (or LOCAL_VECTOR_QUANTIZATION) every vector is also
+    stored as a compact code (1 byte per dimension, or per PQ subspace). Searches scan only
+    the codes, and with `rescore=True` the best candidates are re-scored with their float
+    vectors, so the float matrix is read a few rows at a time instead of in full.
+
+    With `index_type='hnsw'` (or LOCAL_VECTOR_INDEX) queries go through an in-memory HNSW
+    graph instead of a full scan; call `persist` to save the graph.
+    """
+    name = "local"
+
+    def __init__(self, dimension, directory=None, quantization=None, rescore=True, rescore_factor=RESCORE_FACTOR,
+                 index_type=None, **hnsw_params):
+        directory = directory or os.getenv("LOCAL_VECTOR_STORE_DIR", DEFAULT_LOCAL_STORE_DIR)
+        self.dimension = dimension
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._matrix_path = os.path.join(directory, "embeddings.f32")
+
+        self.quantization = quantization or os.getenv("LOCAL_VECTOR_QUANTIZATION", "none")
+        self.rescore = rescore
+        self.rescore_factor = rescore_factor
+        self.quantizer = None if self.quantization == "none" else create_quantizer(self.quantization, dimension)
+        self.codes = None # Memory-mapped codes, once the quantizer has been trained
+        self._quantizer_path = os.path.join(directory, f"quantizer-{self.quantization}.npz")
+        self._codes_path = os.path.join(directory, f"codes-{self.quantization}.u8")
+
+        self._db = sqlite3.connect(os.path.join(directory, "metadata.sqlite3"), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS vectors (row INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, metadata TEXT)"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT)")
+        self._check_dimension()
+        # Counts committed writes, so a saved HNSW graph can tell whether it is up to date
+        row = self._db.execute("SELECT value FROM info WHERE key = 'generation'").fetchone()
+        self.generation = int(row[0]) if row else 0
+
+        self.id_to_row = dict(self._db.execute("SELECT id, row FROM vectors"))
+        self.size = max(self.id_to_row.values(), default=-1) + 1 # High-water mark of used rows
+        self.capacity = 0
+        self.matrix = None
+        if self.quantizer is not None and os.path.exists(self._quantizer_path):
+            with np.load(self._quantizer_path) as state:
+                self.quantizer.load_state(dict(state)) # Its codes are mapped by _open_matrix
+        self._open_matrix(max(LOCAL_INITIAL_CAPACITY, self.size))
+        self.alive = np.zeros(self.capacity, dtype=bool)
+        self.alive[list(self.id_to_row.values())] = True
+        self.free_rows = [row for row in range(self.size) if not self.alive[row]]
+
+        self.index_type = index_type or os.getenv("LOCAL_VECTOR_INDEX", "flat")
+        self.hnsw = None
+        if self.index_type == "hnsw":
+            self.hnsw = HnswIndex(dimension, os.path.join(directory, "hnsw.bin"), self.capacity, **hnsw_params)
+            if self.hnsw.generation != self.generation:
+                self._rebuild_hnsw()
+        elif self.index_type != "flat":
+            raise ValueError(f"Unknown local index type '{self.index_type}'. Expected 'flat' or 'hnsw'.")
+
+    def _check_dimension(self):
+        row = self._db.execute("SELECT value FROM info WHERE key = 'dimension'").fetchone()
+        if row is None:
+            self._db.execute("INSERT INTO info VALUES ('dimension', ?)", (str(self.dimension),))
+            self._db.commit()
+        elif int(row[0]) != self.dimension:
+            raise ValueError(
+                f"Local vector store at '{self.directory}' has dimension {row[0]}, expected {self.dimension}."
+            )
+
+    @staticmethod
+    def _map_rows(path, dtype, width, capacity):
+        """Memory-maps a file of `width`-wide rows, growing it to at least `capacity` rows."""
+        row_bytes = width * np.dtype(dtype).itemsize
+        current_bytes = os.path.getsize(path) if os.path.exists(path) else 0
+        capacity = max(capacity, current_bytes // row_bytes)
+        if capacity * row_bytes > current_bytes:
+            with open(path, "ab") as f:
+                f.truncate(capacity * row_bytes)
+        return np.memmap(path, dtype=dtype, mode="r+", shape=(capacity, width))
+
+    def _open_matrix(self, capacity):
+        """(Re)maps the embedding file (and code file, if any), growing them to hold at least `capacity` rows."""
+        if self.matrix is not None:
+            self.matrix.flush()
+            self.matrix = None
+        self.matrix = self._map_rows(self._matrix_path, np.float32, self.dimension, capacity)
+        capacity = len(self.matrix)
+        if self.quantizer is not None and os.path.exists(self._quantizer_path):
+            if self.codes is not None:
+                self.codes.flush()
+            self.codes = self._map_rows(self._codes_path, np.uint8, self.quantizer.code_size, capacity)
+        if self.capacity and capacity > self.capacity:
+            self.alive = np.concatenate([self.alive, np.zeros(capacity - self.capacity, dtype=bool)])
+        self.capacity = capacity
+
+    def _allocate_row(self):
+        if self.free_rows:
+            return self.free_rows.pop()
+        if self.size >= self.capacity:
+            self._open_matrix(self.capacity * 2)
+        self.size += 1
+        return self.size - 1
+
+    def _train_quantizer(self):
+        """Trains the quantizer on the stored vectors once there are enough, then encodes them all."""
+        rows = np.flatnonzero(self.alive[:self.size])
+        if len(rows) < self.quantizer.train_size:
+            return
+        logger.info(f"Training '{self.quantization}' quantizer on {min(len(rows), QUANTIZER_MAX_TRAIN_ROWS)} vectors...")
+        if len(rows) > QUANTIZER_MAX_TRAIN_ROWS:
+            rows = np.sort(np.random.default_rng(0).choice(rows, QUANTIZER_MAX_TRAIN_ROWS, replace=False))
+        self.quantizer.fit(self.matrix[rows])
+        np.savez(self._quantizer_path, **self.quantizer.state())
+        self.codes = self._map_rows(self._codes_path, np.uint8, self.quantizer.code_size, self.capacity)
+        for start in range(0, self.size, SCORE_BLOCK_ROWS):
+            end = min(self.size, start + SCORE_BLOCK_ROWS)
+            self.codes[start:end] = self.quantizer.encode(self.matrix[start:end])
+        self.codes.flush()
+
+    def _commit(self):
+        """Commits a write together with the next store generation."""
+        self.generation += 1
+        self._db.execute("INSERT OR REPLACE INTO info VALUES ('generation', ?)", (str(self.generation),))
+        self._db.commit()
+
+    def _rebuild_hnsw(self):
+        """Rebuilds the HNSW graph from the stored vectors (first use, or writes made after the graph was saved)."""
+        rows = np.flatnonzero(self.alive[:self.size])
+        logger.info(f"Building HNSW graph over {len(rows)} vectors...")
+        self.hnsw.clear(self.capacity)
+        for start in range(0, len(rows), HNSW_BUILD_BLOCK_ROWS):
+            block = rows[start:start + HNSW_BUILD_BLOCK_ROWS]
+            self.hnsw.add(block, self.matrix[block], new_rows=block)
+        self.hnsw.save(self.generation)
+
+    @staticmethod
+    def _normalize(vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def upsert(self, vectors):
+        if not vectors:
+            return
+        ids, values, metadatas = zip(*vectors)
+        values = self._normalize(np.vstack([np.asarray(v, dtype=np.float32) for v in values]))
+        with self._lock:
+            rows = []
+            new_rows = []
+            for vector_id in ids:
+                row = self.id_to_row.get(vector_id)
+                if row is None:
+                    row = self._allocate_row()
+                    self.id_to_row[vector_id] = row
+                    new_rows.append(row)
+                rows.append(row)
+            self.matrix[rows] = values
+            self.alive[rows] = True
+            self._db.executemany(
+                "INSERT OR REPLACE INTO vectors (row, id, metadata) VALUES (?, ?, ?)",
+                [(row, vector_id, json.dumps(metadata)) for row, vector_id, metadata in zip(rows, ids, metadatas)]
+            )
+            self._commit()
+            self.matrix.flush()
+            if self.codes is not None:
+                self.codes[rows] = self.quantizer.encode(values)
+                self.codes.flush()
+            elif self.quantizer is not None:
+                self._train_quantizer()
+            if self.hnsw is not None:
+                self.hnsw.add(rows, values, new_rows)
+
+    @staticmethod
+    def _best_rows(scores, top_k):
+        """Rows of the `top_k` highest finite scores, best first."""
+        top_k = min(top_k, len(scores))
+        top_rows = np.argpartition(-scores, top_k - 1)[:top_k]
+        top_rows = top_rows[np.argsort(-scores[top_rows])]
+        return [int(row) for row in top_rows if np.isfinite(scores[row])]
+
+    def _hnsw_top_rows(self, query_matrix, top_k):
+        """Graph search for every query; None when the graph cannot answer (e.g. too many tombstones)."""
+        try:
+            rows, scores = self.hnsw.query(query_matrix, top_k)
+        except RuntimeError:
+            return None
+        return [(row_list.tolist(), dict(zip(row_list.tolist(), score_list.tolist())))
+                for row_list, score_list in zip(rows, scores)]
+
+    def _top_rows(self, query_vector, top_k):
+        """Returns the best `top_k` live rows for a normalised query and a {row: score} map."""
+        if self.hnsw is not None:
+            results = self._hnsw_top_rows(query_vector, top_k)
+            if results is not None:
+                return results[0]
+
+        if self.codes is None:
+            scores = self.matrix[:self.size] @ query_vector
+            scores[~self.alive[:self.size]] = -np.inf
+            return self._best_rows(scores, top_k), scores
+
+        # Asymmetric search over the codes, then optional exact re-scoring of the best candidates
+        scores = self.quantizer.scores(self.codes[:self.size], query_vector)
+        scores[~self.alive[:self.size]] = -np.inf
+        rows = self._best_rows(scores, top_k * self.rescore_factor if self.rescore else top_k)
+        if not self.rescore or not rows:
+            return rows, scores
+        exact_scores = self.matrix[rows] @ query_vector
+        order = np.argsort(-exact_scores)[:top_k]
+        return [rows[i] for i in order], {rows[i]: float(exact_scores[i]) for i in order}
+
+    def query(self, vector, top_k=5):
+        query_vector = self._normalize(vector)
+        with self._lock:
+            if self.size == 0 or top_k <= 0:
+                return []
+            return self._matches(*self._top_rows(query_vector, top_k))
+
+    def query_batch(self, vectors, top_k=5):
+        """Scores every query against every stored vector with a single matrix multiply."""
+        query_matrix = self._normalize(np.atleast_2d(np.asarray(vectors, dtype=np.float32)))
+        with self._lock:
+            if self.size == 0 or top_k <= 0:
+                return [[] for _ in range(len(query_matrix))]
+            results = self._hnsw_top_rows(query_matrix, top_k) if self.hnsw is not None else None
+            if results is not None:
+                return [self._matches(rows, scores) for rows, scores in results]
+            if self.codes is not None:
+                return [self._matches(*self._top_rows(query_vector, top_k)) for query_vector in query_matrix]
+            scores = self.matrix[:self.size] @ query_matrix.T # (size, num_queries)
+            scores[~self.alive[:self.size]] = -np.inf
+            return [self._matches(self._best_rows(column, top_k), column) for column in scores.T]
+
+    def _matches(self, rows, scores):
+        if not rows:
+            return []
+        placeholders = ",".join("?" * len(rows))
+        records = {
+            row: (vector_id, metadata)
+            for row, vector_id, metadata in self._db.execute(
+                f"SELECT row, id, metadata FROM vectors WHERE row IN ({placeholders})", rows
+            )
+        }
+        return [
+            {"id": records[row][0], "score": float(scores[row]), "metadata": json.loads(records[row][1])}
+            for row in rows
+        ]
+
+    def evaluate_recall(self, queries, top_k=10):
+        """recall@k of this store's search (HNSW, quantized and/or re-scored) against exact float search."""
+        query_matrix = self._normalize(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        with self._lock:
+            exact_scores = self.matrix[:self.size] @ query_matrix.T
+            exact_scores[~self.alive[:self.size]] = -np.inf
+            exact = [self._best_rows(column, top_k) for column in exact_scores.T]
+            approximate = [self._top_rows(query_vector, top_k)[0] for query_vector in query_matrix]
+        return {
+            "index": self.index_type,
+            "quantization": self.quantization if self.codes is not None else "none",
+            "rescore": self.rescore,
+            f"recall@{top_k}": recall_at_k(exact, approximate),
+        }
+
+    def fetch(self, ids):
+        ids = list(ids)
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        with self._lock:
+            records = self._db.execute(f"SELECT id, metadata FROM vectors WHERE id IN ({placeholders})", ids).fetchall()
+        return {vector_id: json.loads(metadata) for vector_id, metadata in records}
+
+    def delete(self, ids):
+        with self._lock:
+            rows = [self.id_to_row.pop(vector_id) for vector_id in ids if vector_id in self.id_to_row]
+            if not rows:
+                return
+            self.alive[rows] = False
+            self.free_rows.extend(rows)
+            if self.hnsw is not None:
+                self.hnsw.delete(rows)
+            self._db.executemany("DELETE FROM vectors WHERE row = ?", [(row,) for row in rows])
+            self._commit()
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM vectors")
+            self._commit()
+            self.id_to_row.clear()
+            self.alive[:] = False
+            self.free_rows = []
+            self.size = 0
+            if self.hnsw is not None:
+                self.hnsw.clear(self.capacity)
+                self.hnsw.save(self.generation)
+
+    def count(self):
+        return len(self.id_to_row)
+
+    def persist(self):
+        if self.hnsw is not None:
+            with self._lock:
+                self.hnsw.save(self.generation)
+
+    def describe(self):
+        return {
+            **super().describe(),
+            "index": self.index_type,
+            "quantization": self.quantization,
+            "quantizer_trained": self.codes is not None,
+            "bytes_per_vector": self.quantizer.code_size if self.codes is not None else 4 * self.dimension,
+        }
+
+
+def create_vector_store(backend, dimension, **kwargs):
+    """Builds the vector store selected by name ('pinecone' or 'local')."""
+    if backend == "pinecone":
+        return PineconeVectorStore(dimension, **kwargs)
+    if backend == "local":
+        return LocalVectorStore(dimension, **kwargs)
+    raise ValueError(f"Unknown vector store backend '{backend}'. Expected 'pinecone' or 'local'.")